@@ -0,0 +1,193 @@
+"""
+@author: David Zemon
+
+@summary: Two-pass assembler producing instruction memory images, with an on-disk cache of
+    binary images keyed by the hash of the source so that programs which have already been
+    assembled are loaded with a single bulk read instead of being parsed again
+
+    Source syntax:
+        - One instruction per line; Operands are separated by commas
+        - Blank lines are ignored, as are lines beginning with a comment character
+        - A label is a name followed by a colon at the start of a line, and marks the address
+          of the next instruction (which may share its line)
+        - A label may be used anywhere an operand is expected. Relative jumps (sjmp, djnz)
+          receive the offset to the label; Everything else receives its absolute address
+"""
+
+import hashlib
+import marshal
+import os
+import re
+import Globals
+from UniversalComponents import FlexibleOp, RISC_Instr
+
+IMAGE_MAGIC = "RIMG"
+IMAGE_VERSION = 1
+
+LABEL_PATTERN = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*):(.*)$")
+RELATIVE_JUMPS = ["sjmp", "djnz"]
+
+
+class AssemblyError(Exception):
+    def __init__ (self, filename, lineNum, message):
+        Exception.__init__(self, filename + ':' + str(lineNum) + ": " + message)
+
+
+def parse (filename, source):
+    """
+    @summary: First pass - split the source into instructions and find the address of every
+            label
+
+    @return: Tuple of the list of (line number, instruction name, operand strings) and the
+            dict mapping label names to addresses
+    """
+    lines = []
+    labels = {}
+
+    for lineNum, line in enumerate(source.splitlines(), 1):
+        line = line.strip()
+
+        # Peel off any labels in front of the instruction
+        match = LABEL_PATTERN.match(line)
+        while match:
+            label = match.group(1)
+            if label in labels:
+                raise AssemblyError(filename, lineNum, "label \"" + label + "\" defined more than once")
+            if label in Globals.DEFAULT_REG_FILE:
+                raise AssemblyError(filename, lineNum, "\"" + label + "\" is a register and cannot be a label")
+            labels[label] = len(lines)
+            line = match.group(2).strip()
+            match = LABEL_PATTERN.match(line)
+
+        if '' == line or line[0] in Globals.COMMENT_CHARS:
+            continue
+
+        fields = line.replace(',', ' ').split()
+        if fields[0] not in Globals.OPCODES:
+            raise AssemblyError(filename, lineNum, "unknown instruction \"" + fields[0] + "\"")
+        lines.append((lineNum, fields[0], fields[1:]))
+
+    return lines, labels
+
+
+def resolve (filename, lines, labels):
+    """
+    @summary: Second pass - replace label operands with immediate offsets or addresses and
+            create the instructions
+
+    @return: List of RISC_Instr
+    """
+    program = []
+    for address, (lineNum, name, ops) in enumerate(lines):
+        resolved = []
+        for op in ops:
+            if op in labels:
+                if name in RELATIVE_JUMPS:
+                    op = '#' + str(labels[op] - (address + 1))
+                else:
+                    op = '#' + str(labels[op])
+            resolved.append(op)
+
+        try:
+            program.append(RISC_Instr(name, resolved))
+        except ValueError:
+            raise AssemblyError(filename, lineNum, "bad operand in \"" + name + ' ' + ", ".join(ops) + "\"")
+
+    return program
+
+
+def assemble (filename, source):
+    lines, labels = parse(filename, source)
+    return resolve(filename, lines, labels)
+
+
+def getCachePath (source):
+    key = hashlib.sha1(IMAGE_MAGIC + chr(IMAGE_VERSION) + source).hexdigest()
+    return os.path.join(Globals.IMAGE_CACHE_DIR, key + ".rimg")
+
+
+def encode (program):
+    """
+    @return: A program as nested tuples of plain values, from which readImage() can rebuild it
+    """
+    return tuple((instr.opcode, tuple(op.getFields() for op in instr.ops)) for instr in program)
+
+
+def writeImage (program, path):
+    """
+    @summary: Save a program as a binary image; Written under a temporary name first so that
+            parallel sweep workers never see half of a file
+    """
+    data = encode(program)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    tmpPath = path + '.' + str(os.getpid())
+    f = open(tmpPath, 'wb')
+    f.write(IMAGE_MAGIC + chr(IMAGE_VERSION))
+    marshal.dump(data, f)
+    f.close()
+    os.rename(tmpPath, path)
+
+
+def readImage (path):
+    """
+    @summary: Load a binary image written by writeImage(); Identical instructions share one
+            RISC_Instr, since instructions are never modified
+
+    @return: List of RISC_Instr, or None if the file is not a readable image
+    """
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+
+    headerLen = len(IMAGE_MAGIC) + 1
+    if IMAGE_MAGIC + chr(IMAGE_VERSION) != data[:headerLen]:
+        return None
+
+    decoded = {}
+    program = []
+    for record in marshal.loads(data[headerLen:]):
+        instr = decoded.get(record)
+        if None == instr:
+            opcode, fields = record
+            instr = RISC_Instr(Globals.OPCODE_NAMES[opcode], [FlexibleOp.fromFields(*field) for field in fields])
+            decoded[record] = instr
+        program.append(instr)
+
+    return program
+
+
+def load (filename):
+    """
+    @summary: Assemble a source file, or load its cached image if it has been assembled before;
+            Caching is disabled when Globals.IMAGE_CACHE_DIR is None
+
+    @return: List of RISC_Instr
+    """
+    f = open(filename, 'r')
+    source = f.read()
+    f.close()
+
+    if None == Globals.IMAGE_CACHE_DIR:
+        return assemble(filename, source)
+
+    path = getCachePath(source)
+    if os.path.isfile(path):
+        program = readImage(path)
+        if None != program:
+            return program
+
+    program = assemble(filename, source)
+    writeImage(program, path)
+    return program
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
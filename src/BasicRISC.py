@@ -4,8 +4,15 @@
 @summary: Provide necessary components to create a basic, un-optimized RISC pipeline
 """
 
-from copy import deepcopy, copy
+from copy import deepcopy
+import BranchPredict
+import Cache
+import FusedPipe
 import Globals
+import PerfCounters
+import SteadyState
+import Trace
+from Memory import Memory
 from UniversalComponents import FltFU, IntFU, RISC_Instr
 
 
@@ -14,20 +21,33 @@ class StageFetch:
     @summary: Fetch stage of the RISC pipeline
     """
 
-    def __init__ (self, parent, decode):
+    def __init__ (self, parent, decode, program):
         self.parent = parent
         self.decode = decode
+        self.program = program
         self.PC = 0
+        self.predictor = None
+        self.trace = None
 
     def tick (self, stall = False):
+        if self.trace:
+            self.trace.record(Trace.TRACE_STAGE, 'f', self.PC)
+
         # Load next instruction
-        if False == stall and Globals.basicRAM[self.PC]:
-            if Globals.basicRAM[self.PC]:
-                self.decode.IR = copy(Globals.basicRAM[self.PC])
-            self.PC += 1  # Increment the program counter
+        if False == stall and 0 <= self.PC < len(self.program):
+            instr = self.program[self.PC]
+            self.decode.IR = instr
+            self.decode.PC = self.PC
+
+            # Increment the program counter, or follow the predicted path of a jump
+            if self.predictor and instr.opcode in Globals.JUMP_OPS:
+                self.PC = self.predictor.predict(self.PC, instr)
+            else:
+                self.PC += 1
+            self.decode.predictedPC = self.PC
             return
-            # Or stall...
-        self.decode.IR = RISC_Instr(self.parent.Rn, "nop")
+        # Or stall...
+        self.decode.IR = Globals.INIT_INSTR
 
 
 class StageDecode:
@@ -38,28 +58,46 @@ class StageDecode:
     def __init__ (self, parent, execute):
         self.parent = parent
         self.execute = execute
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
+        self.PC = None  # Address of IR...
+        self.predictedPC = None  # ...and the address fetched after it
+        self.trace = None
 
     def tick (self):
+        if self.trace:
+            self.trace.record(Trace.TRACE_STAGE, 'd')
+
+        # The execute stage's input latch is reused every cycle rather than reallocated
+        latch = self.execute.input
+        Rn = self.parent.decodeRn
+        ram = self.parent.RAM
+
         # Handle jumps
-        if self.IR.instr in Globals.JUMP_INSTRS:
-            if "sjmp" == self.IR.instr:
-                self.execute.input = {"A": self.IR.getSrcOpVal(0), "B": self.parent.stages['f'].PC}
-            elif "djnz" == self.IR.instr:
-                self.execute.input = {"A": self.IR.getSrcOpVal(0),
-                                      "B": self.parent.stages['f'].PC + self.IR.getSrcOpVal(1)}
+        opcode = self.IR.opcode
+        if opcode in Globals.JUMP_OPS:
+            if Globals.OP_SJMP == opcode:
+                latch["A"] = self.IR.getSrcOpVal(0, Rn, ram)
+                latch["B"] = self.PC + 1
+            elif Globals.OP_DJNZ == opcode:
+                latch["A"] = self.IR.getSrcOpVal(0, Rn, ram)
+                latch["B"] = self.PC + 1 + self.IR.getSrcOpVal(1, Rn, ram)
             else:
-                self.execute.input = {"A": self.IR.getSrcOpVal(0), "B": self.IR.getSrcOpVal(1)}
+                latch["A"] = self.IR.getSrcOpVal(0, Rn, ram)
+                latch["B"] = self.IR.getSrcOpVal(1, Rn, ram)
         # Followed by moves...
-        elif "mov" == self.IR.instr:
-            if self.IR.ops[0].isLdStrOp():
-                self.execute.input["A"] = self.IR.getSrcOpVal(0)
-            self.execute.input["B"] = self.IR.getSrcOpVal(1)
+        elif Globals.OP_MOV == opcode:
+            if self.IR.ops[0].ldStr:
+                latch["A"] = self.IR.getSrcOpVal(0, Rn, ram)
+            latch["B"] = self.IR.getSrcOpVal(1, Rn, ram)
         # And finally, everything else
         else:
-            self.execute.input = {"A": self.IR.getSrcOpVal(1), "B": self.IR.getSrcOpVal(2)}
+            latch["A"] = self.IR.getSrcOpVal(1, Rn, ram)
+            latch["B"] = self.IR.getSrcOpVal(2, Rn, ram)
 
-        self.execute.IR = copy(self.IR)
+        # Instructions are never modified once decoded, so they are passed along by reference
+        self.execute.IR = self.IR
+        self.execute.PC = self.PC
+        self.execute.predictedPC = self.predictedPC
 
 
 class StageExecute:
@@ -70,57 +108,92 @@ class StageExecute:
     def __init__ (self, memory, fetch):
         self.memory = memory
         self.fetch = fetch  # need to be able to clear out the decode instruction if a jump is taken
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
         self.funcUnits = {"INT": IntFU(self.memory.input), "FLT": FltFU(self.memory.input)}
         self.runningFU = None
         self.input = {"A": None, "B": None}
+        self.PC = None
+        self.predictedPC = None
+        self.predictor = None
+        self.counters = None
+        self.trace = None
 
     def tick (self):
-        if Globals.DEBUG:
-            print "\tA: " + str(self.input["A"]) + "\n\tB: " + str(self.input["B"])
+        if self.trace:
+            self.trace.record(Trace.TRACE_STAGE, 'e', self.input["A"], self.input["B"])
 
         # If a functional unit is no longer running, determine which FU should be loaded with the next instruction
-        if (None == self.runningFU) and ("nop" != self.IR.instr):
-            self.runningFU = self.IR.getFU(self.funcUnits)
-            self.runningFU.load(self.IR.instr, [self.input["A"], self.input["B"]])
+        if (None == self.runningFU) and (Globals.OP_NOP != self.IR.opcode):
+            self.runningFU = self.funcUnits[self.IR.FU]
+            self.runningFU.load(self.IR.opcode, self.input["A"], self.input["B"])
 
         # If a functional unit is currently running, give it another tick
         if self.runningFU:
             # Functional unit *is* running...
             self.runningFU.tick()  # Give it a clock cycle
+            if self.counters:
+                self.counters.recordFU(self.runningFU.name)
 
             # Is it done yet?
             if self.runningFU.ding():
                 # Yep!
-                # Did it compute a jump and, if conditional, was the condition true?
-                if self.IR.instr in Globals.JUMP_INSTRS and self.branchCheck():
-                    # Yep! Let's reload the PC and delete the instruction in decode
-                    if Globals.DEBUG:
-                        print "\tTaking jump!!!"
-                    self.fetch.PC = self.memory.input["B"]
-                    self.fetch.decode.IR = copy(Globals.INIT_INSTR)
+                # Did it compute a jump?
+                if self.IR.opcode in Globals.JUMP_OPS:
+                    self.resolveJump()
                 self.runningFU = None
             # Functional unit still running
             else:
                 # push nop into memory stage until the FU is done
-                self.memory.IR = copy(Globals.INIT_INSTR)
+                self.memory.IR = Globals.INIT_INSTR
                 return
 
         # Functional unit is empty, push instruction into memory stage
-        self.memory.IR = copy(self.IR)
+        self.memory.IR = self.IR
+        self.memory.PC = self.PC
+
+    def resolveJump (self):
+        taken = self.branchCheck()
+        target = self.memory.input["B"]
+
+        # Without a predictor, fetch always continues with the next instruction
+        if None == self.predictor:
+            # If conditional, was the condition true? Let's reload the PC and delete the
+            # instruction in decode
+            if taken:
+                if self.trace:
+                    self.trace.record(Trace.TRACE_BRANCH, target)
+                self.flush(target)
+            return
+
+        if not self.predictor.resolve(self.PC, self.IR, self.predictedPC, taken, target):
+            if not taken:
+                target = self.PC + 1
+            if self.trace:
+                self.trace.record(Trace.TRACE_BRANCH, target, True)
+            self.flush(target)
+
+    def flush (self, target):
+        """
+        @summary: Redirect fetch to the target of a jump and squash the instruction in decode
+        """
+        if self.counters:
+            self.counters.flushPC = self.PC
+        self.fetch.PC = target
+        self.fetch.decode.IR = Globals.INIT_INSTR
 
     def branchCheck (self):
-        if self.IR.instr in Globals.UCND_JMP_INSTRS:
+        opcode = self.IR.opcode
+        if opcode in Globals.UCND_JMP_OPS:
             return True
-        elif "jz" == self.IR.instr and 0 == self.memory.input["A"]:
+        elif Globals.OP_JZ == opcode and 0 == self.memory.input["A"]:
             return True
-        elif "djnz" == self.IR.instr and 0 != self.memory.input["A"]:
+        elif Globals.OP_DJNZ == opcode and 0 != self.memory.input["A"]:
             return True
         else:
             return False
 
     def clear (self):
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
         self.input["A"] = None
         self.input["B"] = None
 
@@ -132,34 +205,51 @@ class StageMemory:
 
     def __init__ (self, write, ram):
         self.write = write
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
+        self.PC = None
         self.RAM = ram
         self.input = {"A": None, "B": None}
+        self.cache = None
+        self.wait = 0  # Cycles left in the current cache access
+        self.stores = None  # List that the address and value of every store are appended to (see SteadyState.py)
+        self.trace = None
 
     def tick (self):
-        if Globals.DEBUG:
-            print "\tA: " + str(self.input["A"])
-            print "\tB: " + str(self.input["B"])
-
-        if "mov" == self.IR.instr:
-            if self.IR[0].isLdStrOp():
+        if self.trace:
+            self.trace.record(Trace.TRACE_STAGE, 'm', self.input["A"], self.input["B"])
+
+        if Globals.OP_MOV == self.IR.opcode:
+            # Hold the instruction, and push nop into the write stage, until the cache is done
+            if self.cache and (self.IR.ops[0].ldStr or self.IR.ops[1].ldStr):
+                if 0 == self.wait:
+                    if self.IR.ops[0].ldStr:
+                        self.wait = self.cache.access(self.input["A"], True)
+                    else:
+                        self.wait = self.cache.access(self.input["B"], False)
+                self.wait -= 1
+                if self.wait:
+                    self.write.IR = Globals.INIT_INSTR
+                    return
+
+            if self.IR.ops[0].ldStr:
                 self.RAM[self.input["A"]] = self.input["B"]
+                if None != self.stores:
+                    self.stores.append((self.input["A"], self.input["B"]))
                 return
-            elif self.IR[1].isLdStrOp():
+            elif self.IR.ops[1].ldStr:
                 self.write.inputBuf = self.RAM[self.input["B"]]
-                return
             else:
                 self.write.inputBuf = self.input["B"]
         else:
             self.write.inputBuf = self.input["A"]
 
         # Push instruction into write stage
-        self.write.IR = copy(self.IR)
+        self.write.IR = self.IR
 
     def clear (self):
         self.input["A"] = None
         self.input["B"] = None
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
 
 
 class StageWrite:
@@ -168,24 +258,27 @@ class StageWrite:
     """
 
     def __init__ (self):
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
         self.inputBuf = None
         self.outputBuf = {"Valid": False, "Value": None}
+        self.trace = None
 
     def tick (self):
         # Stage the destination value until after decode has completed
-        if Globals.DEBUG:
-            print "\tInputBuf: " + str(self.inputBuf)
+        if self.trace:
+            self.trace.record(Trace.TRACE_STAGE, 'w', self.inputBuf)
+            if Globals.OP_NOP != self.IR.opcode:
+                self.trace.record(Trace.TRACE_REG_CHECK, self.IR)
 
-        if self.IR.writeResult():
+        if self.IR.writesReg:
             self.outputBuf["Valid"] = True
-            self.outputBuf["Dest"] = copy(self.IR[0])
+            self.outputBuf["Dest"] = self.IR.ops[0]
             self.outputBuf["Value"] = self.inputBuf
         else:
             self.outputBuf["Valid"] = False
 
     def clear (self):
-        self.IR = copy(Globals.INIT_INSTR)
+        self.IR = Globals.INIT_INSTR
         self.inputBuf = None
 
 
@@ -194,18 +287,68 @@ class RISCPipe:
     @summary: A simple, unforwarded, RISC pipe
     """
 
-    def __init__ (self, Rn, ram):
+    def __init__ (self, Rn, program, ram):
         self.Rn = Rn
+        self.program = program
+        self.RAM = ram
         self.stages = {}
         self.stages['w'] = StageWrite()
         self.stages['m'] = StageMemory(self.stages['w'], ram)
         self.stages['e'] = StageExecute(self.stages['m'], None)
         self.stages['d'] = StageDecode(self, self.stages['e'])
-        self.stages['f'] = StageFetch(self, self.stages['d'])
+        self.stages['f'] = StageFetch(self, self.stages['d'], program)
 
         # Connect execute to decode and fetch
         self.stages['e'].fetch = self.stages['f']
 
+        self.predictor = None
+        self.cache = None
+
+        # Registers as seen by decode; A forwarding pipe replaces this with bypassed values
+        self.decodeRn = Rn
+
+        # Cause of the most recent stall and the number of cycles stalled for each cause
+        self.stallReason = "RAW"
+        self.stallCounts = {}
+
+        self.counters = None
+        self.trace = None
+
+    def setTracer (self, tracer):
+        """
+        @summary: Attach a Trace.Tracer to every component of the pipe, or detach tracing
+                entirely by passing None
+        """
+        self.trace = tracer
+        for stage in self.stages.values():
+            stage.trace = tracer
+        for FU in self.stages['e'].funcUnits.values():
+            FU.trace = tracer
+
+    def setCounters (self, counters):
+        """
+        @summary: Count events into a PerfCounters.PerfCounters, or stop counting by passing None
+        """
+        self.counters = counters
+        self.stages['e'].counters = counters
+
+    def setPredictor (self, predictor):
+        """
+        @summary: Have fetch follow the predictions of a BranchPredict.BranchPredictor; Pass
+                None to always fetch the next instruction
+        """
+        self.predictor = predictor
+        self.stages['f'].predictor = predictor
+        self.stages['e'].predictor = predictor
+
+    def setCache (self, cache):
+        """
+        @summary: Place a Cache.Cache between the memory stage and RAM; Pass None to access RAM
+                directly
+        """
+        self.cache = cache
+        self.stages['m'].cache = cache
+
     def tick (self):
         """
         @summary: This function will simulate one tick of the clock cycle. Work will be done
@@ -218,104 +361,171 @@ class RISCPipe:
 
         # Give a tick to write, memory and execute - these can not be stalled
         # because the basic RISC has only RAW and only decode does register reads
+        trace = self.trace
+        counters = self.counters
         for stage in ['w', 'm', 'e']:
-            if Globals.DEBUG:
-                print Globals.STAGE_NAMES[stage]
             self.stages[stage].tick()
-            if Globals.DEBUG:
-                print "\tInstr: " + self.stages[stage].IR.instr
-                for op in self.stages[stage].IR.getOps():
-                    print "\t\top: " + op.op
+            if trace:
+                trace.record(Trace.TRACE_STAGE_DONE, stage, self.stages[stage].IR)
+
+            if 'm' == stage:
+                memory = self.stages['m']
+
+                # Nothing behind memory moves while it waits on the cache
+                if memory.wait:
+                    if trace:
+                        trace.record(Trace.TRACE_MEMORY_WAIT, memory.wait)
+                    if counters:
+                        counters.recordCycle(PerfCounters.CAUSE_MEMORY, memory.PC)
+                    self.stallCounts["memory"] = self.stallCounts.get("memory", 0) + 1
+                    self.writeOutBuf()
+                    return
+
+                # Every instruction passes through memory exactly once
+                if counters and Globals.OP_NOP != memory.IR.opcode:
+                    counters.retired += 1
 
             if 'e' == stage and self.stages['e'].runningFU:
-                if Globals.DEBUG:
-                    print "Waiting on " + self.stages['e'].runningFU.name + "..."
-                    # Allow the write stage to modify the register file if needed
+                if trace:
+                    trace.record(Trace.TRACE_FU_WAIT, self.stages['e'].runningFU.name)
+                if counters:
+                    counters.recordCycle(PerfCounters.CAUSE_FU_BUSY, self.stages['e'].PC)
+                # Allow the write stage to modify the register file if needed
                 self.stages['m'].clear()
                 self.writeOutBuf()
                 return
 
         # Check if decode should be stalled (does w, m, or e contain a RAW hazard?)
         if self.stall():
-            if Globals.DEBUG:
-                print "!!! Stalling \"" + self.stages['d'].IR.getStr() + "\" due to RAW..."
+            if trace:
+                trace.record(Trace.TRACE_STALL, self.stages['d'].IR, self.stallReason)
+            if counters:
+                counters.recordCycle(self.stallReason, self.stages['d'].PC)
+            self.stallCounts[self.stallReason] = self.stallCounts.get(self.stallReason, 0) + 1
             self.stages['e'].clear()
             self.writeOutBuf()
             return
 
-        if Globals.DEBUG:
-            print "\n" + Globals.STAGE_NAMES['d']
+        if counters:
+            self.countDecode()
+
         self.stages['d'].tick()
-        if Globals.DEBUG:
-            print "\tInstr: " + self.stages['d'].IR.instr
-            for op in self.stages['d'].IR.getOps():
-                print "\t\top: " + op.op
+        if trace:
+            trace.record(Trace.TRACE_STAGE_DONE, 'd', self.stages['d'].IR)
         self.writeOutBuf()  # If we finished running decode, allow the write stage to modify the register file
 
-        if Globals.DEBUG:
-            print "\n" + Globals.STAGE_NAMES['f']
-            print "\tPC: " + str(self.stages['f'].PC)
         self.stages['f'].tick()
 
+    def countDecode (self):
+        """
+        @summary: Give the cycle in which decode runs its cause (see PerfCounters)
+        """
+        counters = self.counters
+        decode = self.stages['d']
+        if None != counters.flushPC:
+            # The slot is lost to the jump, whatever decode held when it was squashed
+            counters.recordCycle(PerfCounters.CAUSE_FLUSH, counters.flushPC)
+            counters.flushPC = None
+        elif Globals.OP_NOP != decode.IR.opcode:
+            counters.recordCycle(PerfCounters.CAUSE_ISSUE, decode.PC)
+        else:
+            counters.recordCycle(PerfCounters.CAUSE_BUBBLE, None)
+
     def writeOutBuf (self):
-        if Globals.DEBUG:
-            print '\t' + str(self.stages['w'].outputBuf)
+        outputBuf = self.stages['w'].outputBuf
+        if self.trace:
+            self.trace.record(Trace.TRACE_WRITE_BUF, outputBuf["Valid"], outputBuf.get("Dest"), outputBuf["Value"])
 
-        if self.stages['w'].outputBuf["Valid"]:
-            if Globals.DEBUG:
-                print "Writing to register file!"
-                print "\tDest: " + self.stages['w'].outputBuf["Dest"].op
-                print "\tValue: " + str(self.stages['w'].outputBuf["Value"])
+        if outputBuf["Valid"]:
+            if self.trace:
+                self.trace.record(Trace.TRACE_REG_WRITE, outputBuf["Dest"], outputBuf["Value"])
 
-            self.stages['w'].outputBuf["Dest"].setVal(self.stages['w'].outputBuf["Value"])
+            outputBuf["Dest"].setVal(outputBuf["Value"], self.Rn, self.RAM)
 
     def stall (self):
         """
         @summary: Return a boolean description for whether or not the pipe should insert
-                a stall after decode
+                a stall after decode; Every instruction carries masks of the locations it
+                reads and writes, so the check is a single AND of the dependent instruction's
+                sources with the destinations still pending in write, memory and the write
+                stage's output buffer
         """
-        dependInstr = copy(self.stages['d'].IR)
-        if Globals.DEBUG:
-            print "\tSTALL CHECK"
-            print "\t\tDependent instruction: " + dependInstr.getStr()
+        trace = self.trace
+        dependInstr = self.stages['d'].IR
+        if trace:
+            trace.record(Trace.TRACE_STALL_CHECK, dependInstr)
 
         # If the dependent instruction does not read any operands, there can be no stall
-        if dependInstr.instr in Globals.NO_READ:
+        srcMask = dependInstr.srcMask
+        if 0 == srcMask:
             return False
-        else:
-            dependOps = dependInstr.getSrcOps()
-            if [] == dependOps:
-                return False
+
+        if trace:
+            return self.traceStall(srcMask)
+
+        write = self.stages['w']
+        pending = write.IR.dstMask | self.stages['m'].IR.dstMask
+        if write.outputBuf["Valid"]:
+            pending |= write.outputBuf["Dest"].writeMask
+        return 0 != srcMask & pending
+
+    def traceStall (self, srcMask):
+        """
+        @summary: Same as the mask test in stall(), but checks one pending destination at a
+                time so that the trace records each comparison
+        """
+        trace = self.trace
 
         # Check the instructions exiting memory and execute
         for stage in ['w', 'm']:
-            # Save the instruction from each stage - it will be used more than once
-            independInstr = copy(self.stages[stage].IR)
-            if Globals.DEBUG:
-                print "\t\t" + Globals.STAGE_NAMES[stage] + " received: " + independInstr.getStr()
-
-            # Ensure that the independent instruction has the possibility to write
-            if independInstr.instr not in Globals.NO_WRITE:
-                # For each operand in the in the dependent instruction...
-                for dependOp in dependOps:
-                    # Check if it will be overwritten by another instruction further down the pipe
-                    if independInstr[0].op in dependOp.op:
-                        return True
+            independInstr = self.stages[stage].IR
+            trace.record(Trace.TRACE_STALL_COMPARE, stage, independInstr)
+            if srcMask & independInstr.dstMask:
+                return True
 
         # Finally, check the instruction exiting the write stage
-        if Globals.DEBUG:
-            if self.stages['w'].outputBuf["Valid"]:
-                print "\t\tWrite is writing to: " + self.stages['w'].outputBuf["Dest"].op
-            else:
-                print "\t\tWrite is not writing"
-
-        for dependOp in dependOps:
-            if self.stages['w'].outputBuf["Valid"] and (self.stages['w'].outputBuf["Dest"].op in dependOp.op):
-                return True
+        outputBuf = self.stages['w'].outputBuf
+        if outputBuf["Valid"]:
+            trace.record(Trace.TRACE_STALL_WRITEBACK, outputBuf["Dest"])
+            return 0 != srcMask & outputBuf["Dest"].writeMask
 
-        # All tests passed - no stall necessary
+        trace.record(Trace.TRACE_STALL_WRITEBACK, None)
         return False
 
+    def getIdleCycles (self):
+        """
+        @summary: Count the upcoming cycles in which nothing but the running functional unit's
+                delay counter would change; Once write and memory have drained behind a busy
+                functional unit, every tick leaves the pipe exactly as it found it until the
+                unit finishes
+
+        @return: Number of cycles that skip() may advance over; 0 if the next tick does work
+        """
+        FU = self.stages['e'].runningFU
+        if None == FU or FU.delay <= 1:
+            return 0
+
+        write = self.stages['w']
+        memory = self.stages['m']
+        if Globals.OP_NOP != write.IR.opcode or Globals.OP_NOP != memory.IR.opcode:
+            return 0
+        if write.outputBuf["Valid"] or None != write.inputBuf:
+            return 0
+        if None != memory.input["A"] or None != memory.input["B"]:
+            return 0
+
+        # The cycle in which the unit finishes must be ticked normally
+        return FU.delay - 1
+
+    def skip (self, cycles):
+        """
+        @summary: Advance over idle cycles found by getIdleCycles() without ticking each stage
+        """
+        FU = self.stages['e'].runningFU
+        FU.delay -= cycles
+        if self.counters:
+            self.counters.recordIdle(cycles, FU.name, self.stages['e'].PC)
+
     def done (self):
         """
         @summary: Determine if algorithm has completed runtime
@@ -324,7 +534,7 @@ class RISCPipe:
         """
 
         for stage in self.stages:
-            if 'f' != stage and "nop" != self.stages[stage].IR.instr:
+            if 'f' != stage and Globals.OP_NOP != self.stages[stage].IR.opcode:
                 return 0
 
         return 1
@@ -336,10 +546,26 @@ class BasicRISC:
         simple instruction execution
     """
 
-    def __init__ (self, ram):
+    # Class of pipe the datapath is built around
+    PIPE = RISCPipe
+
+    def __init__ (self, program, ram = None):
+        """
+        @param program: Instruction memory - a list of RISC_Instr that is never modified, so
+                    it may be shared by any number of machines
+        @param ram: This machine's own data memory; Defaults to a new, empty Memory
+        """
+        if None == ram:
+            ram = Memory()
+        self.program = program
         self.RAM = ram
         self.Rn = deepcopy(Globals.DEFAULT_REG_FILE)
-        self.pipe = RISCPipe(self.Rn, self.RAM)
+        self.pipe = self.PIPE(self.Rn, self.program, self.RAM)
+        self.pipe.setPredictor(BranchPredict.makePredictor(Globals.BRANCH_PREDICTOR))
+        self.pipe.setCache(Cache.makeCache())
+        self.trace = None
+        self.clock = 0
+        self.loops = SteadyState.LoopDetector(program)
 
     def load (self):
         """
@@ -347,14 +573,69 @@ class BasicRISC:
         """
         for stage in self.pipe.stages:
             if 'f' is not stage:
-                self.pipe.stages[stage].IR = copy(Globals.INIT_INSTR)
+                self.pipe.stages[stage].IR = Globals.INIT_INSTR
+
+    def setTracer (self, tracer):
+        """
+        @summary: Record events from every component of the datapath into a Trace.Tracer;
+                Pass None to disable tracing
+        """
+        self.trace = tracer
+        self.pipe.setTracer(tracer)
+
+    def setCounters (self, counters):
+        """
+        @summary: Count performance events into a PerfCounters.PerfCounters; Pass None to
+                stop counting
+        """
+        self.pipe.setCounters(counters)
 
     def tick (self):
         """
         @summary: This function will simulate one tick of the clock cycle and can be
                 continuously called to simulate a running processor
         """
+        if self.trace:
+            self.trace.newCycle()
         self.pipe.tick()
+        self.clock += 1
+
+    def advance (self, limit):
+        """
+        @summary: Simulate at least one and at most 'limit' clock cycles; While the pipe is only
+                waiting on a busy functional unit, all of those cycles are taken in one step.
+                Cycle counts are identical to calling tick() repeatedly. Skipping is disabled
+                by Globals.SKIP_AHEAD and whenever a tracer is attached, since a trace must
+                see every cycle
+
+                With Globals.FUSED_ENGINE set, a plain RISCPipe with no tracer, counters,
+                predictor or cache attached is instead run by FusedPipe until it is done or the
+                limit is reached. Otherwise, with Globals.LOOP_EXTRAPOLATION set, such a pipe
+                skips the remaining iterations of any loop found in a steady state (see
+                SteadyState.py)
+
+        @return: Number of clock cycles simulated
+        """
+        pipe = self.pipe
+        plain = RISCPipe is self.PIPE and None == self.trace and None == pipe.counters and None == pipe.predictor and \
+                None == pipe.cache
+        if Globals.FUSED_ENGINE and plain:
+            self.loops.reset()
+            cycles = FusedPipe.run(pipe, limit)
+            self.clock += cycles
+            return cycles
+
+        if Globals.SKIP_AHEAD and None == self.trace and 1 < limit:
+            cycles = min(pipe.getIdleCycles(), limit)
+            if cycles:
+                pipe.skip(cycles)
+                self.clock += cycles
+                return cycles
+
+        self.tick()
+        if Globals.LOOP_EXTRAPOLATION and plain:
+            return 1 + self.loops.sample(self, limit - 1)
+        return 1
 
     def done (self):
         return self.pipe.done()
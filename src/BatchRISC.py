@@ -0,0 +1,542 @@
+"""
+@author: David Zemon
+
+@summary: Simulate many basic RISC machines at once; The register files, RAM and pipeline
+    latches of every machine are held in NumPy arrays, one row per machine, and each tick
+    advances all of them by one cycle with a fixed number of vectorized operations, however
+    many machines there are
+
+    Every machine runs the same program with exactly the semantics of RISCPipe (as in
+    FusedPipe.py), but has its own initial registers and RAM, its own functional unit delays,
+    its own cycle count and its own completion flag, so machines that take different paths
+    through the program simply finish at different times.
+
+    Values are stored as 64-bit floats beside a flag recording whether each is a Python float
+    or an int, so results match BasicRISC exactly as long as integers fit in 53 bits; None is
+    stored as NaN. RAM is dense, so each machine has only Globals.BATCH_RAM_SIZE cells. A
+    machine that would raise an exception in BasicRISC (writing None to a register, dividing
+    by zero, addressing RAM out of range...) is stopped and marked in 'faulted' instead, and
+    its state is then meaningless.
+
+    Requires NumPy; Branch predictors and the data cache are not modelled.
+"""
+
+import numpy
+import Globals
+
+# How decode fills each half of the execute stage's input latch
+LATCH_KEEP, LATCH_NONE, LATCH_CONST, LATCH_REG, LATCH_RAM = range(5)
+
+# Delay of each instruction's operation, as a row of BatchRISC.delays
+DELAY_INT, DELAY_FLT, DELAY_MISC = range(3)
+
+# Globals that may be given a different value for each machine (see setTiming())
+TIMING_PARAMS = ["INTEGER_DELAY", "FLOATING_POINT_DELAY", "MISC_DELAY"]
+
+NOP = -1  # Index of the bubble in every stage
+
+
+def toValues (values, count):
+    """
+    @summary: Convert a single value, or a sequence of one value per machine, to the arrays
+            in which BatchRISC stores values
+
+    @return: Tuple of an array of the values, with None as NaN, and an array of flags set
+            where a value is a float
+    """
+    if isinstance(values, numpy.ndarray):
+        return values.astype(float), numpy.repeat('f' == values.dtype.kind, len(values))
+    if not isinstance(values, (list, tuple)):
+        values = [values] * count
+    if len(values) != count:
+        raise Exception("Expected one value for each of " + str(count) + " machines, got " + str(len(values)))
+    return numpy.array([numpy.nan if None == value else value for value in values], float), \
+           numpy.array([isinstance(value, float) for value in values], bool)
+
+
+def toPython (value, isFloat):
+    """
+    @return: A value stored by BatchRISC as the Python object BasicRISC would hold
+    """
+    if numpy.isnan(value):
+        return None
+    if isFloat:
+        return float(value)
+    return int(value)
+
+
+class BatchRISC:
+    """
+    @summary: Any number of basic, unforwarded RISC datapaths running one program in lockstep
+    """
+
+    def __init__ (self, program, count, ramSize = None):
+        """
+        @param program: Instruction memory shared by every machine; A list of RISC_Instr
+        @param count: Number of machines
+        @param ramSize: RAM cells of each machine; Defaults to Globals.BATCH_RAM_SIZE
+        """
+        if None != Globals.BRANCH_PREDICTOR or None != Globals.CACHE_SIZE:
+            raise Exception("BatchRISC models neither branch predictors nor the data cache")
+        if count < 1:
+            raise Exception("A batch needs at least one machine")
+        if None == ramSize:
+            ramSize = Globals.BATCH_RAM_SIZE
+
+        self.program = program
+        self.count = count
+        self.ramSize = ramSize
+        self.decodeProgram(program)
+
+        # Architectural state
+        self.Rn = numpy.full((count, len(Globals.REG_NAMES)), numpy.nan)
+        self.RnF = numpy.zeros((count, len(Globals.REG_NAMES)), bool)
+        self.RAM = numpy.full((count, ramSize), numpy.nan)
+        self.RAMF = numpy.zeros((count, ramSize), bool)
+
+        # Pipeline state; Stages hold indices into the program and every latch is a value and flag
+        self.PC = numpy.zeros(count, numpy.int64)
+        self.dI = numpy.full(count, NOP, numpy.int64)
+        self.eI = numpy.full(count, NOP, numpy.int64)
+        self.mI = numpy.full(count, NOP, numpy.int64)
+        self.wI = numpy.full(count, NOP, numpy.int64)
+        self.eA, self.eAF = toValues(None, count)
+        self.eB, self.eBF = toValues(None, count)
+        self.mA, self.mAF = toValues(None, count)
+        self.mB, self.mBF = toValues(None, count)
+        self.wIn, self.wInF = toValues(None, count)
+        self.outValid = numpy.zeros(count, bool)
+        self.outI = numpy.full(count, NOP, numpy.int64)
+        self.outValue, self.outValueF = toValues(None, count)
+        self.FUDelay = numpy.zeros(count, numpy.int64)  # 0 when no functional unit is running
+
+        # Delays of each class of operation (DELAY_INT...) for each machine
+        self.delays = numpy.array([[Globals.INTEGER_DELAY] * count, [Globals.FLOATING_POINT_DELAY] * count,
+                                   [Globals.MISC_DELAY] * count], numpy.int64)
+
+        self.clock = numpy.zeros(count, numpy.int64)
+        self.stalls = numpy.zeros(count, numpy.int64)  # RAW stalls of each machine
+        self.finished = numpy.zeros(count, bool)
+        self.faulted = numpy.zeros(count, bool)
+
+    def decodeProgram (self, program):
+        """
+        @summary: Build tables of everything each stage needs to know about each instruction;
+                Every table has an extra row at the end for the bubble, which a stage holding
+                NOP (-1) therefore indexes
+        """
+        rows = list(program) + [Globals.INIT_INSTR]
+        size = len(rows)
+
+        self.opcode = numpy.array([instr.opcode for instr in rows], numpy.int64)
+        self.isFlt = numpy.array(["FLT" == instr.FU for instr in rows], bool)
+        self.writesReg = numpy.array([instr.writesReg for instr in rows], bool)
+        self.destReg = numpy.array([Globals.REG_NAMES.index(instr.ops[0].reg) if instr.writesReg else 0
+                                    for instr in rows], numpy.int64)
+
+        # Moves are split by what the memory stage does with them
+        isMov = numpy.array([Globals.OP_MOV == instr.opcode for instr in rows], bool)
+        self.isStore = isMov & numpy.array([Globals.OP_MOV == instr.opcode and instr.ops[0].ldStr for instr in rows])
+        self.isLoad = isMov & ~self.isStore & numpy.array([Globals.OP_MOV == instr.opcode and instr.ops[1].ldStr
+                                                           for instr in rows])
+        self.isMove = isMov & ~self.isStore & ~self.isLoad
+
+        # Hazard masks are wider than 64 bits, so registers and indirect RAM are kept apart from direct RAM
+        low = (1 << Globals.MASK_DIRECT_SHIFT) - 1
+        self.srcLow = numpy.array([instr.srcMask & low for instr in rows], numpy.uint64)
+        self.srcHigh = numpy.array([instr.srcMask >> Globals.MASK_DIRECT_SHIFT for instr in rows], numpy.uint64)
+        self.dstLow = numpy.array([instr.dstMask & low for instr in rows], numpy.uint64)
+        self.dstHigh = numpy.array([instr.dstMask >> Globals.MASK_DIRECT_SHIFT for instr in rows], numpy.uint64)
+
+        unit = numpy.full(size, DELAY_MISC, numpy.int64)
+        for i, instr in enumerate(rows):
+            if "INT" == instr.FU and instr.opcode in Globals.ALU_OPS:
+                unit[i] = DELAY_INT
+            elif "FLT" == instr.FU and instr.opcode not in Globals.MOV_OPS:
+                unit[i] = DELAY_FLT
+        self.unit = unit
+
+        # How decode fills latches A and B, as (mode, register, constant, constant is a float, offset)
+        latches = {'A': [], 'B': []}
+        for PC, instr in enumerate(rows):
+            for name, latch in zip("AB", self.decodeLatches(PC, instr)):
+                latches[name].append(latch)
+        self.latches = {}
+        for name in "AB":
+            mode, reg, const, constF, offset = zip(*latches[name])
+            self.latches[name] = (numpy.array(mode, numpy.int64), numpy.array(reg, numpy.int64),
+                                  numpy.array(const, float), numpy.array(constF, bool),
+                                  numpy.array(offset, numpy.int64))
+
+    @staticmethod
+    def decodeLatches (PC, instr):
+        """
+        @summary: Determine how StageDecode.tick() fills latches A and B for one instruction
+
+        @return: Tuple of the (mode, register, constant, constant is a float, offset) of each
+                latch; The latch is loaded with the operand's value plus the offset
+        """
+
+        def value (op, offset = 0):
+            if Globals.OPND_REG == op.kind:
+                return LATCH_REG, Globals.REG_NAMES.index(op.reg), 0, False, offset
+            elif Globals.OPND_IMMEDIATE == op.kind:
+                return LATCH_CONST, -1, op.value + offset, isinstance(op.value, float), 0
+            elif Globals.OPND_INDIRECT == op.kind:
+                return LATCH_RAM, Globals.REG_NAMES.index(op.reg), 0, False, offset
+            else:
+                return LATCH_RAM, -1, op.value, False, offset
+
+        def address (op):
+            if Globals.OPND_INDIRECT == op.kind:
+                return LATCH_REG, Globals.REG_NAMES.index(op.reg), 0, False, 0
+            return LATCH_CONST, -1, op.value, False, 0
+
+        keep = (LATCH_KEEP, -1, 0, False, 0)
+        none = (LATCH_NONE, -1, 0, False, 0)
+        opcode = instr.opcode
+        ops = instr.ops
+        if opcode in Globals.JUMP_OPS:
+            if Globals.OP_SJMP == opcode:
+                return value(ops[0]), (LATCH_CONST, -1, PC + 1, False, 0)
+            elif Globals.OP_DJNZ == opcode:
+                return value(ops[0]), value(ops[1], PC + 1)
+            elif Globals.OP_JZ == opcode:
+                return value(ops[0]), value(ops[1])
+            return value(ops[0]), none
+        elif Globals.OP_MOV == opcode:
+            if ops[1].ldStr:
+                B = address(ops[1])
+            else:
+                B = value(ops[1])
+            if ops[0].ldStr:
+                return address(ops[0]), B
+            return keep, B
+        elif Globals.OP_NOP == opcode:
+            return none, none
+        elif opcode in Globals.TRIPLE_OPS:
+            return value(ops[1]), value(ops[2])
+        return value(ops[1]), none
+
+    def setRegister (self, name, values):
+        """
+        @summary: Set a register of every machine, to a single value or to one value per machine
+        """
+        reg = Globals.REG_NAMES.index(name)
+        self.Rn[:, reg], self.RnF[:, reg] = toValues(values, self.count)
+
+    def setRAM (self, address, values):
+        """
+        @summary: Set a RAM cell of every machine, to a single value or to one value per machine
+        """
+        self.RAM[:, address], self.RAMF[:, address] = toValues(values, self.count)
+
+    def setTiming (self, name, values):
+        """
+        @summary: Give every machine its own value of one of TIMING_PARAMS, or set all of them
+                to a single value
+        """
+        if name not in TIMING_PARAMS:
+            raise Exception("Unknown timing parameter: " + str(name))
+        self.delays[TIMING_PARAMS.index(name)] = values
+
+    def getRn (self, machine):
+        """
+        @return: Register file of one machine, as a dict like BasicRISC.Rn
+        """
+        return dict((name, toPython(self.Rn[machine, reg], self.RnF[machine, reg]))
+                    for reg, name in enumerate(Globals.REG_NAMES))
+
+    def getCells (self, machine):
+        """
+        @return: Every RAM cell of one machine holding data, as a sorted list of (address, value)
+                like Memory.getCells()
+        """
+        return [(int(address), toPython(self.RAM[machine, address], self.RAMF[machine, address]))
+                for address in numpy.flatnonzero(~numpy.isnan(self.RAM[machine]))]
+
+    def running (self):
+        """
+        @return: Mask of the machines that have neither finished nor faulted
+        """
+        return ~(self.finished | self.faulted)
+
+    def fault (self, rows, bad):
+        """
+        @summary: Stop the machines in rows where bad is set
+        """
+        self.faulted[rows[bad]] = True
+
+    def getAddresses (self, rows, values, floats):
+        """
+        @summary: Check that values can be used as RAM addresses by the machines in rows,
+                faulting any machine where one cannot
+
+        @return: The values as indices, with 0 in place of any that could not be used
+        """
+        bad = numpy.isnan(values) | floats | (values < 0) | (values >= self.ramSize)
+        self.fault(rows, bad)
+        return numpy.where(bad, 0, values).astype(numpy.int64)
+
+    def tick (self):
+        """
+        @summary: Simulate one clock cycle of every machine that has neither finished nor faulted
+        """
+        rows = numpy.flatnonzero(self.running())
+        with numpy.errstate(all = "ignore"):
+            self.tickRows(rows)
+
+        self.clock[rows] += 1
+
+        # Like RISCPipe.done(), a nop in the program counts as a bubble
+        opcode = self.opcode
+        self.finished[rows] = (Globals.OP_NOP == opcode[self.dI[rows]]) & (Globals.OP_NOP == opcode[self.eI[rows]]) & \
+                              (Globals.OP_NOP == opcode[self.mI[rows]]) & (Globals.OP_NOP == opcode[self.wI[rows]])
+
+    def tickRows (self, rows):
+        """
+        @summary: Simulate one clock cycle of the machines in rows, stage by stage as
+                RISCPipe.tick() does; Each stage works on the subset of rows it applies to
+        """
+        ticked = rows
+
+        # Write
+        wI = self.wI[rows]
+        valid = self.writesReg[wI]
+        self.outValid[rows] = valid
+        out = rows[valid]
+        self.outI[out] = self.wI[out]
+        self.outValue[out] = self.wIn[out]
+        self.outValueF[out] = self.wInF[out]
+
+        # Memory; Stores never reach write
+        mI = self.mI[rows]
+        store = rows[self.isStore[mI]]
+        address = self.getAddresses(store, self.mA[store], self.mAF[store])
+        self.RAM[store, address] = self.mB[store]
+        self.RAMF[store, address] = self.mBF[store]
+
+        load = rows[self.isLoad[mI]]
+        address = self.getAddresses(load, self.mB[load], self.mBF[load])
+        self.wIn[load] = self.RAM[load, address]
+        self.wInF[load] = self.RAMF[load, address]
+
+        move = rows[self.isMove[mI]]
+        self.wIn[move] = self.mB[move]
+        self.wInF[move] = self.mBF[move]
+
+        other = rows[~(self.isStore[mI] | self.isLoad[mI] | self.isMove[mI])]
+        self.wIn[other] = self.mA[other]
+        self.wInF[other] = self.mAF[other]
+
+        moved = rows[~self.isStore[mI]]
+        self.wI[moved] = self.mI[moved]
+
+        # Execute
+        eI = self.eI[rows]
+        start = rows[(0 == self.FUDelay[rows]) & (Globals.OP_NOP != self.opcode[eI])]
+        self.FUDelay[start] = self.delays[self.unit[self.eI[start]], start]
+
+        running = rows[0 != self.FUDelay[rows]]
+        self.FUDelay[running] -= 1
+        self.finish(running[0 == self.FUDelay[running]])
+
+        # Nothing moves while the functional unit is busy
+        busy = 0 != self.FUDelay[rows]
+        held = rows[busy]
+        self.mI[held] = NOP
+        self.mA[held] = numpy.nan
+        self.mAF[held] = False
+        self.mB[held] = numpy.nan
+        self.mBF[held] = False
+        rows = rows[~busy]
+        self.mI[rows] = self.eI[rows]
+
+        # Stall decode on a RAW hazard
+        dI = self.dI[rows]
+        outI = numpy.where(self.outValid[rows], self.outI[rows], NOP)
+        pendingLow = self.dstLow[self.wI[rows]] | self.dstLow[self.mI[rows]] | self.dstLow[outI]
+        pendingHigh = self.dstHigh[self.wI[rows]] | self.dstHigh[self.mI[rows]] | self.dstHigh[outI]
+        stalled = (0 != self.srcLow[dI] & pendingLow) | (0 != self.srcHigh[dI] & pendingHigh)
+        stall = rows[stalled]
+        self.stalls[stall] += 1
+        self.eI[stall] = NOP
+        self.eA[stall] = numpy.nan
+        self.eAF[stall] = False
+        self.eB[stall] = numpy.nan
+        self.eBF[stall] = False
+
+        # Decode
+        decode = rows[~stalled]
+        self.readLatch(decode, 'A', self.eA, self.eAF)
+        self.readLatch(decode, 'B', self.eB, self.eBF)
+        self.eI[decode] = self.dI[decode]
+
+        self.writeOutBuf(ticked[self.outValid[ticked]])
+
+        # Fetch
+        PC = self.PC[decode]
+        fetched = (0 <= PC) & (PC < len(self.program))
+        self.dI[decode] = numpy.where(fetched, PC, NOP)
+        self.PC[decode] = PC + fetched
+
+    def readLatch (self, rows, name, values, floats):
+        """
+        @summary: Load one half of the execute stage's input latch of the machines in rows with
+                the operand of the instruction each is decoding
+        """
+        mode, reg, const, constF, offset = self.latches[name]
+        dI = self.dI[rows]
+        mode = mode[dI]
+        reg = reg[dI]
+
+        value = const[dI]
+        isFloat = constF[dI]
+        value[LATCH_NONE == mode] = numpy.nan
+
+        fromReg = LATCH_REG == mode
+        value[fromReg] = self.Rn[rows[fromReg], reg[fromReg]]
+        isFloat[fromReg] = self.RnF[rows[fromReg], reg[fromReg]]
+
+        # RAM is addressed directly by the constant, or indirectly through the register
+        fromRAM = LATCH_RAM == mode
+        ramRows = rows[fromRAM]
+        indirect = 0 <= reg[fromRAM]
+        address = numpy.where(indirect, self.Rn[ramRows, reg[fromRAM]], value[fromRAM])
+        addressF = indirect & self.RnF[ramRows, reg[fromRAM]]
+        address = self.getAddresses(ramRows, address, addressF)
+        value[fromRAM] = self.RAM[ramRows, address]
+        isFloat[fromRAM] = self.RAMF[ramRows, address]
+
+        # A relative jump's target can not be computed from None
+        offset = offset[dI]
+        self.fault(rows, (0 != offset) & numpy.isnan(value))
+        value += offset
+
+        loaded = LATCH_KEEP != mode
+        values[rows[loaded]] = value[loaded]
+        floats[rows[loaded]] = isFloat[loaded]
+
+    def finish (self, rows):
+        """
+        @summary: Compute the results of the functional units finishing this cycle into the
+                memory stage's input latch (as FuncUnit.writeResult() does), and resolve jumps
+        """
+        opcodes = self.opcode[self.eI[rows]]
+        for opcode in numpy.unique(opcodes):
+            selected = rows[opcode == opcodes]
+            isFlt = self.isFlt[self.eI[selected]]
+            a = self.eA[selected]
+            b = self.eB[selected]
+            aF = self.eAF[selected]
+            bF = self.eBF[selected]
+
+            if opcode in Globals.MATH_OPS:
+                self.fault(selected, numpy.isnan(a) | numpy.isnan(b))
+                if Globals.OP_ADD == opcode:
+                    A = a + b
+                elif Globals.OP_SUB == opcode:
+                    A = a - b
+                elif Globals.OP_MUL == opcode:
+                    A = a * b
+                else:
+                    # Python 2 floors the quotient of two ints
+                    self.fault(selected, 0 == b)
+                    ints = ~(aF | bF)
+                    A = numpy.where(ints, numpy.floor_divide(a, b), a / b)
+                    intRows = selected[~isFlt]
+                    self.mB[intRows] = numpy.trunc(numpy.mod(a, b))[~isFlt]
+                    self.mBF[intRows] = False
+                self.mA[selected] = numpy.where(isFlt, A, numpy.trunc(A))
+                self.mAF[selected] = isFlt
+                continue
+
+            # Only the integer unit runs the remaining operations
+            self.fault(selected, isFlt & (Globals.OP_MOV != opcode))
+            if opcode in Globals.LOGIC_OPS or opcode in Globals.SHIFT_OPS or Globals.OP_NEG == opcode:
+                # Bitwise operations are not defined on None or floats
+                bad = numpy.isnan(a) | aF
+                if opcode in Globals.LOGIC_OPS:
+                    bad |= numpy.isnan(b) | bF
+                self.fault(selected, bad)
+                a = numpy.where(bad, 0, a).astype(numpy.int64)
+                b = numpy.where(bad | numpy.isnan(b), 0, b).astype(numpy.int64)
+                if Globals.OP_OR == opcode:
+                    A = a | b
+                elif Globals.OP_AND == opcode:
+                    A = a & b
+                elif Globals.OP_NAND == opcode:
+                    A = ~(a & b)
+                elif Globals.OP_XOR == opcode:
+                    A = a ^ b
+                elif Globals.OP_NEG == opcode:
+                    A = ~a
+                elif Globals.OP_SHL == opcode:
+                    A = a << 1
+                else:
+                    A = a >> 1
+                self.mA[selected] = A
+                self.mAF[selected] = False
+                continue
+
+            if Globals.OP_LJMP == opcode:
+                A, AF, B, BF = 0, False, a, aF
+            elif Globals.OP_SJMP == opcode:
+                A, AF, B, BF = 0, False, a + b, aF | bF
+            elif Globals.OP_DJNZ == opcode:
+                self.fault(selected, numpy.isnan(a))
+                A, AF, B, BF = a - 1, aF, b, bF
+            else:
+                A, AF, B, BF = a, aF, b, bF
+            self.mA[selected] = A
+            self.mAF[selected] = AF
+            self.mB[selected] = B
+            self.mBF[selected] = BF
+
+            if opcode in Globals.UCND_JMP_OPS:
+                taken = selected
+            elif Globals.OP_JZ == opcode:
+                taken = selected[0 == self.mA[selected]]
+            elif Globals.OP_DJNZ == opcode:
+                taken = selected[0 != self.mA[selected]]
+            else:
+                continue
+            # Fetch stops at any target outside the program, even None, but a float inside it can
+            # not index the program
+            target = self.mB[taken]
+            outside = numpy.isnan(target) | (target < 0) | (target >= len(self.program))
+            self.fault(taken, self.mBF[taken] & ~outside)
+            self.PC[taken] = numpy.where(outside, -1, target)
+            self.dI[taken] = NOP
+
+    def writeOutBuf (self, rows):
+        """
+        @summary: Write the write stage's output buffer of the machines in rows to their registers
+        """
+        value = self.outValue[rows]
+        bad = numpy.isnan(value)
+        self.fault(rows, bad)
+        rows = rows[~bad]
+        reg = self.destReg[self.outI[rows]]
+        self.Rn[rows, reg] = self.outValue[rows]
+        self.RnF[rows, reg] = self.outValueF[rows]
+
+    def run (self, limit = None):
+        """
+        @summary: Tick until every machine has finished or faulted, or for at most 'limit'
+                cycles (default: Globals.MAX_CLOCK)
+
+        @return: Array of the number of clock cycles each machine took
+        """
+        if None == limit:
+            limit = Globals.MAX_CLOCK
+
+        for cycle in xrange(limit):
+            if not self.running().any():
+                break
+            self.tick()
+        return self.clock
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,284 @@
+"""
+@author: David Zemon
+
+@summary: Run the benchmark kernel suite on every datapath and flag any change against the
+    recorded results; A kernel fails if any datapath leaves registers or RAM different from
+    what the functional interpreter (and the recording) says they should be, and regresses if
+    it takes more cycles than recorded. Improvements are reported too, so the recording can
+    be brought up to date with --update
+
+    Usage: python Bench.py [-u] [-m MODEL]... [KERNEL.asm...]
+           python Bench.py -l [KERNEL.asm...]
+           python Bench.py -b COUNT [KERNEL.asm...]
+
+    Kernels default to every program in the benchmarks directory; Results are recorded in
+    benchmarks/expected.json with the timing parameters in Globals as shipped.
+
+    With --lockstep, the kernels are instead run on the basic datapath by both RISCPipe and
+    the fused engine in FusedPipe.py, one cycle at a time, and the complete state of the two
+    is compared after every cycle.
+
+    With --batch, COUNT copies of each kernel are instead run at once by BatchRISC.py, each
+    with its own functional unit delays, and every copy is compared with the basic datapath
+    run with the same delays; This needs NumPy.
+"""
+
+from argparse import ArgumentParser
+from copy import deepcopy
+from glob import glob
+from traceback import format_exc
+import json
+import os
+import sys
+import Globals
+import Checkpoint
+import FinalProject
+import FusedPipe
+from Functional import FunctionalRISC
+from Memory import Memory
+
+try:
+    import BatchRISC
+except ImportError:  # NumPy is only needed by the batched engine
+    BatchRISC = None
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+EXPECTED_FILE = os.path.join(BENCHMARK_DIR, "expected.json")
+
+# Outcome of each kernel on each model
+PASS = "ok"
+FAIL = "FAIL"
+REGRESSION = "SLOWER"
+IMPROVED = "faster"
+NEW = "new"
+
+
+def getState (machine):
+    """
+    @return: The architectural state of a machine in the form stored in the recording
+    """
+    return {"Rn": dict(machine.Rn), "RAM": [list(cell) for cell in machine.RAM.getCells()]}
+
+
+def getReference (image):
+    """
+    @summary: Run a kernel on the functional interpreter, which defines correct behaviour
+    """
+    machine = FunctionalRISC(image, Memory(), deepcopy(Globals.DEFAULT_REG_FILE))
+    machine.run()
+    return getState(machine)
+
+
+def runKernel (filename, models, expected):
+    """
+    @summary: Run one kernel on each model and compare it to the functional interpreter and
+            to its recording
+
+    @param expected: Recording of this kernel, or None if it has never been recorded
+
+    @return: Tuple of the new recording for the kernel and a list of (model, cycles, outcome,
+            message) tuples
+    """
+    image = FinalProject.loadImage(filename)
+    reference = getReference(image)
+    record = {"Rn": reference["Rn"], "RAM": reference["RAM"], "cycles": {}}
+
+    rows = []
+    for model in models:
+        #noinspection PyBroadException
+        try:
+            datapath = FinalProject.loadProgram(filename, image, model)
+            cycles = FinalProject.run(datapath)
+        except:
+            rows.append((model, None, FAIL, format_exc().strip().splitlines()[-1]))
+            continue
+
+        state = getState(datapath)
+
+        if not datapath.done():
+            rows.append((model, cycles, FAIL, "did not complete"))
+        elif state != reference:
+            rows.append((model, cycles, FAIL, "final state differs from the functional interpreter"))
+        elif None != expected and reference != {"Rn": expected["Rn"], "RAM": expected["RAM"]}:
+            rows.append((model, cycles, FAIL, "final state differs from the recording"))
+        elif None == expected or model not in expected["cycles"]:
+            rows.append((model, cycles, NEW, ''))
+        elif cycles > expected["cycles"][model]:
+            rows.append((model, cycles, REGRESSION, "recorded " + str(expected["cycles"][model])))
+        elif cycles < expected["cycles"][model]:
+            rows.append((model, cycles, IMPROVED, "recorded " + str(expected["cycles"][model])))
+        else:
+            rows.append((model, cycles, PASS, ''))
+
+        if FAIL != rows[-1][2]:
+            record["cycles"][model] = cycles
+
+    return record, rows
+
+
+def lockstep (filename, image):
+    """
+    @summary: Run a kernel on the basic datapath with the reference and the fused engine side
+            by side, comparing every register, RAM cell, latch and functional unit after each
+            cycle
+
+    @return: Tuple of the number of cycles and a description of the first difference, which
+            is None if the engines agree on every cycle
+    """
+    fused = Globals.FUSED_ENGINE
+    Globals.FUSED_ENGINE = False
+    try:
+        reference = FinalProject.loadProgram(filename, image)
+        machine = FinalProject.loadProgram(filename, image)
+    finally:
+        Globals.FUSED_ENGINE = fused
+
+    if reference.pipe.predictor:
+        return 0, "the fused engine does not model branch predictors"
+    if reference.pipe.cache:
+        return 0, "the fused engine does not model the data cache"
+
+    # Like FinalProject.run(), the first cycle is always simulated since an empty pipe is done
+    while 0 == reference.clock or (not reference.done() and reference.clock < Globals.MAX_CLOCK):
+        reference.tick()
+        machine.clock += FusedPipe.run(machine.pipe, 1)
+
+        expected = Checkpoint.capture(reference)
+        state = Checkpoint.capture(machine)
+        if state != expected:
+            differences = [key for key in sorted(expected) if state[key] != expected[key]]
+            return reference.clock, "state differs after cycle " + str(reference.clock) + ": " + \
+                                    ", ".join(differences)
+        if machine.done() != reference.done():
+            return reference.clock, "done() differs after cycle " + str(reference.clock)
+
+    if machine.pipe.stallCounts != reference.pipe.stallCounts:
+        return reference.clock, "stall counts differ"
+
+    return reference.clock, None
+
+
+def batch (filename, image, count):
+    """
+    @summary: Run copies of a kernel with BatchRISC, giving each copy different functional unit
+            delays, and compare the cycles and final state of every copy with the basic
+            datapath run with the same delays
+
+    @return: Tuple of the cycles taken by the copy with the delays in Globals and a
+            description of the first difference, which is None if every copy agrees
+    """
+    if None == BatchRISC:
+        return 0, "BatchRISC needs NumPy"
+
+    # Each copy lengthens the delay of one class of operation in turn, so copy 0 has the delays in Globals
+    delays = []
+    for i in range(count):
+        delays.append([getattr(Globals, name) for name in BatchRISC.TIMING_PARAMS])
+        delays[-1][i % len(delays[-1])] += i // len(delays[-1])
+
+    machines = BatchRISC.BatchRISC(image, count)
+    for param, values in zip(BatchRISC.TIMING_PARAMS, zip(*delays)):
+        machines.setTiming(param, values)
+    machines.run()
+
+    shipped = delays[0]
+    references = {}
+    message = None
+    try:
+        for i in range(count):
+            key = tuple(delays[i])
+            if key not in references:
+                for param, value in zip(BatchRISC.TIMING_PARAMS, key):
+                    setattr(Globals, param, value)
+                datapath = FinalProject.loadProgram(filename, image)
+                references[key] = FinalProject.run(datapath), getState(datapath)
+
+            cycles, state = references[key]
+            if machines.faulted[i]:
+                message = "copy " + str(i) + " faulted"
+            elif machines.clock[i] != cycles:
+                message = "copy " + str(i) + " took " + str(machines.clock[i]) + " cycles rather than " + str(cycles)
+            elif {"Rn": machines.getRn(i), "RAM": [list(cell) for cell in machines.getCells(i)]} != state:
+                message = "final state of copy " + str(i) + " differs"
+            if message:
+                break
+    finally:
+        for param, value in zip(BatchRISC.TIMING_PARAMS, shipped):
+            setattr(Globals, param, value)
+
+    return references[tuple(shipped)][0], message
+
+
+def loadExpected (filename):
+    if not os.path.isfile(filename):
+        return {}
+    f = open(filename, 'r')
+    expected = json.load(f)
+    f.close()
+    return expected
+
+
+def saveExpected (expected, filename):
+    f = open(filename, 'w')
+    json.dump(expected, f, indent = 2, sort_keys = True)
+    f.write('\n')
+    f.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description = "Check the benchmark kernels for correctness and cycle-count regressions")
+    parser.add_argument("kernels", nargs = '*', help = "kernels to run (default: every kernel in the suite)")
+    parser.add_argument("-m", "--model", dest = "models", action = "append", choices = sorted(FinalProject.MODELS),
+                        help = "datapath to run (default: all)")
+    parser.add_argument("-u", "--update", action = "store_true",
+                        help = "record the current results as the expected ones")
+    parser.add_argument("-l", "--lockstep", action = "store_true",
+                        help = "check the fused engine against the basic pipe, cycle by cycle")
+    parser.add_argument("-b", "--batch", type = int, default = None, metavar = "COUNT",
+                        help = "check the batched engine against the basic pipe with COUNT copies of each kernel")
+    args = parser.parse_args()
+
+    kernels = args.kernels
+    if not kernels:
+        kernels = sorted(glob(os.path.join(BENCHMARK_DIR, "*.asm")))
+
+    if args.lockstep or args.batch:
+        failed = False
+        for kernel in kernels:
+            if args.lockstep:
+                cycles, message = lockstep(kernel, FinalProject.loadImage(kernel))
+            else:
+                cycles, message = batch(kernel, FinalProject.loadImage(kernel), args.batch)
+            if message:
+                failed = True
+            print os.path.basename(kernel).ljust(20) + str(cycles).rjust(7) + "  " + (message or PASS)
+        if failed:
+            sys.exit(1)
+        sys.exit(0)
+    models = args.models
+    if not models:
+        models = sorted(FinalProject.MODELS)
+
+    expected = loadExpected(EXPECTED_FILE)
+    failed = False
+    for kernel in kernels:
+        name = os.path.basename(kernel)
+        record, rows = runKernel(kernel, models, expected.get(name))
+
+        print name
+        for model, cycles, outcome, message in rows:
+            print "  " + model.ljust(12) + str(cycles).rjust(7) + "  " + outcome.ljust(7) + message
+            if outcome in (FAIL, REGRESSION):
+                failed = True
+
+        # Models that were not run keep their recorded cycles
+        if name in expected:
+            for model, cycles in expected[name]["cycles"].items():
+                record["cycles"].setdefault(model, cycles)
+        expected[name] = record
+
+    if args.update:
+        saveExpected(expected, EXPECTED_FILE)
+        print "\nRecorded results in " + EXPECTED_FILE
+    elif failed:
+        sys.exit(1)
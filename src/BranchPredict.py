@@ -0,0 +1,248 @@
+"""
+@author: David Zemon
+
+@summary: Branch predictors consulted by the fetch stage; Fetch asks the predictor for the
+    address to fetch after each jump and execute reports the real outcome, so a correctly
+    predicted jump costs nothing while a misprediction squashes the instruction in decode
+
+    Except for the branch target buffer, predictors find a jump's target by pre-decoding it
+    in fetch, which is only possible when the target is an immediate; Jumps to a register are
+    always predicted not taken by them.
+
+    Every predictor counts, for each jump address, how many times it was right and wrong.
+"""
+
+import Globals
+
+
+def getStaticTarget (instr, PC):
+    """
+    @return: Address a jump at PC goes to when taken, or None if it depends on a register
+    """
+    opcode = instr.opcode
+    if Globals.OP_SJMP == opcode:
+        op = instr.ops[0]
+    elif opcode in (Globals.OP_DJNZ, Globals.OP_JZ):
+        op = instr.ops[1]
+    else:
+        op = instr.ops[0]
+
+    if Globals.OPND_IMMEDIATE != op.kind:
+        return None
+    if opcode in (Globals.OP_SJMP, Globals.OP_DJNZ):
+        return PC + 1 + op.value
+    return op.value
+
+
+class BranchPredictor(object):
+    """
+    @summary: Parent class for all branch predictors; Always predicts not taken, which is how
+            the pipeline behaves without a predictor
+    """
+
+    name = "not-taken"
+
+    def __init__ (self, size = None):
+        """
+        @param size: Number of entries in the predictor's table; Defaults to
+                    Globals.PREDICTOR_SIZE (ignored by predictors without a table)
+        """
+        if None == size:
+            size = Globals.PREDICTOR_SIZE
+        self.size = size
+        self.stats = {}
+
+    def predict (self, PC, instr):
+        """
+        @return: Address that should be fetched after the jump at PC
+        """
+        return PC + 1
+
+    def update (self, PC, instr, taken, target):
+        """
+        @summary: Learn the outcome of the jump at PC; Subclasses with state extend this
+        """
+        pass
+
+    def resolve (self, PC, instr, predictedPC, taken, target):
+        """
+        @summary: Called by execute once a jump has been resolved
+
+        @return: True if the prediction was correct
+        """
+        if taken:
+            actualPC = target
+        else:
+            actualPC = PC + 1
+
+        correct = actualPC == predictedPC
+        counts = self.stats.get(PC)
+        if None == counts:
+            counts = self.stats[PC] = [0, 0]
+        counts[not correct] += 1
+
+        self.update(PC, instr, taken, target)
+        return correct
+
+    def getAccuracy (self):
+        hits = sum(counts[0] for counts in self.stats.values())
+        total = hits + sum(counts[1] for counts in self.stats.values())
+        if not total:
+            return None
+        return float(hits) / total
+
+    def getState (self):
+        """
+        @return: Plain values (see Checkpoint.py) describing everything the predictor has learned
+        """
+        return None
+
+    def setState (self, state):
+        pass
+
+    def report (self, program):
+        """
+        @return: Lines of text listing the hits and misses of every jump
+        """
+        lines = ["Branch predictor: " + self.name]
+        for PC in sorted(self.stats):
+            hits, misses = self.stats[PC]
+            lines.append("\t" + str(PC) + ":\t" + program[PC].getStr().ljust(20) + "hits: " + str(hits) +
+                         "\tmisses: " + str(misses))
+        accuracy = self.getAccuracy()
+        if None != accuracy:
+            lines.append("\tAccuracy: %.1f%%" % (100 * accuracy))
+        return lines
+
+
+class BackwardTakenPredictor(BranchPredictor):
+    """
+    @summary: Static prediction - unconditional jumps and backward conditional jumps (loops)
+            are taken, forward conditional jumps are not
+    """
+
+    name = "backward-taken"
+
+    def predict (self, PC, instr):
+        target = getStaticTarget(instr, PC)
+        if None == target:
+            return PC + 1
+        if instr.opcode in Globals.UCND_JMP_OPS or target <= PC:
+            return target
+        return PC + 1
+
+
+class OneBitPredictor(BranchPredictor):
+    """
+    @summary: Predict that each jump does whatever it did last time; Jumps share entries of a
+            table indexed by address
+    """
+
+    name = "1-bit"
+
+    # Entries start out predicting not taken
+    INITIAL = 0
+    TAKEN = 1
+
+    def __init__ (self, size = None):
+        BranchPredictor.__init__(self, size)
+        self.table = [self.INITIAL] * self.size
+
+    def predict (self, PC, instr):
+        if self.table[PC % self.size] < self.TAKEN:
+            return PC + 1
+        target = getStaticTarget(instr, PC)
+        if None == target:
+            return PC + 1
+        return target
+
+    def update (self, PC, instr, taken, target):
+        self.table[PC % self.size] = int(taken)
+
+    def getState (self):
+        return list(self.table)
+
+    def setState (self, state):
+        self.table[:] = state
+
+
+class TwoBitPredictor(OneBitPredictor):
+    """
+    @summary: Two-bit saturating counters; A jump must go the other way twice in a row before
+            its prediction changes, so a loop only mispredicts on exit
+    """
+
+    name = "2-bit"
+
+    INITIAL = 1
+    TAKEN = 2
+
+    def update (self, PC, instr, taken, target):
+        index = PC % self.size
+        if taken:
+            self.table[index] = min(3, self.table[index] + 1)
+        else:
+            self.table[index] = max(0, self.table[index] - 1)
+
+
+class BTBPredictor(BranchPredictor):
+    """
+    @summary: Branch target buffer - a direct-mapped cache of jump addresses holding the
+            target each jump last went to and a two-bit counter; Jumps that are not in the
+            buffer are predicted not taken. Targets are learned, so jumps to registers are
+            predicted as well
+    """
+
+    name = "btb"
+
+    def __init__ (self, size = None):
+        BranchPredictor.__init__(self, size)
+        # Each entry is [PC, target, counter], or None
+        self.entries = [None] * self.size
+
+    def predict (self, PC, instr):
+        entry = self.entries[PC % self.size]
+        if None != entry and PC == entry[0] and 2 <= entry[2]:
+            return entry[1]
+        return PC + 1
+
+    def update (self, PC, instr, taken, target):
+        index = PC % self.size
+        entry = self.entries[index]
+        if None == entry or PC != entry[0]:
+            # Only jumps that are taken are worth a place in the buffer
+            if taken:
+                self.entries[index] = [PC, target, 2]
+        elif taken:
+            entry[1] = target
+            entry[2] = min(3, entry[2] + 1)
+        else:
+            entry[2] = max(0, entry[2] - 1)
+
+    def getState (self):
+        return [entry and list(entry) for entry in self.entries]
+
+    def setState (self, state):
+        self.entries[:] = [entry and list(entry) for entry in state]
+
+
+# Every predictor, by the name used to select it (see Globals.BRANCH_PREDICTOR)
+PREDICTORS = dict((predictor.name, predictor) for predictor in
+                  [BranchPredictor, BackwardTakenPredictor, OneBitPredictor, TwoBitPredictor, BTBPredictor])
+
+
+def makePredictor (name, size = None):
+    """
+    @param size: Number of entries in the predictor's table; Defaults to Globals.PREDICTOR_SIZE
+
+    @return: A new predictor of the named type, or None if name is None
+    """
+    if None == name:
+        return None
+    if name not in PREDICTORS:
+        raise Exception("Unknown branch predictor: " + str(name))
+    return PREDICTORS[name](size)
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,172 @@
+"""
+@author: David Zemon
+
+@summary: A data cache between the memory stage and RAM; Every load and store made by the
+    memory stage is looked up in the cache, and the stage holds its instruction until the
+    access has taken as many cycles as the cache says it costs
+
+    The cache models timing only: values are always read from and written to RAM, which gives
+    the same results as a real cache would on a machine with a single processor.
+
+    Costs of an access:
+        - Hit: Globals.CACHE_HIT_DELAY cycles
+        - Miss: Globals.CACHE_MISS_DELAY cycles to fill the line from RAM, plus as much again if
+          a dirty line has to be written back to make room for it
+        - Write-through: Every store costs Globals.CACHE_MISS_DELAY cycles, since it is written
+          to RAM; A store that misses does not allocate a line
+"""
+
+from random import Random
+import Globals
+
+POLICIES = ["lru", "random"]
+
+
+class Cache(object):
+    """
+    @summary: A set-associative cache; Each set is a list of the lines it holds, least recently
+            used first, and lines are identified by their address divided by the line size
+    """
+
+    def __init__ (self, size, associativity, lineSize, policy = "lru", hitDelay = 1, missDelay = 10,
+                  writeBack = True, seed = 0):
+        """
+        @param size: Capacity in words; Must be a multiple of associativity * lineSize
+        @param associativity: Lines in each set
+        @param lineSize: Words in each line
+        @param policy: Line evicted from a full set; One of POLICIES
+        @param hitDelay: Cycles taken by a hit
+        @param missDelay: Cycles taken to move a line between the cache and RAM
+        @param writeBack: Stores only mark the line dirty if True, else they are written through
+        @param seed: Seed of the random replacement policy, so runs are repeatable
+        """
+        if policy not in POLICIES:
+            raise Exception("Unknown cache replacement policy: " + str(policy))
+        if size <= 0 or associativity <= 0 or lineSize <= 0 or size % (associativity * lineSize):
+            raise Exception("Cache size must be a positive multiple of associativity * line size")
+        if hitDelay < 1 or missDelay < 1:
+            raise Exception("Every cache access takes at least one cycle")
+
+        self.size = size
+        self.associativity = associativity
+        self.lineSize = lineSize
+        self.policy = policy
+        self.hitDelay = hitDelay
+        self.missDelay = missDelay
+        self.writeBack = writeBack
+        self.random = Random(seed)
+
+        self.sets = [[] for i in range(size // (associativity * lineSize))]
+        self.dirty = set()
+
+        self.reads = 0
+        self.writes = 0
+        self.readMisses = 0
+        self.writeMisses = 0
+        self.writebacks = 0
+
+    def access (self, address, write):
+        """
+        @summary: Look up an address, updating the cache's contents and statistics
+
+        @param write: True for a store, False for a load
+
+        @return: Number of cycles the access takes
+        """
+        line = int(address) // self.lineSize
+        lines = self.sets[line % len(self.sets)]
+
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+
+        if line in lines:
+            if "lru" == self.policy:
+                lines.remove(line)
+                lines.append(line)
+            if not write:
+                return self.hitDelay
+            if self.writeBack:
+                self.dirty.add(line)
+                return self.hitDelay
+            return self.missDelay
+
+        if write:
+            self.writeMisses += 1
+            if not self.writeBack:
+                return self.missDelay
+        else:
+            self.readMisses += 1
+
+        cycles = self.missDelay
+        if len(lines) == self.associativity:
+            if "lru" == self.policy:
+                victim = lines.pop(0)
+            else:
+                victim = lines.pop(self.random.randrange(len(lines)))
+            if victim in self.dirty:
+                self.dirty.remove(victim)
+                self.writebacks += 1
+                cycles += self.missDelay
+
+        lines.append(line)
+        if write:
+            self.dirty.add(line)
+        return cycles
+
+    def getHitRate (self):
+        accesses = self.reads + self.writes
+        if not accesses:
+            return None
+        return 1 - float(self.readMisses + self.writeMisses) / accesses
+
+    def getState (self):
+        """
+        @return: Plain values (see Checkpoint.py) describing the lines held, in order of use,
+                which of them are dirty, the state of the random replacement policy (if it is the
+                one used) and the statistics
+        """
+        random = None
+        if "random" == self.policy:
+            random = self.random.getstate()
+        return ([list(lines) for lines in self.sets], sorted(self.dirty), random,
+                [self.reads, self.writes, self.readMisses, self.writeMisses, self.writebacks])
+
+    def setState (self, state):
+        sets, dirty, random, stats = state
+        self.sets = [list(lines) for lines in sets]
+        self.dirty = set(dirty)
+        if None != random:
+            self.random.setstate(random)
+        self.reads, self.writes, self.readMisses, self.writeMisses, self.writebacks = stats
+
+    def report (self):
+        """
+        @return: Lines of text summarizing the cache's configuration and hit rates
+        """
+        lines = ["Data cache: %d words, %d-way, %d words per line, %s, %s" %
+                 (self.size, self.associativity, self.lineSize, self.policy,
+                  "write-back" if self.writeBack else "write-through")]
+        for name, accesses, misses in [("Loads", self.reads, self.readMisses), ("Stores", self.writes, self.writeMisses)]:
+            line = "\t" + name.ljust(8) + str(accesses).rjust(7) + " accesses" + str(misses).rjust(7) + " misses"
+            if accesses:
+                line += "  (%.1f%% hits)" % (100.0 * (accesses - misses) / accesses)
+            lines.append(line)
+        if self.writeBack:
+            lines.append("\tWritebacks" + str(self.writebacks).rjust(13))
+        return lines
+
+
+def makeCache ():
+    """
+    @return: A new cache configured by Globals, or None if Globals.CACHE_SIZE is None
+    """
+    if None == Globals.CACHE_SIZE:
+        return None
+    return Cache(Globals.CACHE_SIZE, Globals.CACHE_ASSOCIATIVITY, Globals.CACHE_LINE_SIZE, Globals.CACHE_POLICY,
+                 Globals.CACHE_HIT_DELAY, Globals.CACHE_MISS_DELAY, Globals.CACHE_WRITE_BACK)
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
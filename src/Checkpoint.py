@@ -0,0 +1,209 @@
+"""
+@author: David Zemon
+
+@summary: Save the complete state of a BasicRISC datapath to a compact, versioned binary
+    checkpoint file and restore it later, so long runs can be paused and resumed, warm-up
+    can be done once and reused, and crashed runs can be reproduced
+
+    Timing parameters (Globals.INTEGER_DELAY and friends) are deliberately not part of a
+    checkpoint so that one warmed-up state can be reused across many timing experiments.
+    Delay counters of functional units that were running when the checkpoint was taken are
+    saved, however, as is everything a branch predictor has learned; The latter is only
+    restored if the datapath is rebuilt with the same type of predictor. Likewise, the contents
+    of a data cache and the cycles left in the memory stage's access are only restored if the
+    datapath is rebuilt with a cache of the same size, associativity, line size and write
+    policy; Otherwise it starts with a cold cache.
+
+    The class of the datapath is saved too, so it is rebuilt with the same pipe. Only the
+    datapaths in DATAPATHS can be checkpointed; The scoreboard and VLIW datapaths are refused
+    with an exception rather than saved incompletely.
+"""
+
+import marshal
+import zlib
+import Globals
+from BasicRISC import BasicRISC
+from Forwarding import ForwardingRISC
+from Memory import Memory
+from UniversalComponents import FlexibleOp, RISC_Instr
+
+CHECKPOINT_MAGIC = "RCKP"
+CHECKPOINT_VERSION = 5
+
+# Every datapath that can be checkpointed, by the name of its class
+DATAPATHS = dict((datapath.__name__, datapath) for datapath in [BasicRISC, ForwardingRISC])
+
+# Stages whose instruction register is saved; Fetch only has a PC
+IR_STAGES = ['d', 'e', 'm', 'w']
+
+
+def encodeInstr (instr):
+    """
+    @summary: Instructions are stored as their assembly text; None represents the shared bubble
+    """
+    if instr is Globals.INIT_INSTR:
+        return None
+    return instr.getStr()
+
+
+def decodeInstr (text):
+    if None == text:
+        return Globals.INIT_INSTR
+    name, ops = (text.split(' ', 1) + [''])[:2]
+    return RISC_Instr(name, ops.replace(',', '').split())
+
+
+def checkSupported (datapath):
+    """
+    @summary: Raise an exception if a datapath is not one that can be checkpointed
+    """
+    if datapath.__class__.__name__ not in DATAPATHS:
+        raise Exception("Checkpoints are not supported by " + datapath.__class__.__name__)
+
+
+def getCacheShape (cache):
+    """
+    @return: Everything about a cache that decides which lines it holds
+    """
+    return cache.size, cache.associativity, cache.lineSize, cache.writeBack
+
+
+def capture (datapath):
+    """
+    @summary: Collect the state of a datapath into plain values that marshal can store
+    """
+    checkSupported(datapath)
+    stages = datapath.pipe.stages
+    execute = stages['e']
+
+    FUs = {}
+    for name, FU in execute.funcUnits.items():
+        FUs[name] = (getattr(FU, "operation", None), FU.delay, list(FU.ops))
+    runningFU = None
+    for name, FU in execute.funcUnits.items():
+        if FU is execute.runningFU:
+            runningFU = name
+
+    outputBuf = stages['w'].outputBuf
+    dest = None
+    if "Dest" in outputBuf:
+        dest = outputBuf["Dest"].op
+
+    predictor = None
+    if datapath.pipe.predictor:
+        predictor = (datapath.pipe.predictor.name, datapath.pipe.predictor.getState())
+
+    cache = None
+    if datapath.pipe.cache:
+        cache = (getCacheShape(datapath.pipe.cache), datapath.pipe.cache.getState())
+
+    return {
+        "datapath": datapath.__class__.__name__,
+        "clock": datapath.clock,
+        "Rn": dict(datapath.Rn),
+        "program": [encodeInstr(instr) for instr in datapath.program],
+        "RAMSize": len(datapath.RAM),
+        "RAM": datapath.RAM.getCells(),
+        "PC": stages['f'].PC,
+        "IR": dict((stage, encodeInstr(stages[stage].IR)) for stage in IR_STAGES),
+        "PCs": dict((stage, (stages[stage].PC, stages[stage].predictedPC)) for stage in ['d', 'e']),
+        "executeInput": dict(execute.input),
+        "memoryInput": dict(stages['m'].input),
+        "inputBuf": stages['w'].inputBuf,
+        "outputBuf": (outputBuf["Valid"], outputBuf["Value"], dest),
+        "FUs": FUs,
+        "runningFU": runningFU,
+        "predictor": predictor,
+        "cache": cache,
+        "memoryWait": stages['m'].wait
+    }
+
+
+def rebuild (state):
+    """
+    @summary: Create a new datapath from the values produced by capture()
+    """
+    program = [decodeInstr(text) for text in state["program"]]
+    ram = Memory(size = state["RAMSize"])
+    for address, value in state["RAM"]:
+        ram[address] = value
+
+    datapath = DATAPATHS[state["datapath"]](program, ram)
+    datapath.load()
+    datapath.clock = state["clock"]
+    datapath.Rn.update(state["Rn"])
+
+    stages = datapath.pipe.stages
+    execute = stages['e']
+    stages['f'].PC = state["PC"]
+    for stage in IR_STAGES:
+        stages[stage].IR = decodeInstr(state["IR"][stage])
+    for stage, (PC, predictedPC) in state["PCs"].items():
+        stages[stage].PC = PC
+        stages[stage].predictedPC = predictedPC
+
+    # The latches are shared with the functional units, so they must be updated in place
+    execute.input.update(state["executeInput"])
+    stages['m'].input.update(state["memoryInput"])
+    stages['w'].inputBuf = state["inputBuf"]
+
+    valid, value, dest = state["outputBuf"]
+    outputBuf = stages['w'].outputBuf
+    outputBuf["Valid"] = valid
+    outputBuf["Value"] = value
+    if None != dest:
+        outputBuf["Dest"] = FlexibleOp(dest)
+
+    for name, (operation, delay, ops) in state["FUs"].items():
+        FU = execute.funcUnits[name]
+        FU.operation = operation
+        FU.delay = delay
+        FU.ops[:] = ops
+    if None != state["runningFU"]:
+        execute.runningFU = execute.funcUnits[state["runningFU"]]
+
+    predictor = datapath.pipe.predictor
+    if None != state["predictor"] and predictor and predictor.name == state["predictor"][0]:
+        predictor.setState(state["predictor"][1])
+
+    # An access in progress can only be finished by the cache that started it
+    cache = datapath.pipe.cache
+    if None != state["cache"] and cache and getCacheShape(cache) == tuple(state["cache"][0]):
+        cache.setState(state["cache"][1])
+        stages['m'].wait = state["memoryWait"]
+
+    return datapath
+
+
+def save (datapath, filename):
+    """
+    @summary: Write a checkpoint of the datapath to a file
+    """
+    f = open(filename, 'wb')
+    f.write(CHECKPOINT_MAGIC + chr(CHECKPOINT_VERSION))
+    f.write(zlib.compress(marshal.dumps(capture(datapath))))
+    f.close()
+
+
+def restore (filename):
+    """
+    @summary: Read a checkpoint file written by save()
+
+    @return: A new datapath, of the same class as the one saved, in exactly the state that was
+            saved
+    """
+    f = open(filename, 'rb')
+    data = f.read()
+    f.close()
+
+    headerLen = len(CHECKPOINT_MAGIC) + 1
+    if CHECKPOINT_MAGIC != data[:headerLen - 1]:
+        raise Exception(filename + " is not a checkpoint file")
+    if CHECKPOINT_VERSION != ord(data[headerLen - 1]):
+        raise Exception("Unsupported checkpoint version: " + str(ord(data[headerLen - 1])))
+
+    return rebuild(marshal.loads(zlib.decompress(data[headerLen:])))
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,120 @@
+"""
+@author: David Zemon
+
+@summary: Run the same programs on several datapaths and report the cycles each one took,
+    the reduction relative to the first, and the decode stalls that remain (by cause)
+
+    Usage: python Compare.py [-m MODEL]... [-p PREDICTOR]... PROGRAM.asm...
+
+    Every model is run with each branch predictor given (models without a fetch stage ignore it)
+
+    Example: python Compare.py -m basic -m forwarding instructionList.asm
+             python Compare.py -m basic -p not-taken -p 2-bit -p btb instructionList.asm
+"""
+
+from argparse import ArgumentParser
+import os
+from BranchPredict import PREDICTORS
+import Globals
+import FinalProject
+
+
+def compare (filename, models, predictors = [None]):
+    """
+    @summary: Run one program on each model with each branch predictor, sharing a single
+            program image
+
+    @return: List of dicts, one per run, holding the model name, cycle count, whether the
+            program completed, the stall counts (None for datapaths that don't stall decode),
+            the instructions per clock (None for datapaths that don't count instructions) and
+            the branch predictor's name and accuracy (None if there was no predictor)
+    """
+    image = FinalProject.loadImage(filename)
+
+    results = []
+    original = Globals.BRANCH_PREDICTOR
+    try:
+        for model in models:
+            for predictor in predictors:
+                Globals.BRANCH_PREDICTOR = predictor
+                results.append(runModel(filename, image, model))
+    finally:
+        Globals.BRANCH_PREDICTOR = original
+
+    return results
+
+
+def runModel (filename, image, model):
+    datapath = FinalProject.loadProgram(filename, image, model)
+    cycles = FinalProject.run(datapath)
+
+    stalls = None
+    predictor = None
+    accuracy = None
+    if hasattr(datapath, "pipe"):
+        stalls = dict(datapath.pipe.stallCounts)
+        if datapath.pipe.predictor:
+            predictor = datapath.pipe.predictor.name
+            accuracy = datapath.pipe.predictor.getAccuracy()
+
+    IPC = None
+    if hasattr(datapath, "getIPC"):
+        IPC = datapath.getIPC()
+
+    return {"model": model, "cycles": cycles, "completed": bool(datapath.done()), "stalls": stalls, "IPC": IPC,
+            "predictor": predictor, "accuracy": accuracy, "Rn": dict(datapath.Rn), "RAM": datapath.RAM.getCells()}
+
+
+def printReport (filename, results):
+    print os.path.basename(filename)
+
+    base = results[0]
+    for result in results:
+        name = result["model"]
+        if result["predictor"]:
+            name += '/' + result["predictor"]
+        line = "  " + name.ljust(26) + str(result["cycles"]).rjust(7) + " cycles"
+
+        if result is not base:
+            saved = base["cycles"] - result["cycles"]
+            line += "  " + str(saved).rjust(6) + " fewer (" + ("%.1f" % (100.0 * saved / base["cycles"])) + "%)"
+
+        if None != result["IPC"]:
+            line += "  IPC " + ("%.3f" % result["IPC"])
+
+        if None != result["stalls"]:
+            if result["stalls"]:
+                causes = ", ".join(cause + ": " + str(count) for cause, count in sorted(result["stalls"].items()))
+            else:
+                causes = "none"
+            line += "  stalls - " + causes
+
+        if None != result["accuracy"]:
+            line += "  predicted " + ("%.1f" % (100 * result["accuracy"])) + "%"
+
+        if not result["completed"]:
+            line += "  (did not complete within " + str(Globals.MAX_CLOCK) + " cycles)"
+        elif result["Rn"] != base["Rn"] or result["RAM"] != base["RAM"]:
+            line += "  (RESULTS DIFFER FROM " + base["model"] + ")"
+
+        print line
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description = "Compare the cycle counts of datapaths on the same programs")
+    parser.add_argument("programs", nargs = '+', help = "assembly programs to simulate")
+    parser.add_argument("-m", "--model", dest = "models", action = "append", choices = sorted(FinalProject.MODELS),
+                        help = "datapath to run; The first is the baseline (default: basic and forwarding)")
+    parser.add_argument("-p", "--predictor", dest = "predictors", action = "append", choices = sorted(PREDICTORS),
+                        help = "branch predictor to run each model with (default: none)")
+    args = parser.parse_args()
+
+    models = args.models
+    if not models:
+        models = ["basic", "forwarding"]
+    predictors = args.predictors
+    if not predictors:
+        predictors = [None]
+
+    for program in args.programs:
+        printReport(program, compare(program, models, predictors))
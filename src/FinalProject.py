@@ -13,36 +13,125 @@ Created on April 24, 2013
     (unforwarded) RISC pipeline. The algorithm used for the comparison is listed below.
 """
 
-from copy import deepcopy
+from argparse import ArgumentParser
 from traceback import print_exc
-from BasicRISC import BasicRISC, RISC_Instr
+from BasicRISC import BasicRISC
+from BranchPredict import PREDICTORS
+from PerfCounters import PerfCounters
+from Forwarding import ForwardingRISC
+from Functional import FunctionalRISC
+from Scoreboard import ScoreboardRISC
+from VLIW import VLIWRISC
+import Assembler
+import Checkpoint
 import Globals
+import Trace
 
+# Every datapath that can run a program, by the name used to select it
+MODELS = {"basic": BasicRISC, "forwarding": ForwardingRISC, "scoreboard": ScoreboardRISC, "vliw": VLIWRISC}
 
-def loadRAM (filename, ram, Rn):
-    f = open(filename, 'r')
 
-    i = 0
-    for line in f:
-        if line[0] not in Globals.COMMENT_CHARS:
-            line = line.replace(',', '')
-            line = line.split()
-            ram[i] = RISC_Instr(Rn, line[0], line[1:])
-            i += 1
+def loadImage (filename):
+    """
+    @summary: Assemble a program (or load its cached image) into instruction memory; The
+            image is never modified by a running machine, so one image may be shared by any
+            number of them
+
+    @return: List of RISC_Instr
+    """
+    return Assembler.load(filename)
+
+
+def loadProgram (filename, image = None, model = "basic"):
+    """
+    @summary: Create a fresh datapath with its own RAM and load a program into it
+
+    @param image: Previously loaded image of the same program, to be shared rather than
+                reloaded
+    @param model: Name of the datapath to create; One of MODELS
+
+    @return: The loaded datapath, ready to be run
+    """
+    if model not in MODELS:
+        raise Exception("Unknown model: " + str(model))
+    if None == image:
+        image = loadImage(filename)
+
+    datapath = MODELS[model](image)
+    datapath.load()
+    if Globals.COUNTERS_FILE and isinstance(datapath, BasicRISC):
+        datapath.setCounters(PerfCounters())
+
+    return datapath
+
+
+def fastForward (datapath, count = None, PC = None):
+    """
+    @summary: Execute a freshly loaded datapath's program on the functional interpreter, first
+            for 'count' instructions and then until it reaches PC (either may be None), and
+            hand the state over to the datapath so that run() simulates the rest in detail
+
+    @return: Number of instructions executed by the interpreter
+    """
+    machine = FunctionalRISC(datapath.program, datapath.RAM, datapath.Rn)
+    executed = 0
+    if None != count:
+        executed += machine.fastForward(count)
+    if None != PC:
+        executed += machine.runToPC(PC)
+    machine.handOff(datapath)
+    return executed
+
+
+def run (datapath):
+    """
+    @summary: Tick a datapath until its program completes or Globals.MAX_CLOCK is reached;
+            If Globals.CHECKPOINT_INTERVAL is set, a checkpoint is written to
+            Globals.CHECKPOINT_FILE every time that many cycles have elapsed, or an exception is
+            raised before running if the datapath can not be checkpointed. If the datapath is
+            counting performance events, they are written to Globals.COUNTERS_FILE at the end
+
+    @return: Number of clock cycles taken
+    """
+    interval = Globals.CHECKPOINT_INTERVAL
+    if interval:
+        # Refuse before running rather than part of the way through
+        Checkpoint.checkSupported(datapath)
+
+    datapath.tick()
+    while not datapath.done() and datapath.clock < Globals.MAX_CLOCK:
+        if interval and not (datapath.clock % interval):
+            Checkpoint.save(datapath, Globals.CHECKPOINT_FILE)
+
+        # Never skip past the clock limit or the next checkpoint
+        limit = Globals.MAX_CLOCK - datapath.clock
+        if interval:
+            limit = min(limit, interval - datapath.clock % interval)
+        datapath.advance(limit)
+
+    if Globals.COUNTERS_FILE and isinstance(datapath, BasicRISC) and datapath.pipe.counters:
+        datapath.pipe.counters.save(Globals.COUNTERS_FILE, datapath.program, datapath.pipe.predictor)
+
+    return datapath.clock
+
+
+def printProgram (program):
+    for address, instr in enumerate(program):
+        print str(address) + ":\t" + instr.getStr()
 
 
 def printRAM (ram):
-    for line in ram:
-        if None != line:
-            if type(line) == RISC_Instr:
-                print str(ram.index(line)) + ":\t" + line.getStr()
-            else:
-                print str(ram.index(line)) + ":\t" + str(line)
+    for address, value in ram.getCells():
+        print str(address) + ":\t" + str(value)
 
 
 def printDPDebug (datapath):
+    printProgram(datapath.program)
     printRAM(datapath.RAM)
     print datapath.Rn
+    if not isinstance(datapath, BasicRISC):
+        return
+
     print "Exec's A: " + str(datapath.pipe.stages['e'].input["A"]) + "\tB: " + str(datapath.pipe.stages['e'].input["B"])
     print "Mem's A: " + str(datapath.pipe.stages['m'].input["A"]) + "\tB: " + str(datapath.pipe.stages['m'].input["B"])
     print "Write's input: " + str(datapath.pipe.stages['w'].inputBuf)
@@ -54,35 +143,81 @@ def printDPDebug (datapath):
 
 
 if __name__ == "__main__":
-    print "Welcome!"
-    Globals.basicRAM = deepcopy(Globals.RAM)
+    parser = ArgumentParser(description = "Simulate an assembly program")
+    parser.add_argument("program", nargs = '?', default = "instructionList.asm", help = "assembly program to simulate")
+    parser.add_argument("-m", "--model", choices = sorted(MODELS), default = "basic", help = "datapath to simulate")
+    parser.add_argument("-p", "--predictor", choices = sorted(PREDICTORS), default = Globals.BRANCH_PREDICTOR,
+                        help = "branch predictor used by the basic and forwarding datapaths")
+    parser.add_argument("-c", "--counters", default = Globals.COUNTERS_FILE, metavar = "FILE.json",
+                        help = "write performance counters of the basic and forwarding datapaths to this file")
+    parser.add_argument("-d", "--dcache", type = int, default = Globals.CACHE_SIZE, metavar = "WORDS",
+                        help = "give the basic and forwarding datapaths a data cache of this size (see Cache.py)")
+    parser.add_argument("-f", "--fused", action = "store_true", default = Globals.FUSED_ENGINE,
+                        help = "run the basic datapath with the fused engine (see FusedPipe.py)")
+    parser.add_argument("--fast-forward", type = int, default = None, metavar = "N",
+                        help = "execute the first N instructions without timing them before simulating in detail")
+    parser.add_argument("--to-pc", type = int, default = None, metavar = "PC",
+                        help = "execute instructions without timing them until the program counter reaches PC, "
+                               "then simulate in detail")
+    parser.add_argument("-i", "--checkpoint-interval", type = int, default = Globals.CHECKPOINT_INTERVAL,
+                        metavar = "N", help = "save a checkpoint of the basic or forwarding datapath every N cycles")
+    parser.add_argument("--checkpoint-file", default = Globals.CHECKPOINT_FILE, metavar = "FILE.rckp",
+                        help = "file that checkpoints are saved to (default: %(default)s)")
+    parser.add_argument("-r", "--restore", default = None, metavar = "FILE.rckp",
+                        help = "resume the run saved in a checkpoint rather than starting the program; The "
+                               "datapath is the one that was saved, whatever --model says")
+    args = parser.parse_args()
+    if args.restore and (None != args.fast_forward or None != args.to_pc):
+        parser.error("a restored run can not be fast-forwarded")
+    Globals.BRANCH_PREDICTOR = args.predictor
+    Globals.COUNTERS_FILE = args.counters
+    Globals.FUSED_ENGINE = args.fused
+    Globals.CACHE_SIZE = args.dcache
+    Globals.CHECKPOINT_INTERVAL = args.checkpoint_interval
+    Globals.CHECKPOINT_FILE = args.checkpoint_file
 
-    basic = BasicRISC(Globals.basicRAM)
-    Globals.INIT_INSTR = RISC_Instr(basic.Rn, "nop")
-    basic.load()
+    print "Welcome!"
+    if args.restore:
+        basic = Checkpoint.restore(args.restore)
+        if Globals.COUNTERS_FILE:
+            basic.setCounters(PerfCounters())
+        print "Restored " + args.restore + " at clock " + str(basic.clock)
+    else:
+        basic = loadProgram(args.program, model = args.model)
+    if Globals.DEBUG:
+        basic.setTracer(Trace.PrintTracer())
+    elif Globals.TRACE_FILE:
+        basic.setTracer(Trace.FileTracer(Globals.TRACE_FILE))
 
-    loadRAM("instructionList.asm", Globals.basicRAM, basic.Rn)
+    printProgram(basic.program)
 
-    printRAM(Globals.basicRAM)
+    if None != args.fast_forward or None != args.to_pc:
+        executed = fastForward(basic, args.fast_forward, args.to_pc)
+        print "\nFast-forwarded " + str(executed) + " instructions"
 
     #noinspection PyBroadException
     try:
         print "\n#############\nFirst tick!!!\n#############"
-        clock = 0
-        basic.tick()
-        clock += 1
-        while not basic.done() and clock < 150:
-            if Globals.DEBUG and not (clock % 5):
-                print "\n##########\n" + str(clock) + ": Tick..."
-            basic.tick()
-            clock += 1
+        clock = run(basic)
     except:
         print "\n!!!!!!!!!!!!!!!!!!!!!!!\n!!! Caught an error !!!\n!!!!!!!!!!!!!!!!!!!!!!!"
-        print "Clock: " + str(clock)
+        print "Clock: " + str(basic.clock)
         printDPDebug(basic)
         print_exc()
         exit(1)
 
+    if basic.trace:
+        basic.trace.close()
+
     print "\nCompleted in " + str(clock) + " clock cycles!"
-    printRAM(Globals.basicRAM)
+    if isinstance(basic, VLIWRISC):
+        print "Instructions per clock: %.3f" % basic.getIPC()
+    if isinstance(basic, BasicRISC) and basic.pipe.predictor:
+        print "\n".join(basic.pipe.predictor.report(basic.program))
+    if isinstance(basic, BasicRISC) and basic.pipe.cache:
+        print "\n".join(basic.pipe.cache.report())
+    if isinstance(basic, BasicRISC) and basic.pipe.counters:
+        print "\n".join(basic.pipe.counters.report())
+    printProgram(basic.program)
+    printRAM(basic.RAM)
     print basic.Rn
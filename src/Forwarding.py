@@ -0,0 +1,91 @@
+"""
+@author: David Zemon
+
+@summary: Provide a forwarded version of the basic RISC pipeline; Results are bypassed to
+    decode from the instruction that has just left execute (EX->EX), the instruction that has
+    just left memory (MEM->EX) and the write stage's output buffer, instead of stalling decode
+    until they reach the register file
+
+    Two hazards still stall decode:
+        - Load-use: A load has only computed its address when it leaves execute, so an
+          instruction that needs the loaded value must wait one cycle for memory
+        - RAM: Values stored to RAM are never forwarded, so an instruction reading RAM that
+          an earlier store has not yet written must wait, exactly as in the basic pipe
+"""
+
+import Globals
+import Trace
+from BasicRISC import BasicRISC, RISCPipe
+
+
+class ForwardingPipe(RISCPipe):
+    """
+    @summary: A RISC pipe with forwarding; Built from the same stages as RISCPipe, and only
+            decides differently whether decode must stall and which register values it sees
+    """
+
+    def stall (self):
+        """
+        @summary: Return a boolean description for whether or not the pipe should insert a
+                stall after decode; Any register value that can be forwarded is placed in
+                decodeRn, an overlay of the register file that decode reads from this cycle
+        """
+        trace = self.trace
+        dependInstr = self.stages['d'].IR
+        if trace:
+            trace.record(Trace.TRACE_STALL_CHECK, dependInstr)
+
+        self.decodeRn = self.Rn
+        srcMask = dependInstr.srcMask
+        if 0 == srcMask:
+            return False
+
+        write = self.stages['w']
+        memory = self.stages['m']
+        outputBuf = write.outputBuf
+
+        # Find every value that must be bypassed, oldest first, so that the newest wins
+        bypass = []
+        if outputBuf["Valid"] and srcMask & outputBuf["Dest"].writeMask:
+            bypass.append(("WRITEBACK", outputBuf["Dest"], outputBuf["Value"]))
+
+        for name, independInstr in [("WRITE", write.IR), ("MEMORY", memory.IR)]:
+            if not (srcMask & independInstr.dstMask):
+                continue
+
+            if not independInstr.writesReg:
+                self.stallReason = "RAW"
+                return True
+
+            opcode = independInstr.opcode
+            if "WRITE" == name:
+                value = write.inputBuf
+            elif Globals.OP_MOV == opcode and independInstr.ops[1].ldStr:
+                self.stallReason = "load-use"
+                return True
+            elif Globals.OP_MOV == opcode:
+                value = memory.input["B"]
+            else:
+                value = memory.input["A"]
+            bypass.append((name, independInstr.ops[0], value))
+
+        if bypass:
+            self.decodeRn = dict(self.Rn)
+            for name, dest, value in bypass:
+                if trace:
+                    trace.record(Trace.TRACE_FORWARD, name, dest.reg, value)
+                self.decodeRn[dest.reg] = value
+
+        return False
+
+
+class ForwardingRISC(BasicRISC):
+    """
+    @summary: The basic RISC datapath with a forwarding pipe
+    """
+
+    PIPE = ForwardingPipe
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,150 @@
+"""
+@author: David Zemon
+
+@summary: Execute programs one whole instruction at a time, with no pipeline modelling, so
+    that long programs can be fast-forwarded to a region of interest before handing the
+    architectural state to a cycle-accurate datapath such as BasicRISC
+"""
+
+import Globals
+from BasicRISC import BasicRISC
+from UniversalComponents import FltFU, IntFU
+
+
+class FunctionalRISC:
+    """
+    @summary: ISA-level interpreter for the same instructions and addressing modes as the
+            pipelined datapaths; Results are computed by the same functional units the
+            pipelines use, so the two can never disagree on arithmetic
+    """
+
+    def __init__ (self, program, ram, Rn):
+        """
+        @param program: Instruction memory
+        @param ram: Data memory
+        @param Rn: Register file
+        """
+        self.program = program
+        self.RAM = ram
+        self.Rn = Rn
+        self.PC = 0
+        self.retired = 0
+        self.result = {"A": None, "B": None}
+        self.funcUnits = {"INT": IntFU(self.result), "FLT": FltFU(self.result)}
+
+    def done (self):
+        return not (0 <= self.PC < len(self.program))
+
+    def step (self):
+        """
+        @summary: Execute the instruction at PC and advance to the next one
+        """
+        Rn = self.Rn
+        ram = self.RAM
+        instr = self.program[self.PC]
+        opcode = instr.opcode
+        self.PC += 1
+        self.retired += 1
+
+        if Globals.OP_NOP == opcode:
+            return
+
+        # Gather the functional unit's inputs exactly as the decode stage would
+        if opcode in Globals.JUMP_OPS:
+            A = instr.getSrcOpVal(0, Rn, ram)
+            if Globals.OP_SJMP == opcode:
+                B = self.PC
+            elif Globals.OP_DJNZ == opcode:
+                B = self.PC + instr.getSrcOpVal(1, Rn, ram)
+            else:
+                B = instr.getSrcOpVal(1, Rn, ram)
+        elif Globals.OP_MOV == opcode:
+            A = None
+            if instr.ops[0].ldStr:
+                A = instr.getSrcOpVal(0, Rn, ram)
+            B = instr.getSrcOpVal(1, Rn, ram)
+        else:
+            A = instr.getSrcOpVal(1, Rn, ram)
+            B = instr.getSrcOpVal(2, Rn, ram)
+
+        FU = self.funcUnits[instr.FU]
+        FU.load(opcode, A, B)
+        FU.writeResult()
+        result = self.result
+
+        # Resolve jumps, loads and stores
+        if opcode in Globals.JUMP_OPS:
+            if opcode in Globals.UCND_JMP_OPS or (Globals.OP_JZ == opcode and 0 == result["A"]) or \
+                    (Globals.OP_DJNZ == opcode and 0 != result["A"]):
+                self.PC = result["B"]
+            value = result["A"]
+        elif Globals.OP_MOV == opcode:
+            if instr.ops[0].ldStr:
+                ram[result["A"]] = result["B"]
+                return
+            elif instr.ops[1].ldStr:
+                value = ram[result["B"]]
+            else:
+                value = result["B"]
+        else:
+            value = result["A"]
+
+        if instr.writesReg:
+            instr.ops[0].setVal(value, Rn, ram)
+
+    def fastForward (self, count):
+        """
+        @summary: Execute up to 'count' instructions, stopping early if the program ends
+
+        @return: Number of instructions executed
+        """
+        executed = 0
+        while executed < count and not self.done():
+            self.step()
+            executed += 1
+        return executed
+
+    def runToPC (self, PC, limit = None):
+        """
+        @summary: Execute instructions until the program counter reaches PC, the program ends,
+                or 'limit' instructions (default: Globals.MAX_CLOCK) have been executed
+
+        @return: Number of instructions executed
+        """
+        if None == limit:
+            limit = Globals.MAX_CLOCK
+
+        executed = 0
+        while PC != self.PC and executed < limit and not self.done():
+            self.step()
+            executed += 1
+        return executed
+
+    def run (self):
+        """
+        @summary: Execute the program to completion
+
+        @return: Number of instructions executed
+        """
+        return self.runToPC(None)
+
+    def handOff (self, datapath):
+        """
+        @summary: Continue execution on a cycle-accurate datapath from the current point; The
+                datapath must share this interpreter's program, RAM and register file and must
+                not yet have been ticked. Any datapath in FinalProject.MODELS may be used
+        """
+        if datapath.program is not self.program or datapath.RAM is not self.RAM or datapath.Rn is not self.Rn:
+            raise Exception("Functional interpreter and datapath must share program, RAM and register file")
+        if datapath.clock:
+            raise Exception("Cannot hand off to a datapath that has already been ticked")
+
+        if isinstance(datapath, BasicRISC):
+            datapath.pipe.stages['f'].PC = self.PC
+        else:
+            # The scoreboard datapaths issue straight from their own PC
+            datapath.PC = self.PC
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
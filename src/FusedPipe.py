@@ -0,0 +1,212 @@
+"""
+@author: David Zemon
+
+@summary: A fast engine for the basic RISC pipe; The five stages of RISCPipe.tick are fused
+    into a single loop over local variables, with no per-stage objects or method calls, and
+    the state of the pipe's stages is only read before and written back after the loop, so
+    the two engines can be switched between at any cycle
+
+    The engine implements exactly the semantics of RISCPipe with no tracer, no performance
+    counters, no branch predictor and no data cache; BasicRISC only uses it in that case (see
+    Globals.FUSED_ENGINE), and Bench.py --lockstep checks the two agree on every cycle.
+"""
+
+import Globals
+
+
+def run (pipe, limit):
+    """
+    @summary: Simulate up to 'limit' clock cycles of a RISCPipe, stopping early once the
+            pipe is done
+
+    @return: Number of clock cycles simulated
+    """
+    # Everything used in the loop is a local variable
+    OP_NOP = Globals.OP_NOP
+    OP_MOV = Globals.OP_MOV
+    OP_SJMP = Globals.OP_SJMP
+    OP_DJNZ = Globals.OP_DJNZ
+    OP_JZ = Globals.OP_JZ
+    JUMP_OPS = Globals.JUMP_OPS
+    UCND_JMP_OPS = Globals.UCND_JMP_OPS
+    TRIPLE_OPS = Globals.TRIPLE_OPS
+    INIT_INSTR = Globals.INIT_INSTR
+
+    Rn = pipe.Rn
+    RAM = pipe.RAM
+    program = pipe.program
+    programLen = len(program)
+
+    fetch = pipe.stages['f']
+    decode = pipe.stages['d']
+    execute = pipe.stages['e']
+    memory = pipe.stages['m']
+    write = pipe.stages['w']
+    funcUnits = execute.funcUnits
+    outputBuf = write.outputBuf
+
+    PC = fetch.PC
+    dIR = decode.IR
+    dPC = decode.PC
+    dPredictedPC = decode.predictedPC
+    eIR = execute.IR
+    eA = execute.input["A"]
+    eB = execute.input["B"]
+    ePC = execute.PC
+    ePredictedPC = execute.predictedPC
+    runningFU = execute.runningFU
+    mIR = memory.IR
+    mPC = memory.PC
+    mInput = memory.input  # Also the output of both functional units
+    wIR = write.IR
+    wInput = write.inputBuf
+    outValid = outputBuf["Valid"]
+    outDest = outputBuf.get("Dest")
+    outValue = outputBuf["Value"]
+    stalls = 0
+
+    cycles = 0
+    while cycles < limit:
+        cycles += 1
+
+        # Write
+        if wIR.writesReg:
+            outValid = True
+            outDest = wIR.ops[0]
+            outValue = wInput
+        else:
+            outValid = False
+
+        # Memory; Stores never reach write
+        opcode = mIR.opcode
+        if OP_MOV == opcode:
+            if mIR.ops[0].ldStr:
+                RAM[mInput["A"]] = mInput["B"]
+            else:
+                if mIR.ops[1].ldStr:
+                    wInput = RAM[mInput["B"]]
+                else:
+                    wInput = mInput["B"]
+                wIR = mIR
+        else:
+            wInput = mInput["A"]
+            wIR = mIR
+
+        # Execute
+        opcode = eIR.opcode
+        if None == runningFU and OP_NOP != opcode:
+            runningFU = funcUnits[eIR.FU]
+            runningFU.load(opcode, eA, eB)
+
+        if runningFU:
+            runningFU.delay -= 1
+            if 0 == runningFU.delay:
+                runningFU.writeResult()
+                if opcode in JUMP_OPS:
+                    if opcode in UCND_JMP_OPS or (OP_JZ == opcode and 0 == mInput["A"]) or \
+                            (OP_DJNZ == opcode and 0 != mInput["A"]):
+                        PC = mInput["B"]
+                        dIR = INIT_INSTR
+                runningFU = None
+            else:
+                # Nothing moves while the functional unit is busy
+                mIR = INIT_INSTR
+                mInput["A"] = None
+                mInput["B"] = None
+                if outValid:
+                    outDest.setVal(outValue, Rn, RAM)
+                continue
+        mIR = eIR
+        mPC = ePC
+
+        # Stall decode on a RAW hazard
+        srcMask = dIR.srcMask
+        if srcMask:
+            pending = wIR.dstMask | mIR.dstMask
+            if outValid:
+                pending |= outDest.writeMask
+            if srcMask & pending:
+                stalls += 1
+                eIR = INIT_INSTR
+                eA = None
+                eB = None
+                if outValid:
+                    outDest.setVal(outValue, Rn, RAM)
+                continue
+
+        # Decode
+        opcode = dIR.opcode
+        ops = dIR.ops
+        if opcode in JUMP_OPS:
+            eA = ops[0].getVal(Rn, RAM)
+            if OP_SJMP == opcode:
+                eB = dPC + 1
+            elif OP_DJNZ == opcode:
+                eB = dPC + 1 + ops[1].getVal(Rn, RAM)
+            elif OP_JZ == opcode:
+                eB = ops[1].getVal(Rn, RAM)
+            else:
+                eB = None
+        elif OP_MOV == opcode:
+            if ops[0].ldStr:
+                eA = ops[0].getAddress(Rn)
+            if ops[1].ldStr:
+                eB = ops[1].getAddress(Rn)
+            else:
+                eB = ops[1].getVal(Rn, RAM)
+        elif OP_NOP == opcode:
+            eA = None
+            eB = None
+        else:
+            eA = ops[1].getVal(Rn, RAM)
+            if opcode in TRIPLE_OPS:
+                eB = ops[2].getVal(Rn, RAM)
+            else:
+                eB = None
+        eIR = dIR
+        ePC = dPC
+        ePredictedPC = dPredictedPC
+
+        if outValid:
+            outDest.setVal(outValue, Rn, RAM)
+
+        # Fetch
+        if 0 <= PC < programLen:
+            dIR = program[PC]
+            dPC = PC
+            PC += 1
+            dPredictedPC = PC
+        else:
+            dIR = INIT_INSTR
+
+        # Stop as soon as the pipe is done, exactly as RISCPipe.done() would
+        if OP_NOP == dIR.opcode and OP_NOP == eIR.opcode and OP_NOP == mIR.opcode and OP_NOP == wIR.opcode:
+            break
+
+    # Hand the state back to the stages
+    fetch.PC = PC
+    decode.IR = dIR
+    decode.PC = dPC
+    decode.predictedPC = dPredictedPC
+    execute.IR = eIR
+    execute.input["A"] = eA
+    execute.input["B"] = eB
+    execute.PC = ePC
+    execute.predictedPC = ePredictedPC
+    execute.runningFU = runningFU
+    memory.IR = mIR
+    memory.PC = mPC
+    write.IR = wIR
+    write.inputBuf = wInput
+    outputBuf["Valid"] = outValid
+    outputBuf["Value"] = outValue
+    if None != outDest:
+        outputBuf["Dest"] = outDest
+    if stalls:
+        pipe.stallCounts["RAW"] = pipe.stallCounts.get("RAW", 0) + stalls
+
+    return cycles
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -1,17 +1,44 @@
-DEBUG = True
-
-basicRAM = None
+DEBUG = False  # Print every pipeline event as it happens (see Trace.py)
+TRACE_FILE = None  # Or record them to a binary trace file for PrintTrace.py
+COUNTERS_FILE = None  # Write performance counters (see PerfCounters.py) to this JSON file after each run
 
 COMMENT_CHARS = ['#']
+IMAGE_CACHE_DIR = ".imagecache"  # Assembled program images are kept here; None disables the cache
+RESULT_CACHE_DIR = ".resultcache"  # Results of sweep runs are kept here (see ResultCache.py); None disables it...
+RESULT_CACHE_BYTES = 2 ** 26  # ...and the least recently used are deleted once they take more space than this
+
+RAM_SIZE = 2 ** 32  # Data memory address space; Instructions live in a separate memory
+BATCH_RAM_SIZE = 2 ** 10  # RAM cells of each machine simulated by BatchRISC.py, which are not paged
 
-RAM_SIZE = 256
-RAM = [None] * RAM_SIZE
+MAX_CLOCK = 100000  # Give up on any program that has not completed within this many cycles
+SKIP_AHEAD = True  # Advance over cycles spent waiting on a busy functional unit in one step
+FUSED_ENGINE = False  # Run the basic pipe with the single-loop engine in FusedPipe.py where possible
+LOOP_EXTRAPOLATION = True  # Skip the remaining iterations of loops found in a steady state (see SteadyState.py)
+CHECKPOINT_INTERVAL = None  # Save a checkpoint every this many cycles (see Checkpoint.py)...
+CHECKPOINT_FILE = "checkpoint.rckp"  # ...to this file
 
 DEFAULT_REG_FILE = {"R0": None, "R1": None, "R2": None, "R3": None, "F0": None, "F1": None, "F2": None, "F3": None}
 REVERSE_STAGE_ORDER = ['w', 'm', 'e', 'd', 'f']
 STAGE_NAMES = {'f': "FETCH", 'd': "DECODE", 'e': "EXECUTE", 'm': "MEMORY", 'w': "WRITE"}
 INIT_INSTR = None
 
+# Opcodes - each instruction is decoded once (see RISC_Instr) into one of these integers
+OP_NOP, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_OR, OP_AND, OP_NAND, OP_XOR, OP_NEG, OP_SHL, OP_SHR, OP_MOV, \
+    OP_SJMP, OP_LJMP, OP_JZ, OP_DJNZ = range(17)
+OPCODE_NAMES = ["nop", "add", "sub", "mul", "div", "or", "and", "nand", "xor", "neg", "shl", "shr", "mov",
+                "sjmp", "ljmp", "jz", "djnz"]
+OPCODES = dict((name, opcode) for opcode, name in enumerate(OPCODE_NAMES))
+
+# Operand kinds
+OPND_REG, OPND_INDIRECT, OPND_IMMEDIATE, OPND_DIRECT = range(4)
+
+# Hazard masks - every location an operand can read or write is given a bit, so that RAW hazards
+# are found with a single AND (see FlexibleOp.decodeMasks)
+REG_NAMES = sorted(DEFAULT_REG_FILE)
+MASK_INDIRECT_SHIFT = len(REG_NAMES)  # RAM addressed through each register
+MASK_DIRECT_SHIFT = 2 * len(REG_NAMES)  # Direct RAM addresses...
+MASK_DIRECT_BITS = 64  # ...folded into this many bits; Aliased addresses can only cause extra stalls
+
 # Instruction categories
 MOV_INSTRS = ["mov"]
 MATH_INSTRS = ["add", "sub", "mul", "div"]
@@ -28,12 +55,43 @@ MULTI_OPERANDS = DOUBLE_OPERANDS + TRIPLE_OPERANDS
 NO_WRITE = ["nop", "jz"] + UCND_JMP_INSTRS
 NO_READ = ["nop"] + UCND_JMP_INSTRS
 
+# Opcode equivalents of the above categories
+MOV_OPS = frozenset(OPCODES[name] for name in MOV_INSTRS)
+MATH_OPS = frozenset(OPCODES[name] for name in MATH_INSTRS)
+LOGIC_OPS = frozenset(OPCODES[name] for name in LOGIC_INSTRS)
+SHIFT_OPS = frozenset(OPCODES[name] for name in SHIFT_INSTRS)
+UCND_JMP_OPS = frozenset(OPCODES[name] for name in UCND_JMP_INSTRS)
+CND_JMP_OPS = frozenset(OPCODES[name] for name in CND_JMP_INSTRS)
+JUMP_OPS = frozenset(OPCODES[name] for name in JUMP_INSTRS)
+TRIPLE_OPS = frozenset(OPCODES[name] for name in TRIPLE_OPERANDS)
+NO_WRITE_OPS = frozenset(OPCODES[name] for name in NO_WRITE)
+NO_READ_OPS = frozenset(OPCODES[name] for name in NO_READ)
+ALU_OPS = MATH_OPS | LOGIC_OPS | SHIFT_OPS
+
 # Functional Unit Constants
 INTEGER_DELAY = 2
 FLOATING_POINT_DELAY = 5
 MISC_DELAY = 1
+# Initiation intervals - cycles after starting an operation of each class before its unit can
+# start another; None means the unit is not pipelined, so the interval is the delay. Only the
+# multi-issue datapath overlaps operations in one unit (see VLIW.py)
+INTEGER_II = None
+FLOATING_POINT_II = None
+MISC_II = None
 FLT_PIPES = 1
 INT_PIPES = 3
+ISSUE_WIDTH = 4  # Instructions a multi-issue datapath may issue per clock (see VLIW.py)
+BRANCH_PREDICTOR = None  # Name of a predictor in BranchPredict.PREDICTORS; None resolves every jump in execute
+PREDICTOR_SIZE = 16  # Entries in the branch predictor's table
+
+# Data cache of the basic and forwarding datapaths (see Cache.py)
+CACHE_SIZE = None  # Capacity in words; None disables the cache, so every access takes one cycle
+CACHE_ASSOCIATIVITY = 2  # Lines in each set
+CACHE_LINE_SIZE = 4  # Words in each line
+CACHE_POLICY = "lru"  # Line evicted from a full set; "lru" or "random"
+CACHE_HIT_DELAY = 1  # Cycles taken by a hit
+CACHE_MISS_DELAY = 10  # Cycles taken to move a line between the cache and RAM
+CACHE_WRITE_BACK = True  # Stores mark their line dirty; False writes every store through to RAM
 
 if __name__ == "__main__":
     raise Exception("Cannot call this file directly")
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+@author: David Zemon
+
+@summary: Measure how fast the simulator itself runs on this host - simulated cycles per
+    second for whole programs and calls per second for the hot paths of the pipeline - and
+    compare against a saved baseline so that speed regressions are caught; If NumPy is
+    installed, the total rate of many copies of each program run by BatchRISC is measured too
+
+    Usage: python HostBench.py [-o RESULTS.json] [-b BASELINE.json] [-t TOLERANCE] [-r REPEAT]
+
+    Each benchmark is repeated and the fastest repetition is kept, since slower ones only
+    measure interference from the rest of the host.
+"""
+
+from argparse import ArgumentParser
+from glob import glob
+from timeit import Timer
+import json
+import os
+import platform
+import sys
+import Globals
+import FinalProject
+import Bench
+from Memory import Memory
+from UniversalComponents import FlexibleOp, IntFU, RISC_Instr
+
+try:
+    import BatchRISC
+except ImportError:  # NumPy is only needed by the batched engine
+    BatchRISC = None
+
+# Microbenchmark calls per repetition
+CALLS = 100000
+
+# Programs are run back to back until at least this many cycles have been simulated per repetition
+PROGRAM_CYCLES = 50000
+
+# Machines simulated at once by BatchRISC
+BATCH_COUNT = 1000
+
+
+def getPrograms ():
+    return [os.path.join(os.path.dirname(Bench.BENCHMARK_DIR), "instructionList.asm")] + \
+           sorted(glob(os.path.join(Bench.BENCHMARK_DIR, "*.asm")))
+
+
+def timeBest (function, number, repeat):
+    """
+    @return: Fastest time, in seconds, taken by 'number' calls of function
+    """
+    return min(Timer(function).repeat(repeat, number))
+
+
+def benchProgram (filename, repeat, fused = False):
+    """
+    @return: Simulated cycles per host second of BasicRISC running a whole program; Skipping
+            ahead and loop extrapolation are disabled so that every cycle goes through
+            BasicRISC.tick, or through FusedPipe if 'fused' is set
+    """
+    image = FinalProject.loadImage(filename)
+
+    def runProgram ():
+        return FinalProject.run(FinalProject.loadProgram(filename, image))
+
+    skipAhead = Globals.SKIP_AHEAD
+    fusedEngine = Globals.FUSED_ENGINE
+    loopExtrapolation = Globals.LOOP_EXTRAPOLATION
+    Globals.SKIP_AHEAD = False
+    Globals.LOOP_EXTRAPOLATION = False
+    Globals.FUSED_ENGINE = fused
+    try:
+        cycles = runProgram()
+        number = max(1, PROGRAM_CYCLES // cycles)
+        seconds = timeBest(runProgram, number, repeat)
+    finally:
+        Globals.SKIP_AHEAD = skipAhead
+        Globals.FUSED_ENGINE = fusedEngine
+        Globals.LOOP_EXTRAPOLATION = loopExtrapolation
+
+    return cycles * number / seconds
+
+
+def benchBatch (filename, repeat):
+    """
+    @return: Simulated cycles per host second, summed over BATCH_COUNT copies of a program run
+            at once by BatchRISC
+    """
+    image = FinalProject.loadImage(filename)
+
+    def runBatch ():
+        return BatchRISC.BatchRISC(image, BATCH_COUNT).run().sum()
+
+    return runBatch() / timeBest(runBatch, 1, repeat)
+
+
+def getStallDatapath ():
+    """
+    @return: A datapath whose decode stage holds an instruction with source operands, so that
+            RISCPipe.stall() has real work to do
+    """
+    datapath = FinalProject.loadProgram(getPrograms()[0])
+    while not datapath.pipe.stages['d'].IR.srcOps or datapath.pipe.stages['e'].runningFU:
+        datapath.tick()
+    return datapath
+
+
+def getMicrobenchmarks ():
+    """
+    @return: List of (name, function) to be timed; Each function makes one call of a hot path
+    """
+    Rn = dict(Globals.DEFAULT_REG_FILE)
+    Rn["R1"] = 5
+    ram = Memory()
+    ram[5] = 42
+    register = FlexibleOp("R1")
+    immediate = FlexibleOp("#7")
+    indirect = FlexibleOp("@R1")
+    instr = RISC_Instr("add", ["R2", "R1", "@R1"])
+
+    pipe = getStallDatapath().pipe
+
+    FU = IntFU({"A": None, "B": None})
+    FU.load(Globals.OP_ADD, 3, 4)
+
+    return [
+        ("FlexibleOp.getVal[reg]", lambda: register.getVal(Rn, ram)),
+        ("FlexibleOp.getVal[imm]", lambda: immediate.getVal(Rn, ram)),
+        ("FlexibleOp.getVal[indirect]", lambda: indirect.getVal(Rn, ram)),
+        ("RISC_Instr.getSrcOps", instr.getSrcOps),
+        ("RISCPipe.stall", pipe.stall),
+        ("IntFU.writeResult", FU.writeResult)
+    ]
+
+
+def runAll (repeat):
+    """
+    @return: dict mapping each benchmark's name to its rate (per host second)
+    """
+    results = {}
+    for filename in getPrograms():
+        results["cycles/s " + os.path.basename(filename)] = benchProgram(filename, repeat)
+        results["cycles/s fused " + os.path.basename(filename)] = benchProgram(filename, repeat, True)
+        if BatchRISC:
+            results["cycles/s batch " + os.path.basename(filename)] = benchBatch(filename, repeat)
+    for name, function in getMicrobenchmarks():
+        results["calls/s " + name] = CALLS / timeBest(function, CALLS, repeat)
+    return results
+
+
+def compareResults (results, baseline, tolerance):
+    """
+    @return: List of (name, rate, baseline rate, change) tuples, and whether any benchmark is
+            slower than its baseline by more than the tolerance (a fraction)
+    """
+    rows = []
+    regressed = False
+    for name in sorted(results):
+        old = baseline.get(name)
+        change = None
+        if old:
+            change = results[name] / old - 1
+            if change < -tolerance:
+                regressed = True
+        rows.append((name, results[name], old, change))
+    return rows, regressed
+
+
+def saveResults (results, filename):
+    f = open(filename, 'w')
+    json.dump({"python": platform.python_version(), "platform": platform.platform(), "results": results}, f,
+              indent = 2, sort_keys = True)
+    f.write('\n')
+    f.close()
+
+
+def loadResults (filename):
+    f = open(filename, 'r')
+    results = json.load(f)["results"]
+    f.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description = "Measure the speed of the simulator on this host")
+    parser.add_argument("-o", "--output", default = None, help = "save the results to this JSON file")
+    parser.add_argument("-b", "--baseline", default = None, help = "compare against results saved by an earlier run")
+    parser.add_argument("-t", "--tolerance", type = float, default = 0.15,
+                        help = "fraction a rate may drop below the baseline before it is a regression (default: 0.15)")
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "repetitions of each benchmark (default: 5)")
+    args = parser.parse_args()
+
+    results = runAll(args.repeat)
+
+    baseline = {}
+    if args.baseline:
+        baseline = loadResults(args.baseline)
+    rows, regressed = compareResults(results, baseline, args.tolerance)
+
+    width = max(len(name) for name in results)
+    for name, rate, old, change in rows:
+        line = name.ljust(width) + ("%14.0f" % rate)
+        if None != change:
+            line += "  %+6.1f%% vs %.0f" % (100 * change, old)
+            if change < -args.tolerance:
+                line += "  SLOWER"
+        print line
+
+    if args.output:
+        saveResults(results, args.output)
+
+    if regressed:
+        sys.exit(1)
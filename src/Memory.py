@@ -0,0 +1,84 @@
+"""
+@author: David Zemon
+
+@summary: Provide data memory owned by a single machine instance; Memory is split into
+        pages that are only allocated once touched, so the footprint of a machine scales
+        with the data it uses rather than with its address space
+"""
+
+import Globals
+
+PAGE_BITS = 8
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+
+class Memory(object):
+    """
+    @summary: Paged, lazily allocated data memory for one machine; Reads of cells that have
+            never been written return None, and any access outside of the address space
+            raises an IndexError
+    """
+
+    __slots__ = ("size", "pages")
+
+    def __init__ (self, size = None):
+        """
+        @param size: Number of addressable cells; Defaults to Globals.RAM_SIZE
+        """
+        if None == size:
+            size = Globals.RAM_SIZE
+        self.size = size
+        self.pages = {}
+
+    def __len__ (self):
+        return self.size
+
+    def __getitem__ (self, address):
+        # Only in-range pages are ever allocated, so the common case needs no bounds check
+        page = self.pages.get(address >> PAGE_BITS)
+        if None != page:
+            return page[address & PAGE_MASK]
+
+        self.checkBounds(address)
+        return None
+
+    def __setitem__ (self, address, value):
+        pageNum = address >> PAGE_BITS
+        page = self.pages.get(pageNum)
+        if None == page:
+            self.checkBounds(address)
+            page = [None] * PAGE_SIZE
+            self.pages[pageNum] = page
+        page[address & PAGE_MASK] = value
+
+    def __iter__ (self):
+        # Without this, Python would try to iterate over the whole address space
+        raise TypeError("Memory cannot be iterated over; Use getCells() instead")
+
+    def checkBounds (self, address):
+        if address < 0 or address >= self.size:
+            raise IndexError("RAM address out of range: " + str(address))
+
+    def getCells (self):
+        """
+        @summary: Return every cell holding data, as a sorted list of (address, value)
+        """
+        cells = []
+        for pageNum in sorted(self.pages):
+            page = self.pages[pageNum]
+            base = pageNum << PAGE_BITS
+            for offset, value in enumerate(page):
+                if None != value:
+                    cells.append((base + offset, value))
+        return cells
+
+    def getFootprint (self):
+        """
+        @return: Number of pages this machine has allocated
+        """
+        return len(self.pages)
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
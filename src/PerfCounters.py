@@ -0,0 +1,127 @@
+"""
+@author: David Zemon
+
+@summary: Hardware-style performance counters for the RISC pipes; Like tracing, counting is
+    switched on by attaching a PerfCounters object and costs a single truth test when off
+
+    Every clock cycle is given exactly one cause, from the point of view of decode:
+        - issue: A real instruction was decoded
+        - bubble: Decode held a nop while the pipe filled or drained (or the program has nops)
+        - branch-flush: Decode lost its slot to a jump that redirected fetch
+        - fu-busy: Execute was waiting on a multi-cycle functional unit
+        - memory: Memory was waiting on the data cache (see Cache.py)
+        - RAW, load-use: Decode stalled on a hazard (see RISCPipe.stall)
+    and is charged to one instruction address: the instruction decoded or stalled, the
+    instruction running in execute or memory, or the jump that caused a flush. Bubbles are
+    not charged.
+"""
+
+import json
+
+CAUSE_ISSUE = "issue"
+CAUSE_BUBBLE = "bubble"
+CAUSE_FLUSH = "branch-flush"
+CAUSE_FU_BUSY = "fu-busy"
+CAUSE_MEMORY = "memory"
+
+# Causes that are not lost cycles
+PRODUCTIVE_CAUSES = [CAUSE_ISSUE, CAUSE_BUBBLE]
+
+
+class PerfCounters(object):
+    def __init__ (self):
+        self.cycles = 0
+        self.retired = 0
+        self.causes = {}
+        self.FUBusy = {}
+        self.PCCycles = {}
+
+        # Set by execute when it squashes decode, and cleared when the squashed cycle is counted
+        self.flushPC = None
+
+    def recordCycle (self, cause, PC):
+        self.cycles += 1
+        self.causes[cause] = self.causes.get(cause, 0) + 1
+        self.PCCycles[PC] = self.PCCycles.get(PC, 0) + 1
+
+    def recordIdle (self, cycles, FU, PC):
+        """
+        @summary: Count cycles that were skipped while a functional unit was busy
+        """
+        self.cycles += cycles
+        self.causes[CAUSE_FU_BUSY] = self.causes.get(CAUSE_FU_BUSY, 0) + cycles
+        self.PCCycles[PC] = self.PCCycles.get(PC, 0) + cycles
+        self.FUBusy[FU] = self.FUBusy.get(FU, 0) + cycles
+
+    def recordFU (self, FU):
+        self.FUBusy[FU] = self.FUBusy.get(FU, 0) + 1
+
+    def getCPI (self):
+        if not self.retired:
+            return None
+        return float(self.cycles) / self.retired
+
+    def getStalls (self):
+        """
+        @return: dict mapping every cause of lost cycles to the number of cycles it cost
+        """
+        return dict((cause, count) for cause, count in self.causes.items() if cause not in PRODUCTIVE_CAUSES)
+
+    def toDict (self, program = None, predictor = None):
+        """
+        @summary: Collect every counter into plain values, suitable for JSON
+
+        @param program: Instruction memory; If given, each address is listed with its instruction
+        @param predictor: Branch predictor whose accuracy should be included
+        """
+        utilization = {}
+        for FU, busy in self.FUBusy.items():
+            utilization[FU] = {"busy": busy, "utilization": float(busy) / self.cycles if self.cycles else None}
+
+        PCs = []
+        for PC in sorted(self.PCCycles, key = lambda PC: (None == PC, PC)):
+            if None == PC:
+                continue
+            entry = {"pc": PC, "cycles": self.PCCycles[PC]}
+            if program:
+                entry["instr"] = program[PC].getStr()
+            PCs.append(entry)
+
+        counters = {
+            "cycles": self.cycles,
+            "retired": self.retired,
+            "CPI": self.getCPI(),
+            "causes": dict(self.causes),
+            "stalls": self.getStalls(),
+            "FUs": utilization,
+            "PCs": PCs
+        }
+        if predictor:
+            counters["predictor"] = {"name": predictor.name, "accuracy": predictor.getAccuracy()}
+
+        return counters
+
+    def save (self, filename, program = None, predictor = None):
+        f = open(filename, 'w')
+        json.dump(self.toDict(program, predictor), f, indent = 2, sort_keys = True)
+        f.write('\n')
+        f.close()
+
+    def report (self):
+        """
+        @return: Lines of text summarizing the counters
+        """
+        lines = ["Cycles: " + str(self.cycles) + "\tRetired: " + str(self.retired)]
+        if self.retired:
+            lines[0] += "\tCPI: %.3f" % self.getCPI()
+
+        for cause, count in sorted(self.causes.items()):
+            lines.append("\t" + cause.ljust(14) + str(count).rjust(7) + " cycles")
+        for FU, busy in sorted(self.FUBusy.items()):
+            lines.append("\t" + (FU + " FU").ljust(18) + ("%.1f%%" % (100.0 * busy / self.cycles)).rjust(7) + " busy")
+
+        return lines
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,18 @@
+"""
+@author: David Zemon
+
+@summary: Pretty-print a binary trace file recorded by Trace.FileTracer or Trace.Tracer.save()
+
+    Usage: python PrintTrace.py <trace file>
+"""
+
+import sys
+import Trace
+
+
+if __name__ == "__main__":
+    if 2 != len(sys.argv):
+        print "Usage: python PrintTrace.py <trace file>"
+        exit(1)
+
+    Trace.TracePrinter().printEvents(Trace.readTraceFile(sys.argv[1]))
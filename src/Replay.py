@@ -0,0 +1,570 @@
+"""
+@author: David Zemon
+
+@summary: Record the dynamic instruction stream of a program once, with the functional
+    interpreter, and replay it through any number of timing models in a single pass, so that
+    comparing K pipelines or K timing configurations costs one functional execution
+
+    The timing of every datapath depends only on which instructions execute, in what order,
+    and which jumps are taken and where to - hazards are found with the static masks of each
+    instruction (see RISC_Instr) and never with the values computed. A timing model therefore
+    moves instructions through the same stages and hazard checks as its datapath without
+    computing anything, and takes exactly as many cycles. Branch predictors and data caches
+    are driven by the recorded jumps and addresses, so they learn exactly as they would in the
+    datapath.
+
+    A trace holds the program once, followed by one fixed-size record per executed
+    instruction: its address (from which the opcode and operands are found), whether it was
+    a taken jump and either the RAM address it loaded or stored or the address it jumped to,
+    if any.
+"""
+
+from copy import deepcopy
+import marshal
+import struct
+import zlib
+import Globals
+from BranchPredict import makePredictor
+from Cache import Cache
+from Checkpoint import decodeInstr, encodeInstr
+from Functional import FunctionalRISC
+from Memory import Memory
+from Scoreboard import getReadMask, getWriteMask
+
+REPLAY_MAGIC = "RDYN"
+REPLAY_VERSION = 2
+
+# One record per executed instruction: PC, flags and the RAM address accessed or jump target
+RECORD = struct.Struct("<IBq")
+FLAG_TAKEN = 1
+NO_ADDRESS = -1
+
+# Globals parameters a timing model may be given its own value of
+TIMING_PARAMS = ["INTEGER_DELAY", "FLOATING_POINT_DELAY", "MISC_DELAY", "INTEGER_II", "FLOATING_POINT_II", "MISC_II",
+                 "INT_PIPES", "FLT_PIPES", "ISSUE_WIDTH", "CACHE_SIZE", "CACHE_ASSOCIATIVITY", "CACHE_LINE_SIZE",
+                 "CACHE_POLICY", "CACHE_HIT_DELAY", "CACHE_MISS_DELAY", "CACHE_WRITE_BACK", "BRANCH_PREDICTOR",
+                 "PREDICTOR_SIZE"]
+
+
+def isTaken (opcode, result):
+    """
+    @param result: Output of the functional unit that computed the jump
+
+    @return: True if the jump is taken
+    """
+    return opcode in Globals.UCND_JMP_OPS or (Globals.OP_JZ == opcode and 0 == result["A"]) or \
+        (Globals.OP_DJNZ == opcode and 0 != result["A"])
+
+
+class InstrTrace:
+    """
+    @summary: The dynamic instruction stream of one run of a program
+    """
+
+    def __init__ (self, program, records, completed):
+        """
+        @param records: Packed RECORDs, one per executed instruction
+        @param completed: False if recording stopped before the program ended
+        """
+        self.program = program
+        self.records = records
+        self.completed = completed
+
+    def __len__ (self):
+        return len(self.records) // RECORD.size
+
+    def __iter__ (self):
+        """
+        @summary: Yield (PC, taken, address) for each executed instruction; The address is None
+                unless the instruction loaded or stored RAM or was a taken jump to an address
+        """
+        unpack = RECORD.unpack_from
+        records = self.records
+        for offset in xrange(0, len(records), RECORD.size):
+            PC, flags, address = unpack(records, offset)
+            if NO_ADDRESS == address:
+                address = None
+            yield PC, bool(flags & FLAG_TAKEN), address
+
+    def save (self, filename):
+        f = open(filename, 'wb')
+        f.write(REPLAY_MAGIC)
+        marshal.dump(REPLAY_VERSION, f)
+        marshal.dump([encodeInstr(instr) for instr in self.program], f)
+        marshal.dump(self.completed, f)
+        marshal.dump(zlib.compress(self.records), f)
+        f.close()
+
+
+def load (filename):
+    """
+    @summary: Read a trace written by InstrTrace.save()
+    """
+    f = open(filename, 'rb')
+    try:
+        if REPLAY_MAGIC != f.read(len(REPLAY_MAGIC)):
+            raise Exception("Not an instruction trace: " + filename)
+        version = marshal.load(f)
+        if REPLAY_VERSION != version:
+            raise Exception("Unsupported instruction trace version " + str(version) + " in " + filename)
+        program = [decodeInstr(text) for text in marshal.load(f)]
+        completed = marshal.load(f)
+        records = zlib.decompress(marshal.load(f))
+    finally:
+        f.close()
+
+    return InstrTrace(program, records, completed)
+
+
+def record (program, ram = None, limit = None):
+    """
+    @summary: Execute a program on the functional interpreter, recording every instruction
+
+    @param ram: Initial data memory; Defaults to a new, empty Memory
+    @param limit: Most instructions to record; Defaults to the most that any datapath can
+            issue in Globals.MAX_CLOCK cycles
+
+    @return: InstrTrace
+    """
+    if None == ram:
+        ram = Memory()
+    if None == limit:
+        limit = Globals.MAX_CLOCK * max(1, Globals.ISSUE_WIDTH)
+
+    machine = FunctionalRISC(program, ram, deepcopy(Globals.DEFAULT_REG_FILE))
+    result = machine.result
+    pack = RECORD.pack
+    records = []
+    while len(records) < limit and not machine.done():
+        PC = machine.PC
+        instr = program[PC]
+        machine.step()
+
+        flags = 0
+        address = NO_ADDRESS
+        opcode = instr.opcode
+        if opcode in Globals.JUMP_OPS:
+            if isTaken(opcode, result):
+                flags = FLAG_TAKEN
+                if isinstance(result["B"], (int, long)):
+                    address = result["B"]
+        elif Globals.OP_MOV == opcode:
+            if instr.ops[0].ldStr:
+                address = int(result["A"])
+            elif instr.ops[1].ldStr:
+                address = int(result["B"])
+        records.append(pack(PC, flags, address))
+
+    return InstrTrace(program, ''.join(records), bool(machine.done()))
+
+
+class TimingModel(object):
+    """
+    @summary: Base of the timing models; A model's run() is a generator that is sent one
+            record of the trace at a time, followed by None once the trace has ended, and
+            returns once its pipeline is done or Globals.MAX_CLOCK cycles have passed
+    """
+
+    # Name of the datapath (see FinalProject.MODELS) whose timing is modelled
+    name = None
+
+    def __init__ (self, program, config = None):
+        """
+        @param config: dict of TIMING_PARAMS that should differ from Globals
+        """
+        self.program = program
+        self.config = dict((name, getattr(Globals, name)) for name in TIMING_PARAMS)
+        if config:
+            self.config.update(config)
+        self.clock = 0
+        self.retired = 0
+        self.completed = False
+
+        # Cycles taken in a functional unit by the instruction at each address, and before the
+        # unit can start another
+        timings = [self.getTiming(instr) for instr in program]
+        self.delays = [delay for delay, interval in timings]
+        self.intervals = [interval for delay, interval in timings]
+
+    def getTiming (self, instr):
+        """
+        @return: Same as UniversalComponents.getTiming(), under this model's configuration
+        """
+        config = self.config
+        if "INT" == instr.FU:
+            if instr.opcode in Globals.ALU_OPS:
+                return config["INTEGER_DELAY"], config["INTEGER_II"] or config["INTEGER_DELAY"]
+        elif instr.opcode not in Globals.MOV_OPS:
+            return config["FLOATING_POINT_DELAY"], config["FLOATING_POINT_II"] or config["FLOATING_POINT_DELAY"]
+        return config["MISC_DELAY"], config["MISC_II"] or config["MISC_DELAY"]
+
+    def getIPC (self):
+        if not self.clock:
+            return 0.0
+        return float(self.retired) / self.clock
+
+    def run (self):
+        raise Exception("Calling TimingModel.run()! Illegal! Must call child class!")
+
+
+class InOrderModel(TimingModel):
+    """
+    @summary: Timing of the five-stage pipe of BasicRISC, or of ForwardingRISC when forwarding;
+            Loads and stores are looked up in a data cache of their own if the configuration
+            has one (see Cache.py), and jumps are predicted by a branch predictor of their own
+            if it names one (see BranchPredict.py), using the addresses recorded in the trace
+    """
+
+    name = "basic"
+
+    def __init__ (self, program, config = None, forwarding = False):
+        TimingModel.__init__(self, program, config)
+        self.forwarding = forwarding
+        if forwarding:
+            self.name = "forwarding"
+        self.stalls = 0
+
+        config = self.config
+        self.cache = None
+        if None != config["CACHE_SIZE"]:
+            self.cache = Cache(config["CACHE_SIZE"], config["CACHE_ASSOCIATIVITY"], config["CACHE_LINE_SIZE"],
+                               config["CACHE_POLICY"], config["CACHE_HIT_DELAY"], config["CACHE_MISS_DELAY"],
+                               config["CACHE_WRITE_BACK"])
+        self.predictor = makePredictor(config["BRANCH_PREDICTOR"], config["PREDICTOR_SIZE"])
+
+    def stall (self, d, m, w, outMask):
+        """
+        @return: True if decode must stall; The same decision as RISCPipe.stall(), or
+                ForwardingPipe.stall() when forwarding
+        """
+        srcMask = d.srcMask
+        if not self.forwarding:
+            return 0 != srcMask & (w.dstMask | m.dstMask | outMask)
+
+        for independInstr in (w, m):
+            if srcMask & independInstr.dstMask:
+                if not independInstr.writesReg:
+                    return True
+                if independInstr is m and Globals.OP_MOV == m.opcode and m.ops[1].ldStr:
+                    return True
+        return False
+
+    def run (self):
+        program = self.program
+        delays = self.delays
+        cache = self.cache
+        predictor = self.predictor
+        nop = Globals.INIT_INSTR
+        maxClock = Globals.MAX_CLOCK
+
+        d = e = m = w = nop
+        dIndex = eIndex = None
+        dTaken = eTaken = False
+        dAddress = eAddress = mAddress = None
+        dPredictedPC = ePredictedPC = None
+        dMissed = eMissed = False  # Whether fetch went the wrong way after each jump
+        outMask = 0
+        delay = 0  # Cycles left in the running functional unit; 0 when none is running
+        wait = 0  # Cycles left in the memory stage's cache access
+        wrongPath = None  # Instruction fetched after a mispredicted jump, to be squashed when it resolves
+
+        entry = yield
+        while self.clock < maxClock:
+            self.clock += 1
+
+            # Write
+            outMask = w.dstMask if w.writesReg else 0
+
+            # Memory; Nothing behind it moves while it waits on the cache
+            if cache and Globals.OP_MOV == m.opcode and (m.ops[0].ldStr or m.ops[1].ldStr):
+                if 0 == wait:
+                    wait = cache.access(mAddress, m.ops[0].ldStr)
+                wait -= 1
+                if wait:
+                    w = nop
+                    continue
+
+            # Stores never reach write
+            if Globals.OP_NOP != m.opcode:
+                self.retired += 1
+            if not (Globals.OP_MOV == m.opcode and m.ops[0].ldStr):
+                w = m
+
+            # Execute
+            if 0 == delay and Globals.OP_NOP != e.opcode:
+                delay = delays[eIndex]
+            if delay:
+                delay -= 1
+                if delay:
+                    m = nop
+                    continue
+                if predictor and e.opcode in Globals.JUMP_OPS:
+                    predictor.resolve(eIndex, e, ePredictedPC, eTaken, eAddress)
+                if eMissed:
+                    d = nop
+                    dMissed = False
+            m = e
+            mAddress = eAddress
+
+            # Decode, unless it stalls
+            if d.srcMask and self.stall(d, m, w, outMask):
+                self.stalls += 1
+                e = nop
+                continue
+            e = d
+            eIndex = dIndex
+            eTaken = dTaken
+            eAddress = dAddress
+            ePredictedPC = dPredictedPC
+            eMissed = dMissed
+
+            # Fetch
+            if None != wrongPath:
+                d = wrongPath
+                dIndex = None
+                dTaken = dMissed = False
+                wrongPath = None
+            elif None != entry:
+                PC, dTaken, dAddress = entry
+                d = program[PC]
+                dIndex = PC
+
+                # Without a predictor, fetch always continues with the next instruction and
+                # every taken jump flushes it
+                dPredictedPC = PC + 1
+                dMissed = dTaken
+                if predictor and d.opcode in Globals.JUMP_OPS:
+                    dPredictedPC = predictor.predict(PC, d)
+                    dMissed = dPredictedPC != (dAddress if dTaken else PC + 1)
+                if dMissed:
+                    wrongPath = nop
+                    if None != dPredictedPC and 0 <= dPredictedPC < len(program):
+                        wrongPath = program[dPredictedPC]
+                entry = yield
+            else:
+                d = nop
+
+            if Globals.OP_NOP == d.opcode and Globals.OP_NOP == e.opcode and Globals.OP_NOP == m.opcode and \
+                    Globals.OP_NOP == w.opcode:
+                self.completed = True
+                return
+
+
+class ScoreboardModel(TimingModel):
+    """
+    @summary: Timing of ScoreboardRISC
+    """
+
+    name = "scoreboard"
+
+    def __init__ (self, program, config = None):
+        TimingModel.__init__(self, program, config)
+        self.masks = [(getReadMask(instr), getWriteMask(instr)) for instr in program]
+
+    def run (self):
+        program = self.program
+        delays = self.delays
+        masks = self.masks
+        pipes = {"INT": self.config["INT_PIPES"], "FLT": self.config["FLT_PIPES"]}
+        maxClock = Globals.MAX_CLOCK
+
+        # Busy pipes in issue order, each as [stage, delay, read mask, write mask, instruction]
+        active = []
+        busy = {"INT": 0, "FLT": 0}
+        jumpPending = False
+
+        entry = yield
+        while self.clock < maxClock:
+            self.clock += 1
+
+            # Decide whether the next instruction can issue from the state at the start of the cycle
+            canIssue = False
+            if not jumpPending and None != entry:
+                instr = program[entry[0]]
+                if Globals.OP_NOP == instr.opcode:
+                    canIssue = True
+                elif busy[instr.FU] < pipes[instr.FU]:
+                    writeMask = masks[entry[0]][1]
+                    canIssue = True
+                    for pipe in active:
+                        if writeMask & pipe[3]:
+                            canIssue = False
+                            break
+
+            earlierWrites = 0
+            earlierReads = 0
+            finished = []
+            for pipe in active:
+                stage = pipe[0]
+                if 'R' == stage:
+                    if not (pipe[2] & earlierWrites):
+                        pipe[0] = 'E'
+                        pipe[1] = delays[pipe[4]]
+                    earlierReads |= pipe[2]
+                elif 'E' == stage:
+                    pipe[1] -= 1
+                    if 0 == pipe[1]:
+                        if program[pipe[4]].opcode in Globals.JUMP_OPS:
+                            jumpPending = False
+                        pipe[0] = 'W'
+                elif not (pipe[3] & earlierReads):
+                    finished.append(pipe)
+                earlierWrites |= pipe[3]
+
+            for pipe in finished:
+                active.remove(pipe)
+                busy[program[pipe[4]].FU] -= 1
+                self.retired += 1
+
+            if canIssue:
+                PC, taken, address = entry
+                instr = program[PC]
+                if Globals.OP_NOP == instr.opcode:
+                    self.retired += 1
+                else:
+                    active.append(['R', 0, masks[PC][0], masks[PC][1], PC])
+                    busy[instr.FU] += 1
+                    if instr.opcode in Globals.JUMP_OPS:
+                        jumpPending = True
+                entry = yield
+
+            if None == entry and not active:
+                self.completed = True
+                return
+
+
+class VLIWModel(TimingModel):
+    """
+    @summary: Timing of VLIWRISC
+    """
+
+    name = "vliw"
+
+    def __init__ (self, program, config = None):
+        TimingModel.__init__(self, program, config)
+        self.masks = [(getReadMask(instr), getWriteMask(instr)) for instr in program]
+        self.bundleSizes = [0] * (self.config["ISSUE_WIDTH"] + 1)
+
+    def run (self):
+        program = self.program
+        delays = self.delays
+        intervals = self.intervals
+        masks = self.masks
+        unitReady = {"INT": [0] * self.config["INT_PIPES"], "FLT": [0] * self.config["FLT_PIPES"]}
+        width = self.config["ISSUE_WIDTH"]
+        maxClock = Globals.MAX_CLOCK
+
+        # Operations in flight in issue order, each as [delay, write mask, instruction]
+        active = []
+        jumpPending = False
+
+        entry = yield
+        while self.clock < maxClock:
+            # Functional units finish first...
+            finished = []
+            for pipe in active:
+                pipe[0] -= 1
+                if 0 == pipe[0]:
+                    if program[pipe[2]].opcode in Globals.JUMP_OPS:
+                        jumpPending = False
+                    finished.append(pipe)
+            for pipe in finished:
+                active.remove(pipe)
+                self.retired += 1
+
+            # ...then the next bundle issues
+            pending = 0
+            for pipe in active:
+                pending |= pipe[1]
+
+            issued = 0
+            while issued < width and not jumpPending and None != entry:
+                PC = entry[0]
+                instr = program[PC]
+                if Globals.OP_NOP == instr.opcode:
+                    self.retired += 1
+                else:
+                    readMask, writeMask = masks[PC]
+                    if (readMask | writeMask) & pending:
+                        break
+                    ready = unitReady[instr.FU]
+                    unit = None
+                    for i in range(len(ready)):
+                        if ready[i] <= self.clock:
+                            unit = i
+                            break
+                    if None == unit:
+                        break
+                    ready[unit] = self.clock + intervals[PC]
+                    active.append([delays[PC], writeMask, PC])
+                    pending |= writeMask
+                    if instr.opcode in Globals.JUMP_OPS:
+                        jumpPending = True
+                issued += 1
+                entry = yield
+            self.bundleSizes[issued] += 1
+            self.clock += 1
+
+            if None == entry and not active:
+                self.completed = True
+                return
+
+
+def makeModel (model, program, config = None):
+    """
+    @param model: Name of a datapath; One of FinalProject.MODELS
+
+    @return: TimingModel of that datapath
+    """
+    if "basic" == model:
+        return InOrderModel(program, config)
+    elif "forwarding" == model:
+        return InOrderModel(program, config, True)
+    elif "scoreboard" == model:
+        return ScoreboardModel(program, config)
+    elif "vliw" == model:
+        return VLIWModel(program, config)
+    raise Exception("No timing model for the " + str(model) + " datapath")
+
+
+def replay (trace, models):
+    """
+    @summary: Drive every model from the trace in a single pass over it; Afterwards each
+            model's clock holds the cycles its datapath takes to run the program, and
+            completed is False if it would not have completed within Globals.MAX_CLOCK
+
+    @param models: List of TimingModel, all built for the trace's program
+    """
+    runners = []
+    for model in models:
+        runner = model.run()
+        runner.next()
+        runners.append(runner)
+
+    for entry in trace:
+        if not runners:
+            break
+        for runner in list(runners):
+            try:
+                runner.send(entry)
+            except StopIteration:
+                runners.remove(runner)
+
+    # Tell the models that the trace has ended and let them drain; Every model stops once its
+    # pipeline is empty
+    for runner in runners:
+        try:
+            runner.send(None)
+        except StopIteration:
+            continue
+        raise Exception("Timing model did not stop at the end of the trace")
+
+    if not trace.completed:
+        for model in models:
+            model.completed = False
+
+    return models
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,200 @@
+"""
+@author: David Zemon
+
+@summary: A persistent cache of simulation results, so that a sweep repeating runs it has
+    made before returns without simulating them again
+
+    Each result is saved in its own file, named by a hash of everything that decides it: the
+    program image, the model, every parameter in Globals that can change a run (all but
+    NEUTRAL_PARAMS) and the source code of the simulator itself, so editing any module of the
+    simulator invalidates every result. Results are of runs from the default initial state.
+
+    Results are kept in Globals.RESULT_CACHE_DIR, which may be shared by any number of
+    processes. Loading a result marks it as recently used, and the least recently used are
+    deleted whenever the cache grows beyond Globals.RESULT_CACHE_BYTES, until it is back down to
+    EVICT_FRACTION of that. So that saving does not have to measure the whole directory every
+    time, each process estimates its size from the last time it was measured plus what the
+    process has saved since, and only measures it again once the estimate passes the limit;
+    Results saved by other processes in the meantime can take the cache beyond the limit until
+    then.
+"""
+
+from glob import glob
+import hashlib
+import marshal
+import os
+import Assembler
+import Globals
+from BasicRISC import BasicRISC
+
+RESULT_MAGIC = "RRES"
+RESULT_VERSION = 1
+RESULT_EXTENSION = ".rres"
+
+# Fraction of Globals.RESULT_CACHE_BYTES left by an eviction, so that many results can be saved
+# before the next one
+EVICT_FRACTION = 0.75
+
+# Globals that never change the outcome of a run, so are left out of its key
+NEUTRAL_PARAMS = ["DEBUG", "TRACE_FILE", "COUNTERS_FILE", "IMAGE_CACHE_DIR", "RESULT_CACHE_DIR", "RESULT_CACHE_BYTES",
+                  "SKIP_AHEAD", "FUSED_ENGINE", "LOOP_EXTRAPOLATION", "CHECKPOINT_INTERVAL", "CHECKPOINT_FILE",
+                  "BATCH_RAM_SIZE"]
+
+# Hash of the simulator's source code; Computed once per process
+codeVersion = None
+
+# Estimated bytes taken by each cache directory this process has saved to (see save())
+estimatedBytes = {}
+
+
+def getCodeVersion ():
+    global codeVersion
+    if None == codeVersion:
+        digest = hashlib.sha1()
+        for path in sorted(glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            f = open(path, 'rb')
+            digest.update(os.path.basename(path) + '\0' + f.read() + '\0')
+            f.close()
+        codeVersion = digest.hexdigest()
+    return codeVersion
+
+
+def getParams ():
+    """
+    @return: Sorted list of (name, value) of every parameter in Globals that can change the
+            outcome of a run
+    """
+    params = []
+    for name, value in vars(Globals).items():
+        if name.isupper() and name not in NEUTRAL_PARAMS and \
+                isinstance(value, (bool, int, long, float, str, type(None))):
+            params.append((name, value))
+    return sorted(params)
+
+
+def getKey (image, kind):
+    """
+    @summary: Name the result of running a program with the parameters currently in Globals
+
+    @param image: Loaded program; A list of RISC_Instr
+    @param kind: What produced the result, such as the name of a model
+    """
+    data = (RESULT_MAGIC, RESULT_VERSION, getCodeVersion(), kind, tuple(getParams()), Assembler.encode(image))
+    return hashlib.sha1(marshal.dumps(data)).hexdigest()
+
+
+def getPath (key):
+    return os.path.join(Globals.RESULT_CACHE_DIR, key + RESULT_EXTENSION)
+
+
+def summarize (datapath):
+    """
+    @return: dict of everything worth keeping about a datapath that has been run: its cycle
+            count, whether it completed, its IPC and stall counts (None where the datapath does
+            not count them), its final registers and a digest of its final RAM
+    """
+    result = {"cycles": datapath.clock, "completed": bool(datapath.done()), "IPC": None, "stalls": None,
+              "Rn": dict(datapath.Rn), "RAM": hashlib.sha1(repr(datapath.RAM.getCells())).hexdigest()}
+    if hasattr(datapath, "getIPC"):
+        result["IPC"] = datapath.getIPC()
+    if isinstance(datapath, BasicRISC):
+        result["stalls"] = dict(datapath.pipe.stallCounts)
+    return result
+
+
+def load (key):
+    """
+    @return: The result saved under a key, or None if there is none or caching is disabled
+    """
+    if None == Globals.RESULT_CACHE_DIR:
+        return None
+
+    path = getPath(key)
+    try:
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+        os.utime(path, None)  # Mark it as recently used
+    except (IOError, OSError):
+        # Never saved, or evicted by another process
+        return None
+
+    headerLen = len(RESULT_MAGIC) + 1
+    if RESULT_MAGIC + chr(RESULT_VERSION) != data[:headerLen]:
+        return None
+    try:
+        return marshal.loads(data[headerLen:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def save (key, result):
+    """
+    @summary: Save a result under a key, then evict the least recently used results if the
+            cache is estimated to have grown too large; Does nothing if caching is disabled.
+            Written under a temporary name first so that other processes never see half of a
+            file
+    """
+    directory = Globals.RESULT_CACHE_DIR
+    if None == directory:
+        return
+
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    path = getPath(key)
+    tmpPath = path + '.' + str(os.getpid())
+    f = open(tmpPath, 'wb')
+    f.write(RESULT_MAGIC + chr(RESULT_VERSION))
+    marshal.dump(result, f)
+    size = f.tell()
+    f.close()
+    os.rename(tmpPath, path)
+
+    # The directory is only measured the first time and once the estimate passes the limit
+    estimate = estimatedBytes.get(directory)
+    if None == estimate:
+        estimatedBytes[directory] = evict(directory, Globals.RESULT_CACHE_BYTES)
+    elif estimate + size > Globals.RESULT_CACHE_BYTES:
+        estimatedBytes[directory] = evict(directory, int(Globals.RESULT_CACHE_BYTES * EVICT_FRACTION))
+    else:
+        estimatedBytes[directory] = estimate + size
+
+
+def evict (directory, maxBytes):
+    """
+    @summary: Delete the least recently used results in a directory until the rest take no
+            more than maxBytes
+
+    @return: Bytes taken by the results that are left
+    """
+    entries = []
+    total = 0
+    for path in glob(os.path.join(directory, '*' + RESULT_EXTENSION)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, path, stat.st_size))
+        total += stat.st_size
+
+    entries.sort()
+    for mtime, path, size in entries:
+        if total <= maxBytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Already evicted by another process
+            pass
+        total -= size
+
+    return total
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -2,143 +2,316 @@
 @author: David Zemon
 
 @summary: Provide necessary components to create a scoreboard type pipeline
+
+    Modelled on the CDC 6600: instructions issue in order, one per clock, to a free functional
+    unit and then proceed through the unit independently of each other
+        - Issue: Wait for a free functional unit of the right type (structural hazard) and
+          until no unfinished instruction writes the same destination (WAW)
+        - Read operands: Wait until no earlier instruction still has to write a source (RAW)
+        - Execute: Tick the functional unit until it is done; Jumps are resolved here
+        - Write: Wait until no earlier instruction still has to read the destination (WAR)
+
+    Issue stops at every jump until the jump has been resolved; There is no speculation.
+    Decisions are made on the state at the start of each clock, so a result written in one
+    cycle can be read in the next and a freed functional unit can be reissued in the next.
 """
 
-from copy import deepcopy, copy
+from copy import deepcopy
 import Globals
+import Trace
+from Memory import Memory
 from UniversalComponents import FltFU, IntFU
 
+# One more hazard mask bit (see Globals) standing for all of RAM; Indirect and direct
+# operands may name the same cell, so every RAM access is ordered against every RAM write
+MEM_MASK = 1 << (Globals.MASK_DIRECT_SHIFT + Globals.MASK_DIRECT_BITS)
+
+
+def getReadMask (instr):
+    """
+    @return: Hazard mask of every location the instruction reads
+    """
+    mask = instr.srcMask
+    for op in instr.srcOps:
+        # A store only reads the address of its destination, not the RAM behind it
+        if op.ldStr and not (Globals.OP_MOV == instr.opcode and op is instr.ops[0]):
+            mask |= MEM_MASK
+    return mask
+
+
+def getWriteMask (instr):
+    """
+    @return: Hazard mask of every location the instruction writes
+    """
+    mask = instr.dstMask
+    if Globals.OP_MOV == instr.opcode and instr.ops[0].ldStr:
+        mask |= MEM_MASK
+    return mask
+
 
 class ScoreboardPipe:
     """
-    @summary: Contains the read ops, execute, and write stages of a pipe utilizing a scoreboard
+    @summary: Contains the read ops, execute, and write stages of a pipe utilizing a scoreboard;
+            Each pipe owns one functional unit and holds one instruction from issue until
+            its result has been written
     """
 
-    def __init__ (self, Rn, ram, FUs):
-        self.Rn = Rn
-        self.RAM = ram
+    def __init__ (self, parent, FU):
+        self.parent = parent
         self.result = {'A': None, 'B': None}
-        self.FUs = FUs
-        self.busy = False
-        self.IR = copy(Globals.INIT_INSTR)
+        self.FU = FU(self.result)
+        self.IR = Globals.INIT_INSTR
         self.stage = None
+        self.seq = None
+        self.nextPC = None
+        self.readMask = 0
+        self.writeMask = 0
 
-    def issue (self, instr):
-        self.IR = copy(instr)
-        self.stage = 'I'
+    def issue (self, instr, seq, nextPC):
+        """
+        @param seq: Issue order of the instruction, used to tell earlier instructions from later
+        @param nextPC: Address following the instruction, needed by relative jumps
+        """
+        self.IR = instr
+        self.seq = seq
+        self.nextPC = nextPC
+        self.readMask = getReadMask(instr)
+        self.writeMask = getWriteMask(instr)
+        self.stage = 'R'
 
-    def tick (self):
+    def isBusy (self):
+        return None != self.stage
+
+    def tick (self, earlierWrites, earlierReads):
+        """
+        @param earlierWrites: Hazard mask of destinations not yet written by earlier instructions
+        @param earlierReads: Hazard mask of sources not yet read by earlier instructions
+        """
         # If the pipe is unused, return
         if None == self.stage:
             return
 
-        # If the the stage is waiting on opperands
+        # If the the stage is waiting on operands
         elif 'R' == self.stage:
-            # Check the opperands
-            if self.readOpsCheck():
-                # And if they're available, find an available functional unit
-                for FU in self.FUs[self.IR.getFU()]:
-                    # Check if the FU is busy...
-                    if not FU["busy"]:
-                        # Operands and functional unit available! Load 'er up!
-                        FU["FU"].load(self.IR.instr, self.getSrcValues())
-                        FU["busy"] = True
-                        self.runningFU = FU
-                        self.stage = 'E'
-                        return
+            if not (self.readMask & earlierWrites):
+                srcValues = self.getSrcValues()
+                self.FU.load(self.IR.opcode, srcValues['A'], srcValues['B'])
+                self.stage = 'E'
         # Else check if the instruction is currently executing
         elif 'E' == self.stage:
-            self.runningFU.tick()
-            if self.runningFU.ding():
+            self.FU.tick()
+            if self.FU.ding():
+                if self.IR.opcode in Globals.JUMP_OPS:
+                    self.parent.resolveJump(self.branchCheck(), self.result['B'])
                 self.stage = 'W'
-                return
         # Finally, check if the instruction can write its result
         elif 'W' == self.stage:
-            # TODO: Need to make jumps happen
-
-            # If the instruction doesn't write or if WAR hazards are satisfied
-            if self.IR.instr in Globals.NO_WRITE or self.writeCheck():
-                if self.IR.instr not in Globals.NO_WRITE:
-                    self.IR[0].setVal(self.runningFU["result"]["A"])
-                self.runningFU["busy"] = False
-                self.runningFU = None
+            if not (self.writeMask & earlierReads):
+                self.writeResult()
+                self.IR = Globals.INIT_INSTR
                 self.stage = None
 
-    def readOpsCheck (self):
-        """
-        @summary: Are all source operands availabe for reading?
-        """
-        raise Exception("Need to implement ScoreboardPipe.readOpsCheck()")
+    def branchCheck (self):
+        opcode = self.IR.opcode
+        if opcode in Globals.UCND_JMP_OPS:
+            return True
+        elif Globals.OP_JZ == opcode and 0 == self.result['A']:
+            return True
+        elif Globals.OP_DJNZ == opcode and 0 != self.result['A']:
+            return True
+        else:
+            return False
 
     def getSrcValues (self):
+        Rn = self.parent.Rn
+        ram = self.parent.RAM
         retVal = {'A': None, 'B': None}
+        opcode = self.IR.opcode
 
         # Handle jumps
-        if self.IR.instr in Globals.JUMP_INSTRS:
-            if "sjmp" == self.IR.instr:
-                retVal = {'A': self.IR.getSrcOpVal(0), 'B': self.parent.PC}
-            elif "djnz" == self.IR.instr:
-                retVal = {'A': self.IR.getSrcOpVal(0), 'B': self.parent.PC + self.IR.getSrcOpVal(1)}
+        if opcode in Globals.JUMP_OPS:
+            retVal['A'] = self.IR.getSrcOpVal(0, Rn, ram)
+            if Globals.OP_SJMP == opcode:
+                retVal['B'] = self.nextPC
+            elif Globals.OP_DJNZ == opcode:
+                retVal['B'] = self.nextPC + self.IR.getSrcOpVal(1, Rn, ram)
+            else:
+                retVal['B'] = self.IR.getSrcOpVal(1, Rn, ram)
+        # Followed by moves; Loads read RAM now, while their operands are known to be ready
+        elif Globals.OP_MOV == opcode:
+            if self.IR.ops[0].ldStr:
+                retVal['A'] = self.IR.getSrcOpVal(0, Rn, ram)
+                retVal['B'] = self.IR.getSrcOpVal(1, Rn, ram)
+            elif self.IR.ops[1].ldStr:
+                retVal['B'] = ram[self.IR.getSrcOpVal(1, Rn, ram)]
             else:
-                retVal = {'A': self.IR.getSrcOpVal(0), 'B': self.IR.getSrcOpVal(1)}
-        # Followed by moves...
-        elif "mov" == self.IR.instr:
-            if self.IR.ops[0].isLdStrOp():
-                retVal['A'] = self.IR.getSrcOpVal(0)
-            retVal['B'] = self.IR.getSrcOpVal(1)
+                retVal['B'] = self.IR.getSrcOpVal(1, Rn, ram)
         # And finally, everything else
         else:
-            retVal = {'A': self.IR.getSrcOpVal(1), 'B': self.IR.getSrcOpVal(2)}
+            retVal['A'] = self.IR.getSrcOpVal(1, Rn, ram)
+            retVal['B'] = self.IR.getSrcOpVal(2, Rn, ram)
 
         return retVal
 
+    def writeResult (self):
+        opcode = self.IR.opcode
+        if Globals.OP_MOV == opcode:
+            if self.IR.ops[0].ldStr:
+                self.parent.RAM[self.result['A']] = self.result['B']
+                return
+            value = self.result['B']
+        else:
+            value = self.result['A']
+
+        if self.IR.writesReg:
+            if self.parent.trace:
+                self.parent.trace.record(Trace.TRACE_REG_WRITE, self.IR.ops[0], value)
+            self.IR.ops[0].setVal(value, self.parent.Rn, self.parent.RAM)
+
 
 class ScoreboardRISC:
     """
-    @summary: A simple example of a RISC pipeline using the scoreboard technique
+    @summary: A simple example of a RISC pipeline using the scoreboard technique, with
+            Globals.INT_PIPES integer and Globals.FLT_PIPES floating point functional units;
+            It can not be checkpointed (see Checkpoint.py)
     """
 
-    def __init__ (self, ram):
+    # Class of pipe created for each functional unit
+    PIPE = ScoreboardPipe
+
+    def __init__ (self, program, ram = None):
+        """
+        @param program: Instruction memory - a list of RISC_Instr that is never modified
+        @param ram: This machine's own data memory; Defaults to a new, empty Memory
+        """
+        if None == ram:
+            ram = Memory()
+        self.program = program
         self.RAM = ram
         self.Rn = deepcopy(Globals.DEFAULT_REG_FILE)
         self.PC = 0
-        self.instrPipes = []
+        self.seq = 0
+        self.jumpPending = False
+        self.trace = None
+        self.clock = 0
+
+        # Each pipe has its very own functional unit
+        self.instrPipes = {"FLT": [], "INT": []}
+        for i in range(Globals.FLT_PIPES):
+            self.instrPipes["FLT"].append(self.PIPE(self, FltFU))
+        for i in range(Globals.INT_PIPES):
+            self.instrPipes["INT"].append(self.PIPE(self, IntFU))
+
+    def load (self):
+        """
+        @summary: Empty every pipe
+        """
+        for pipe in self.getPipes():
+            pipe.IR = Globals.INIT_INSTR
+            pipe.stage = None
 
-        # Create a sample of each functional unit
-        fltFU = {"result": {'A': None, 'B': None}, "busy": False}
-        intFU = {"result": {'A': None, 'B': None}, "busy": False}
-        fltFU["FU"] = FltFU(fltFU["result"])
-        intFU["FU"] = IntFU(intFU["result"])
+    def setTracer (self, tracer):
+        """
+        @summary: Record functional unit events and register writes into a Trace.Tracer;
+                Pass None to disable tracing
+        """
+        self.trace = tracer
+        for pipe in self.getPipes():
+            pipe.FU.trace = tracer
 
-        # Copy the samples to create numerous functional units
-        self.FUs = {"FLT": [fltFU] * Globals.FLT_PIPES, "INT": [intFU] * Globals.INT_PIPES}
+    def getPipes (self):
+        return self.instrPipes["FLT"] + self.instrPipes["INT"]
 
     def tick (self):
-        for pipe in self.instrPipes:
-            pipe.tick()
-        nextInstr = self.RAM[self.PC]
-        if self.checkIssue(next):
-            self.instrPipes.append(ScoreboardPipe(self.Rn, self.RAM, self.FUs))
-            self.PC += 1
+        """
+        @summary: Simulate one clock cycle; Every busy pipe is given a tick in issue order and
+                then the next instruction is issued if possible
+        """
+        if self.trace:
+            self.trace.newCycle()
+
+        # Build the scoreboard from the state at the start of the cycle
+        active = sorted([pipe for pipe in self.getPipes() if pipe.isBusy()], key = lambda pipe: pipe.seq)
+        canIssue = self.checkIssue(active)
+
+        earlierWrites = 0
+        earlierReads = 0
+        hazards = []
+        for pipe in active:
+            hazards.append((earlierWrites, earlierReads))
+            earlierWrites |= pipe.writeMask
+            if 'R' == pipe.stage:
+                earlierReads |= pipe.readMask
+
+        for pipe, (writes, reads) in zip(active, hazards):
+            pipe.tick(writes, reads)
 
-    def checkIssue (self, instr):
+        if canIssue:
+            self.issue(canIssue)
+
+        self.clock += 1
+
+    def advance (self, limit):
+        """
+        @summary: Same as BasicRISC.advance(); The scoreboard always ticks one cycle at a time
+
+        @return: Number of clock cycles simulated
+        """
+        self.tick()
+        return 1
+
+    def checkIssue (self, active):
         """
         @summary: Instruction may issue IFF there are no WAW, or structural hazards
 
-        @return: Returns True if the instruction can issue, false otherwise
+        @return: The free pipe that the next instruction should issue to, True if the next
+                instruction is a nop (which needs no pipe), or None if nothing can issue
         """
+        if self.jumpPending or not (0 <= self.PC < len(self.program)):
+            return None
+
+        instr = self.program[self.PC]
+        if Globals.OP_NOP == instr.opcode:
+            return True
 
         # Check for WAW
-        # If the instruction doesn't write, there can be no WAW
-        if instr.instr not in Globals.NO_WRITE:
-            # Check the instructions in each pipe
-            for pipe in self.instrPipes:
-                # If the destination operands match, stall
-                if pipe.instr.getDest() == instr.getDest():
-                    return True
+        writeMask = getWriteMask(instr)
+        for pipe in active:
+            if writeMask & pipe.writeMask:
+                return None
 
         # Check for structural hazard
-        neededFU = instr.getFU()
+        for pipe in self.instrPipes[instr.FU]:
+            if not pipe.isBusy():
+                return pipe
+
+        return None
+
+    def issue (self, pipe):
+        instr = self.program[self.PC]
+        self.PC += 1
+        if True == pipe:
+            return
+
+        pipe.issue(instr, self.seq, self.PC)
+        self.seq += 1
+        if instr.opcode in Globals.JUMP_OPS:
+            self.jumpPending = True
+
+    def resolveJump (self, taken, target):
+        if taken:
+            if self.trace:
+                self.trace.record(Trace.TRACE_BRANCH, target)
+            self.PC = target
+        self.jumpPending = False
+
+    def done (self):
+        if 0 <= self.PC < len(self.program):
+            return False
+        for pipe in self.getPipes():
+            if pipe.isBusy():
+                return False
+        return True
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+"""
+@author: David Zemon
+
+@summary: Detect loops that have settled into a steady state in the basic RISC pipe and skip
+    over their remaining iterations in one step
+
+    The pipe is sampled every time a jump back to the top of a loop is taken. Between two
+    samples the pipe's timing depends only on which instructions it runs, never on the values
+    they compute, so once three samples in a row find the same instructions in the same stages
+    with the same functional unit delays (the "shape" of the pipe), every further iteration
+    that runs the same instructions takes exactly as many cycles as the last one.
+
+    The values in the pipe - registers and latches - may change from one iteration to the
+    next, such as the counter of a djnz loop. If the body of the loop only adds, subtracts,
+    moves and multiplies by constants, and never reads RAM, each iteration changes the values
+    by an affine function; Two equal changes in a row then mean every later iteration makes
+    the same change too. The same holds for the address and value of every store. The number
+    of iterations left follows from the loop's closing jump, and all of them are applied at
+    once: cycles, stall counts, registers, latches and the RAM written by every store.
+
+    Loops whose bodies contain anything else (other jumps, loads, divisions, bitwise
+    operations, floats...) are never skipped, and any loop that has not reached a steady state
+    is simply ticked, so results are identical to ticking every cycle.
+"""
+
+import Globals
+
+# Operations whose results are affine functions of their operands; Multiplication only
+# qualifies when one operand is a constant
+AFFINE_OPS = frozenset([Globals.OP_NOP, Globals.OP_ADD, Globals.OP_SUB, Globals.OP_MUL, Globals.OP_MOV]) | \
+             Globals.JUMP_OPS
+
+# Functional units of the execute stage, in the order they are sampled
+FU_NAMES = ["INT", "FLT"]
+
+# Index of the memory stage's input A (the output A of the closing jump) in the sampled values
+MEMORY_A = len(Globals.REG_NAMES) + 2
+
+
+def capture (pipe):
+    """
+    @return: Tuple of the shape of a pipe, which decides its timing, and a list of the values
+            it holds
+    """
+    stages = pipe.stages
+    decode = stages['d']
+    execute = stages['e']
+    memory = stages['m']
+    write = stages['w']
+    outputBuf = write.outputBuf
+    FUs = [execute.funcUnits[name] for name in FU_NAMES]
+
+    shape = (stages['f'].PC, decode.IR, decode.PC, decode.predictedPC, execute.IR, execute.PC, execute.predictedPC,
+             execute.runningFU, memory.IR, memory.PC, memory.wait, write.IR, outputBuf["Valid"], outputBuf.get("Dest"),
+             tuple((getattr(FU, "operation", None), FU.delay, FU.interval) for FU in FUs))
+
+    values = [pipe.Rn[name] for name in Globals.REG_NAMES]
+    values += [execute.input["A"], execute.input["B"], memory.input["A"], memory.input["B"], write.inputBuf,
+               outputBuf["Value"]]
+    for FU in FUs:
+        values += FU.ops
+    return shape, values
+
+
+def restore (pipe, values):
+    """
+    @summary: Put values returned by capture() back into a pipe of the same shape
+    """
+    stages = pipe.stages
+    execute = stages['e']
+    memory = stages['m']
+    write = stages['w']
+
+    for name, value in zip(Globals.REG_NAMES, values):
+        pipe.Rn[name] = value
+    values = values[len(Globals.REG_NAMES):]
+
+    # The latches are shared with the functional units, so they must be updated in place
+    execute.input["A"], execute.input["B"], memory.input["A"], memory.input["B"], write.inputBuf, \
+        write.outputBuf["Value"] = values[:6]
+    values = values[6:]
+    for name in FU_NAMES:
+        execute.funcUnits[name].ops[:] = values[:2]
+        values = values[2:]
+
+
+def getStep (first, second, third):
+    """
+    @summary: Find the change made to each value by one iteration, given the values at three
+            iterations in a row
+
+    @return: List of the change to each value, or None if any value does not change by the
+            same amount both times, or changes without being an int
+    """
+    steps = []
+    for a, b, c in zip(first, second, third):
+        if None == a or None == b or None == c:
+            if not (None == a == b == c):
+                return None
+            steps.append(0)
+            continue
+        if type(a) != type(b) or type(b) != type(c):
+            return None
+        step = b - a
+        if c - b != step:
+            return None
+        if step and not isinstance(a, (int, long)):
+            return None
+        steps.append(step)
+    return steps
+
+
+class LoopDetector(object):
+    """
+    @summary: Follows one datapath, sampling it after each tick in which a jump back to the top
+            of a loop was taken (see sample())
+    """
+
+    def __init__ (self, program):
+        self.program = program
+        self.bodies = {}  # Registers read by integer arithmetic in each loop, or None if it can not be skipped
+        self.loop = None  # (PC of the closing jump, PC of the top) of the loop being followed...
+        self.samples = []  # ...and its latest samples, as (clock, shape, values, stores, stall counts)
+        self.memory = None
+
+    def reset (self):
+        """
+        @summary: Forget the loop being followed
+        """
+        self.loop = None
+        self.samples = []
+        if self.memory:
+            self.memory.stores = None
+            self.memory = None
+
+    def checkBody (self, top, jump):
+        """
+        @summary: Determine whether the loop from top to the closing jump can be skipped; Its
+                only jump must be the closing one, it must not read RAM, and every operation must
+                be affine in the registers
+
+        @return: List of the registers whose values are read by integer arithmetic, which must
+                hold ints for the arithmetic to be affine, or None if the loop can not be skipped
+        """
+        registers = set()
+        for PC in range(top, jump + 1):
+            instr = self.program[PC]
+            opcode = instr.opcode
+            if opcode not in AFFINE_OPS or (opcode in Globals.JUMP_OPS and PC != jump):
+                return None
+
+            srcOps = instr.ops
+            if opcode in Globals.MOV_OPS or opcode in Globals.ALU_OPS:
+                srcOps = instr.ops[1:]
+            for op in srcOps:
+                if op.ldStr:
+                    return None
+
+            if opcode in Globals.ALU_OPS and "INT" == instr.FU:
+                kinds = [op.kind for op in srcOps]
+                if Globals.OP_MUL == opcode and Globals.OPND_IMMEDIATE not in kinds:
+                    return None
+                for op in srcOps:
+                    if Globals.OPND_IMMEDIATE == op.kind and isinstance(op.value, float):
+                        return None
+                    if Globals.OPND_REG == op.kind:
+                        registers.add(op.reg)
+            elif Globals.OP_MUL == opcode:
+                # Floating point results are never affine, due to rounding
+                return None
+        return sorted(registers)
+
+    def sample (self, datapath, limit):
+        """
+        @summary: Called after every tick of a basic RISC pipe with no tracer, counters, branch
+                predictor or data cache; If a jump back to the top of a loop was just taken,
+                sample the pipe, and once the loop is in a steady state, skip as many of its
+                remaining iterations as possible
+
+        @param limit: Most clock cycles that may be skipped
+
+        @return: Number of clock cycles skipped
+        """
+        pipe = datapath.pipe
+        memory = pipe.stages['m']
+        opcode = memory.IR.opcode
+        if opcode not in Globals.JUMP_OPS:
+            return 0
+
+        # A taken jump has just had its target fetched
+        top = memory.input["B"]
+        jump = memory.PC
+        if pipe.stages['d'].PC != top or not 0 <= top < jump:
+            return 0
+
+        if (jump, top) != self.loop:
+            self.reset()
+            if (jump, top) not in self.bodies:
+                self.bodies[(jump, top)] = self.checkBody(top, jump)
+            if None == self.bodies[(jump, top)]:
+                return 0
+            self.loop = (jump, top)
+            self.memory = memory
+
+        # Record the stores of each iteration
+        stores = memory.stores
+        memory.stores = []
+
+        shape, values = capture(pipe)
+        self.samples.append((datapath.clock, shape, values, stores, dict(pipe.stallCounts)))
+        if len(self.samples) < 3:
+            return 0
+        del self.samples[:-3]
+
+        (clock0, shape0, values0, stores0, stalls0), (clock1, shape1, values1, stores1, stalls1), \
+            (clock2, shape2, values2, stores2, stalls2) = self.samples
+        period = clock2 - clock1
+        if shape0 != shape2 or shape1 != shape2 or clock1 - clock0 != period:
+            return 0
+
+        # Integer arithmetic on a float is not affine
+        for name in self.bodies[self.loop]:
+            if isinstance(pipe.Rn[name], float):
+                return 0
+
+        steps = getStep(values0, values1, values2)
+        if None == steps or len(stores1) != len(stores2):
+            return 0
+        flat1 = [value for store in stores1 for value in store]
+        flat2 = [value for store in stores2 for value in store]
+        storeSteps = self.getStoreSteps(flat1, flat2)
+        if None == storeSteps:
+            return 0
+
+        stallSteps = {}
+        for cause, count in stalls2.items():
+            stallSteps[cause] = count - stalls1.get(cause, 0)
+            if stalls1.get(cause, 0) - stalls0.get(cause, 0) != stallSteps[cause]:
+                return 0
+
+        iterations = self.getIterations(opcode, values2[MEMORY_A], steps[MEMORY_A])
+        if None == iterations or iterations * period > limit:
+            iterations = limit // period
+        if iterations < 1:
+            return 0
+
+        # A store outside of RAM must fault on the cycle it is made, so leave it to be ticked
+        ram = pipe.RAM
+        for j in range(0, len(flat2), 2):
+            for address in (flat2[j] + storeSteps[j], flat2[j] + iterations * storeSteps[j]):
+                if address < 0 or address >= len(ram):
+                    return 0
+
+        restore(pipe, [value + iterations * step if step else value for value, step in zip(values2, steps)])
+        for i in range(1, iterations + 1):
+            for j in range(0, len(flat2), 2):
+                ram[flat2[j] + i * storeSteps[j]] = flat2[j + 1] + i * storeSteps[j + 1]
+        for cause, step in stallSteps.items():
+            pipe.stallCounts[cause] += iterations * step
+        datapath.clock += iterations * period
+
+        self.reset()
+        return iterations * period
+
+    @staticmethod
+    def getStoreSteps (first, second):
+        """
+        @summary: Find the change made to the address and value of each store by one iteration
+
+        @return: List of changes, or None if an address or value changes without being an int
+        """
+        steps = []
+        for a, b in zip(first, second):
+            if None == a or None == b:
+                if not (None == a == b):
+                    return None
+                steps.append(0)
+                continue
+            if type(a) != type(b):
+                return None
+            step = b - a
+            if step and not isinstance(a, (int, long)):
+                return None
+            steps.append(step)
+        return steps
+
+    @staticmethod
+    def getIterations (opcode, A, step):
+        """
+        @summary: Count the iterations after the current one that will take the closing jump
+                again, given its output A (the counter of djnz, the tested value of jz) and how
+                much A changes each iteration
+
+        @return: Number of iterations, or None if the loop never ends
+        """
+        if opcode in Globals.UCND_JMP_OPS or 0 == step:
+            return None
+        if Globals.OP_JZ == opcode:
+            return 0
+
+        # djnz leaves the loop once A reaches 0
+        if (-A) % step or -A // step < 1:
+            return None
+        return -A // step - 1
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -0,0 +1,332 @@
+"""
+@author: David Zemon
+
+@summary: Run every combination of timing parameters against a set of programs, spread
+    across all cores of the machine, and collect the clock cycles each run took
+
+    Usage: python Sweep.py [-m MODEL]... [-r] [-n] [-j PROCESSES] [-o RESULTS.csv] [--set NAME=V1,V2,...]... PROGRAM.asm...
+
+    Example: python Sweep.py --set INTEGER_DELAY=1,2,3 --set FLOATING_POINT_DELAY=3,5 instructionList.asm
+             python Sweep.py --set CACHE_SIZE=None,8,32 --set CACHE_POLICY=lru,random benchmarks/memcopy.asm
+             python Sweep.py -m vliw --set INT_PIPES=1,2,3,4 --set ISSUE_WIDTH=1,2,4 instructionList.asm
+             python Sweep.py -r -m basic -m forwarding --set INTEGER_DELAY=1,2,3 instructionList.asm
+             python Sweep.py --set BRANCH_PREDICTOR=None,2-bit,btb --set PREDICTOR_SIZE=4,16 benchmarks/djnzloop.asm
+
+    With --replay, each program is executed once by the functional interpreter and its
+    instruction stream is replayed through a timing model (see Replay.py) of every model
+    and configuration in a single pass, instead of simulating each of them in full.
+
+    The result of every run is kept in a persistent cache (see ResultCache.py), so repeating
+    a run - in this sweep or any later one - takes no simulation at all unless the simulator
+    has changed since; --no-cache disables it.
+"""
+
+from argparse import ArgumentParser
+from ast import literal_eval
+from itertools import product
+from multiprocessing import Pool, cpu_count
+from traceback import format_exc
+import csv
+import os
+import sys
+import Globals
+import FinalProject
+import Replay
+import ResultCache
+
+# Every Globals parameter that a sweep is allowed to vary
+SWEEP_PARAMS = ["INTEGER_DELAY", "FLOATING_POINT_DELAY", "MISC_DELAY", "INTEGER_II", "FLOATING_POINT_II", "MISC_II",
+                "INT_PIPES", "FLT_PIPES", "ISSUE_WIDTH", "CACHE_SIZE", "CACHE_ASSOCIATIVITY", "CACHE_LINE_SIZE",
+                "CACHE_POLICY", "CACHE_HIT_DELAY", "CACHE_MISS_DELAY", "CACHE_WRITE_BACK", "BRANCH_PREDICTOR",
+                "PREDICTOR_SIZE", "RAM_SIZE"]
+
+# Values of the sweep parameters as shipped, so each run starts from a known configuration
+DEFAULTS = dict((name, getattr(Globals, name)) for name in SWEEP_PARAMS)
+
+# Sweep parameters that change what a program computes rather than how long it takes; A
+# replayed sweep records each program once for every value of these
+FUNCTIONAL_PARAMS = ["RAM_SIZE"]
+
+
+def makeGrid (axes):
+    """
+    @summary: Expand a set of parameter axes into every possible configuration
+
+    @param axes: dict mapping a name from SWEEP_PARAMS to the list of values it should take
+
+    @return: List of configuration dicts, one per point in the grid
+    """
+    for name in axes:
+        if name not in SWEEP_PARAMS:
+            raise Exception("Unknown sweep parameter: " + name)
+
+    names = sorted(axes)
+    return [dict(zip(names, values)) for values in product(*[axes[name] for name in names])]
+
+
+def applyConfig (config, cacheDir):
+    """
+    @summary: Set the Globals timing parameters for a single run; Parameters not mentioned in
+            the config are returned to their defaults so that nothing leaks between runs
+            that share a worker process
+
+    @param cacheDir: Directory of the result cache (see ResultCache.py), or None to neither
+            use nor save cached results; Passed with every job rather than inherited, since
+            worker processes need not be forked from the one that parsed the options
+    """
+    for name in SWEEP_PARAMS:
+        setattr(Globals, name, config.get(name, DEFAULTS[name]))
+    Globals.RESULT_CACHE_DIR = cacheDir
+    Globals.DEBUG = False
+    Globals.TRACE_FILE = None
+    Globals.COUNTERS_FILE = None
+
+
+def runOne (job):
+    """
+    @summary: Simulate one program under one configuration; Runs inside a worker process
+
+    @param job: Tuple of (configuration dict, program filename, model name, result cache
+            directory)
+
+    @return: dict describing the run - its configuration, program, model, cycle count,
+            instructions per clock (if the model counts instructions) and any error
+    """
+    config, program, model, cacheDir = job
+    result = dict(config)
+    result["program"] = program
+    result["model"] = model
+    result["cycles"] = None
+    result["IPC"] = None
+    result["completed"] = False
+    result["error"] = None
+
+    #noinspection PyBroadException
+    try:
+        applyConfig(config, cacheDir)
+        image = FinalProject.loadImage(program)
+        key = ResultCache.getKey(image, model)
+        summary = ResultCache.load(key)
+        if None == summary:
+            datapath = FinalProject.loadProgram(program, image, model)
+            FinalProject.run(datapath)
+            summary = ResultCache.summarize(datapath)
+            ResultCache.save(key, summary)
+
+        result["cycles"] = summary["cycles"]
+        result["completed"] = summary["completed"]
+        if None != summary["IPC"]:
+            result["IPC"] = round(summary["IPC"], 3)
+    except:
+        result["error"] = format_exc().strip().splitlines()[-1]
+
+    return result
+
+
+def runReplay (job):
+    """
+    @summary: Simulate one program under many configurations and models by recording its
+            instruction stream once and replaying it through a timing model of each; Runs
+            inside a worker process
+
+    @param job: Tuple of (list of configuration dicts, program filename, list of model names,
+            result cache directory); The configurations must agree on every one of
+            FUNCTIONAL_PARAMS
+
+    @return: List of result dicts (see runOne), configuration-major; Only the runs missing from
+            the result cache are replayed, and the program is not even recorded if none are
+    """
+    grid, program, models, cacheDir = job
+    results = []
+    for config in grid:
+        for model in models:
+            result = dict(config)
+            result["program"] = program
+            result["model"] = model
+            result["cycles"] = None
+            result["IPC"] = None
+            result["completed"] = False
+            result["error"] = None
+            results.append(result)
+
+    #noinspection PyBroadException
+    try:
+        image = FinalProject.loadImage(program)
+        keys = []
+        summaries = []
+        for config in grid:
+            applyConfig(config, cacheDir)
+            for model in models:
+                keys.append(ResultCache.getKey(image, "replay " + model))
+                summaries.append(ResultCache.load(keys[-1]))
+
+        missing = [index for index, summary in enumerate(summaries) if None == summary]
+        if missing:
+            applyConfig(grid[0], cacheDir)
+            width = max(config.get("ISSUE_WIDTH", DEFAULTS["ISSUE_WIDTH"]) for config in grid)
+            trace = Replay.record(image, limit = Globals.MAX_CLOCK * max(1, width))
+
+            timingModels = []
+            for index in missing:
+                config = grid[index // len(models)]
+                timing = dict((name, value) for name, value in config.items() if name in Replay.TIMING_PARAMS)
+                timingModels.append(Replay.makeModel(models[index % len(models)], image, timing))
+            Replay.replay(trace, timingModels)
+
+            for index, timingModel in zip(missing, timingModels):
+                # Only models whose datapath reports IPC report it, exactly as when they are simulated
+                IPC = None
+                if hasattr(FinalProject.MODELS[models[index % len(models)]], "getIPC"):
+                    IPC = timingModel.getIPC()
+                summaries[index] = {"cycles": timingModel.clock, "completed": timingModel.completed, "IPC": IPC}
+                ResultCache.save(keys[index], summaries[index])
+
+        for result, summary in zip(results, summaries):
+            result["cycles"] = summary["cycles"]
+            result["completed"] = summary["completed"]
+            if None != summary["IPC"]:
+                result["IPC"] = round(summary["IPC"], 3)
+    except:
+        error = format_exc().strip().splitlines()[-1]
+        for result in results:
+            result["error"] = error
+
+    return results
+
+
+def runSweep (grid, programs, processes = None, models = ["basic"], replay = False, cache = True):
+    """
+    @summary: Run every program under every configuration in the grid
+
+    @param grid: List of configuration dicts, such as those returned by makeGrid()
+    @param programs: List of assembly filenames
+    @param processes: Number of worker processes; Defaults to one per core
+    @param models: Names of the datapaths to simulate; Each one of FinalProject.MODELS
+    @param replay: Replay each program's recorded instruction stream through timing models
+            (see runReplay) instead of simulating every run in full
+    @param cache: Use and save results in the cache in Globals.RESULT_CACHE_DIR
+
+    @return: List of result dicts (see runOne) in grid-major order
+    """
+    programs = [os.path.abspath(program) for program in programs]
+    cacheDir = None
+    if cache and None != Globals.RESULT_CACHE_DIR:
+        cacheDir = os.path.abspath(Globals.RESULT_CACHE_DIR)
+    if None == processes:
+        processes = cpu_count()
+
+    if replay:
+        # One job per program and value of the functional parameters
+        groups = {}
+        for index, config in enumerate(grid):
+            key = tuple(config.get(name, DEFAULTS[name]) for name in FUNCTIONAL_PARAMS)
+            groups.setdefault(key, []).append(index)
+        groups = [(groups[key], program) for key in sorted(groups) for program in programs]
+        jobs = [([grid[index] for index in group], program, models, cacheDir) for group, program in groups]
+        function = runReplay
+    else:
+        jobs = [(config, program, model, cacheDir) for config in grid for program in programs for model in models]
+        function = runOne
+
+    if 1 == processes:
+        results = map(function, jobs)
+    else:
+        pool = Pool(processes)
+        try:
+            results = pool.map(function, jobs, chunksize = 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    if not replay:
+        return results
+
+    # Put the replayed results back in grid-major order
+    ordered = {}
+    for (group, program), jobResults in zip(groups, results):
+        keys = [(index, program, model) for index in group for model in models]
+        ordered.update(zip(keys, jobResults))
+    return [ordered[(index, program, model)] for index in range(len(grid)) for program in programs
+            for model in models]
+
+
+def getColumns (results):
+    params = sorted(set(name for result in results for name in result if name in SWEEP_PARAMS))
+    return ["program", "model"] + params + ["cycles", "IPC", "completed", "error"]
+
+
+def writeCSV (results, filename):
+    f = open(filename, 'wb')
+    writer = csv.writer(f)
+    columns = getColumns(results)
+    writer.writerow(columns)
+    for result in results:
+        writer.writerow([result[column] for column in columns])
+    f.close()
+
+
+def printTable (results):
+    columns = getColumns(results)
+    rows = [columns]
+    for result in results:
+        row = []
+        for column in columns:
+            if "program" == column:
+                row.append(os.path.basename(result[column]))
+            elif None == result[column] and column not in SWEEP_PARAMS:
+                row.append('')
+            else:
+                row.append(str(result[column]))
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+
+
+def parseAxis (text):
+    """
+    @summary: Convert "NAME=V1,V2,..." into a name and a list of values; Each value is a Python
+            literal, so parameters that default to None (such as CACHE_SIZE) can be swept back
+            to it and booleans (such as CACHE_WRITE_BACK) can be swept, and anything else is
+            taken as a string (such as a CACHE_POLICY)
+    """
+    if '=' not in text:
+        raise Exception("Sweep parameters must be given as NAME=V1,V2,... (got \"" + text + "\")")
+    name, values = text.split('=', 1)
+    return name.strip(), [parseValue(value.strip()) for value in values.split(',')]
+
+
+def parseValue (text):
+    try:
+        return literal_eval(text)
+    except (SyntaxError, ValueError):
+        return text
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description = "Sweep Globals timing parameters across assembly programs")
+    parser.add_argument("programs", nargs = '+', help = "assembly programs to simulate")
+    parser.add_argument("--set", dest = "axes", action = "append", default = [], metavar = "NAME=V1,V2,...",
+                        help = "values for one of: " + ", ".join(SWEEP_PARAMS))
+    parser.add_argument("-m", "--model", dest = "models", action = "append", choices = sorted(FinalProject.MODELS),
+                        help = "datapath to simulate (default: basic)")
+    parser.add_argument("-r", "--replay", action = "store_true",
+                        help = "record each program once and replay it through timing models of every run")
+    parser.add_argument("-n", "--no-cache", action = "store_true",
+                        help = "simulate every run, neither using nor saving cached results")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "worker processes (default: one per core)")
+    parser.add_argument("-o", "--output", default = None, help = "also write the results to this CSV file")
+    args = parser.parse_args()
+
+    axes = dict(parseAxis(axis) for axis in args.axes)
+    results = runSweep(makeGrid(axes), args.programs, args.processes, args.models or ["basic"], args.replay,
+                       not args.no_cache)
+
+    printTable(results)
+    if args.output:
+        writeCSV(results, args.output)
+
+    if [result for result in results if result["error"]]:
+        sys.exit(1)
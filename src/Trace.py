@@ -0,0 +1,263 @@
+"""
+@author: David Zemon
+
+@summary: Record structured events from a running pipeline; Any component that can emit
+        events holds a "trace" attribute which is None when tracing is disabled, so the
+        only cost on the hot path is a single truth test
+"""
+
+import marshal
+import Globals
+
+# Event codes - every event is stored as (cycle, code, a, b, c, d)
+TRACE_CYCLE = 0  # a = clock count before the tick
+TRACE_STAGE = 1  # a = stage, b & c = stage inputs
+TRACE_STAGE_DONE = 2  # a = stage, b = instruction held by the stage
+TRACE_REG_CHECK = 3  # a = instruction in the write stage
+TRACE_FU_START = 4  # a = FU name, b = opcode, c & d = operands
+TRACE_FU_FINISH = 5  # a = memory's A, b = memory's B
+TRACE_FU_WAIT = 6  # a = FU name
+TRACE_BRANCH = 7  # a = new PC, b = True if the jump was mispredicted
+TRACE_STALL_CHECK = 8  # a = dependent instruction
+TRACE_STALL_COMPARE = 9  # a = stage, b = independent instruction
+TRACE_STALL_WRITEBACK = 10  # a = destination operand being written (None if not writing)
+TRACE_STALL = 11  # a = stalled instruction, b = cause
+TRACE_WRITE_BUF = 12  # a = valid, b = destination operand, c = value
+TRACE_REG_WRITE = 13  # a = destination operand, b = value
+TRACE_FORWARD = 14  # a = where the value was taken from, b = register, c = value
+TRACE_MEMORY_WAIT = 15  # a = cycles left in the memory stage's cache access
+
+TRACE_FILE_MAGIC = "RTRC"
+TRACE_FILE_VERSION = 1
+
+
+class Tracer(object):
+    """
+    @summary: Store events in a preallocated ring buffer; Once full, the oldest events are
+            overwritten
+    """
+
+    def __init__ (self, size = 65536):
+        self.size = size
+        self.events = [None] * size
+        self.head = 0
+        self.count = 0
+        self.cycle = 0
+
+    def newCycle (self):
+        self.record(TRACE_CYCLE, self.cycle)
+        self.cycle += 1
+
+    def record (self, code, a = None, b = None, c = None, d = None):
+        self.events[self.head] = (self.cycle, code, a, b, c, d)
+        self.head += 1
+        if self.size == self.head:
+            self.head = 0
+        self.count += 1
+
+    def getEvents (self):
+        """
+        @summary: Return all events still held in the buffer, oldest first
+        """
+        if self.count < self.size:
+            return self.events[:self.head]
+        return self.events[self.head:] + self.events[:self.head]
+
+    def close (self):
+        pass
+
+    def save (self, filename):
+        f = open(filename, 'wb')
+        writeHeader(f)
+        for event in self.getEvents():
+            marshal.dump(flatten(event), f)
+        f.close()
+
+
+class FileTracer(Tracer):
+    """
+    @summary: Stream events directly to a binary trace file instead of holding them in memory
+    """
+
+    def __init__ (self, filename):
+        Tracer.__init__(self, 0)
+        self.file = open(filename, 'wb')
+        writeHeader(self.file)
+
+    def record (self, code, a = None, b = None, c = None, d = None):
+        marshal.dump(flatten((self.cycle, code, a, b, c, d)), self.file)
+        self.count += 1
+
+    def getEvents (self):
+        raise Exception("Events have been written to " + self.file.name + "; Use readTraceFile() instead")
+
+    def close (self):
+        self.file.close()
+
+
+class PrintTracer(Tracer):
+    """
+    @summary: Print each event as soon as it is recorded, reproducing the classic debug output
+    """
+
+    def __init__ (self):
+        Tracer.__init__(self, 0)
+        self.printer = TracePrinter()
+
+    def record (self, code, a = None, b = None, c = None, d = None):
+        text = self.printer.format((self.cycle, code, a, b, c, d))
+        if None != text:
+            print text
+        self.count += 1
+
+    def getEvents (self):
+        return []
+
+
+class TracePrinter:
+    """
+    @summary: Convert events into the human-readable text the pipeline has always printed
+    """
+
+    def __init__ (self):
+        # The write stage's output buffer doesn't list a destination until its first write
+        self.destSeen = False
+
+    def format (self, event):
+        """
+        @summary: Return the text for a single event, or None if the event prints nothing
+        """
+        cycle, code, a, b, c, d = event
+
+        if TRACE_CYCLE == code:
+            if a and not (a % 5):
+                return "\n##########\n" + str(a) + ": Tick..."
+            return None
+        elif TRACE_STAGE == code:
+            if 'w' == a:
+                return Globals.STAGE_NAMES[a] + "\n\tInputBuf: " + str(b)
+            elif 'd' == a:
+                return "\n" + Globals.STAGE_NAMES[a]
+            elif 'f' == a:
+                return "\n" + Globals.STAGE_NAMES[a] + "\n\tPC: " + str(b)
+            else:
+                return Globals.STAGE_NAMES[a] + "\n\tA: " + str(b) + "\n\tB: " + str(c)
+        elif TRACE_STAGE_DONE == code:
+            name, ops = splitInstr(b)
+            lines = ["\tInstr: " + name]
+            for op in ops:
+                lines.append("\t\top: " + op)
+            return "\n".join(lines)
+        elif TRACE_REG_CHECK == code:
+            name, ops = splitInstr(a)
+            return "\tDetermining if instruction modifies register file:\n\t\tInstr: " + name + \
+                   "\n\t\tDest operand: " + ops[0]
+        elif TRACE_FU_START == code:
+            return "\t" + a + " FU running " + Globals.OPCODE_NAMES[b] + ":\n\t\top: " + str(c) + "\n\t\top: " + str(d)
+        elif TRACE_FU_FINISH == code:
+            return "\tFU completed\n\t\tMem's A = " + str(a) + "\n\t\tMem's B = " + str(b)
+        elif TRACE_FU_WAIT == code:
+            return "Waiting on " + a + "..."
+        elif TRACE_BRANCH == code:
+            if b:
+                return "\tMispredicted jump!!! Fetching from " + str(a)
+            return "\tTaking jump!!!"
+        elif TRACE_STALL_CHECK == code:
+            return "\tSTALL CHECK\n\t\tDependent instruction: " + instrText(a)
+        elif TRACE_STALL_COMPARE == code:
+            return "\t\t" + Globals.STAGE_NAMES[a] + " received: " + instrText(b)
+        elif TRACE_STALL_WRITEBACK == code:
+            if None == a:
+                return "\t\tWrite is not writing"
+            return "\t\tWrite is writing to: " + opText(a)
+        elif TRACE_STALL == code:
+            return "!!! Stalling \"" + instrText(a) + "\" due to " + b + "..."
+        elif TRACE_WRITE_BUF == code:
+            if None != b:
+                self.destSeen = True
+            if self.destSeen:
+                return "\t{'Dest': <" + opText(b) + ">, 'Valid': " + repr(a) + ", 'Value': " + repr(c) + "}"
+            return "\t{'Valid': " + repr(a) + ", 'Value': " + repr(c) + "}"
+        elif TRACE_REG_WRITE == code:
+            return "Writing to register file!\n\tDest: " + opText(a) + "\n\tValue: " + str(b)
+        elif TRACE_FORWARD == code:
+            return "\tForwarding " + b + " = " + str(c) + " from " + a
+        elif TRACE_MEMORY_WAIT == code:
+            return "Waiting on the data cache (" + str(a) + " cycles left)..."
+        else:
+            raise Exception("Unknown trace event code: " + str(code))
+
+    def printEvents (self, events):
+        for event in events:
+            text = self.format(event)
+            if None != text:
+                print text
+
+
+def instrText (instr):
+    if isinstance(instr, str):
+        return instr
+    return instr.getStr()
+
+
+def opText (op):
+    if isinstance(op, str):
+        return op
+    return op.op
+
+
+def splitInstr (instr):
+    """
+    @summary: Split an instruction (or its text) into its name and a list of operand strings
+    """
+    if not isinstance(instr, str):
+        return instr.instr, [op.op for op in instr.ops]
+
+    name, ops = (instr.split(' ', 1) + [''])[:2]
+    if '' == ops.strip():
+        return name, []
+    return name, ops.split(", ")
+
+
+def flatten (event):
+    """
+    @summary: Replace instruction and operand objects with their text so that an event can be
+            written to a trace file
+    """
+    flat = []
+    for field in event:
+        if hasattr(field, "getStr"):
+            field = field.getStr()
+        elif hasattr(field, "op"):
+            field = field.op
+        flat.append(field)
+    return tuple(flat)
+
+
+def writeHeader (f):
+    f.write(TRACE_FILE_MAGIC + chr(TRACE_FILE_VERSION))
+
+
+def readTraceFile (filename):
+    """
+    @summary: Load every event from a binary trace file written by Tracer.save() or FileTracer
+    """
+    f = open(filename, 'rb')
+    header = f.read(len(TRACE_FILE_MAGIC) + 1)
+    if TRACE_FILE_MAGIC != header[:-1]:
+        raise Exception(filename + " is not a trace file")
+    if TRACE_FILE_VERSION != ord(header[-1]):
+        raise Exception("Unsupported trace file version: " + str(ord(header[-1])))
+
+    events = []
+    while True:
+        try:
+            events.append(marshal.load(f))
+        except EOFError:
+            break
+    f.close()
+    return events
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
@@ -5,8 +5,52 @@
         optimization level
 """
 
-from copy import copy
 import Globals
+import Trace
+
+
+# Operations of each functional unit, as (A, B) pairs of functions of the two operands that
+# compute the unit's outputs; Where B is None, output B is left as it was
+INT_OPERATIONS = {
+    Globals.OP_ADD: (lambda a, b: int(a + b), None),
+    Globals.OP_SUB: (lambda a, b: int(a - b), None),
+    Globals.OP_MUL: (lambda a, b: int(a * b), None),
+    Globals.OP_DIV: (lambda a, b: int(a / b), lambda a, b: int(a % b)),
+    Globals.OP_OR: (lambda a, b: int(a | b), None),
+    Globals.OP_AND: (lambda a, b: int(a & b), None),
+    Globals.OP_NAND: (lambda a, b: int(~(a & b)), None),
+    Globals.OP_XOR: (lambda a, b: int(a ^ b), None),
+    Globals.OP_NEG: (lambda a, b: int(~a), None),
+    Globals.OP_SHL: (lambda a, b: int(a << 1), None),
+    Globals.OP_SHR: (lambda a, b: int(a >> 1), None),
+    Globals.OP_LJMP: (lambda a, b: 0, lambda a, b: a),
+    Globals.OP_SJMP: (lambda a, b: 0, lambda a, b: a + b),
+    Globals.OP_JZ: (lambda a, b: a, lambda a, b: b),
+    Globals.OP_DJNZ: (lambda a, b: a, lambda a, b: b),  # The counter is decremented first
+    Globals.OP_MOV: (lambda a, b: a, lambda a, b: b)
+}
+FLT_OPERATIONS = {
+    Globals.OP_ADD: (lambda a, b: float(a + b), None),
+    Globals.OP_SUB: (lambda a, b: float(a - b), None),
+    Globals.OP_MUL: (lambda a, b: float(a * b), None),
+    Globals.OP_DIV: (lambda a, b: float(a / b), None),
+    Globals.OP_MOV: (lambda a, b: a, lambda a, b: b)
+}
+
+
+def getTiming (FU, op):
+    """
+    @param FU: Type of functional unit; "INT" or "FLT" (see RISC_Instr.FU)
+
+    @return: Tuple of the cycles the operation takes and the cycles before its unit can start
+            another operation (the initiation interval)
+    """
+    if "INT" == FU:
+        if op in Globals.ALU_OPS:
+            return Globals.INTEGER_DELAY, Globals.INTEGER_II or Globals.INTEGER_DELAY
+    elif op not in Globals.MOV_OPS:
+        return Globals.FLOATING_POINT_DELAY, Globals.FLOATING_POINT_II or Globals.FLOATING_POINT_DELAY
+    return Globals.MISC_DELAY, Globals.MISC_II or Globals.MISC_DELAY
 
 
 class FuncUnit:
@@ -15,6 +59,10 @@ class FuncUnit:
             in an output buffer known as "output" in the __init__ parameters
     """
 
+    # Type of the unit and the table of its operations; Set by each child class
+    TYPE = None
+    OPERATIONS = None
+
     def __init__ (self, output):
         """
         @summary: Create a new functional unit and store values in the output dictionary
@@ -23,13 +71,20 @@ class FuncUnit:
                     for what A and B are used for
         """
         self.delay = None;
-        self.ops = []
+        self.interval = None
+        self.ops = [None, None]
         self.output = output
+        self.trace = None
         self.getName()
 
-    def load (self, op, ops = []):
-        print "Calling FuncUnit.load()! Illegal! Must call child class!"
-        exit(1)
+    def load (self, op, a, b):
+        self.operation = op
+        self.ops[0] = a
+        self.ops[1] = b
+        self.delay, self.interval = getTiming(self.TYPE, op)
+
+        if self.trace:
+            self.trace.record(Trace.TRACE_FU_START, self.name, op, a, b)
 
     def getDelay (self):
         return self.curDelay
@@ -42,105 +97,52 @@ class FuncUnit:
     def ding (self):
         # If the functional unit is done computing, go "DING!"
         if 0 == self.delay:
-            if Globals.DEBUG:
-                print "\tFU completed\n\t\tMem's A = " + str(self.output["A"]) + "\n\t\tMem's B = " + str(
-                    self.output["B"])
+            if self.trace:
+                self.trace.record(Trace.TRACE_FU_FINISH, self.output["A"], self.output["B"])
             return True
         # Else do nothing :(
         else:
             return False
 
+    def writeResult (self):
+        try:
+            computeA, computeB = self.OPERATIONS[self.operation]
+        except KeyError:
+            raise Exception("Unknown operation entered functional unit! " + str(self.operation))
+
+        ops = self.ops
+        if None == computeB:
+            self.output["A"] = computeA(ops[0], ops[1])
+        else:
+            if Globals.OP_DJNZ == self.operation:
+                ops[0] -= 1
+            self.output["A"] = computeA(ops[0], ops[1])
+            self.output["B"] = computeB(ops[0], ops[1])
+
 
 class IntFU(FuncUnit):
+    TYPE = "INT"
+    OPERATIONS = INT_OPERATIONS
+
     def getName (self):
         self.name = "Integer"
 
-    def load (self, op, ops = []):
-        self.operation = copy(op)
-        self.ops = copy(ops)
-        if self.operation in (Globals.MATH_INSTRS + Globals.LOGIC_INSTRS + Globals.SHIFT_INSTRS):
-            self.delay = Globals.INTEGER_DELAY
-        else:
-            self.delay = Globals.MISC_DELAY
-
-        if Globals.DEBUG:
-            print "\tInteger FU running " + self.operation + ':'
-            for op in self.ops:
-                print "\t\top: " + str(op)
-
-    def writeResult (self):
-        if "add" == self.operation:
-            self.output["A"] = int(self.ops[0] + self.ops[1])
-        elif "sub" == self.operation:
-            self.output["A"] = int(self.ops[0] - self.ops[1])
-        elif "mul" == self.operation:
-            self.output["A"] = int(self.ops[0] * self.ops[1])
-        elif "div" == self.operation:
-            self.output["A"] = int(self.ops[0] / self.ops[1])
-            self.output["B"] = int(self.ops[0] % self.ops[1])
-        elif "or" == self.operation:
-            self.output["A"] = int(self.ops[0] | self.ops[1])
-        elif "and" == self.operation:
-            self.output["A"] = int(self.ops[0] & self.ops[1])
-        elif "nand" == self.operation:
-            self.output["A"] = int(~(self.ops[0] & self.ops[1]))
-        elif "xor" == self.operation:
-            self.output["A"] = int(self.ops[0] ^ self.ops[1])
-        elif "neg" == self.operation:
-            self.output["A"] = int(~self.ops[0])
-        elif "shl" == self.operation:
-            self.output["A"] = int(self.ops[0] << 1)
-        elif "shr" == self.operation:
-            self.output["A"] = int(self.ops[0] >> 1)
-        elif "ljmp" == self.operation:
-            self.output["A"] = 0
-            self.output["B"] = self.ops[0]
-        elif "sjmp" == self.operation:
-            self.output["A"] = 0
-            self.output["B"] = self.ops[0] + self.ops[1]
-        elif self.operation in Globals.CND_JMP_INSTRS:
-            if "djnz" == self.operation:
-                self.ops[0] -= 1
-            self.output["A"] = self.ops[0]
-            self.output["B"] = self.ops[1]
-        elif "mov" == self.operation:
-            self.output["A"] = self.ops[0]
-            self.output["B"] = self.ops[1]
-        else:
-            raise Exception("Unknown operation entered functional unit! " + self.operation)
-
 
 class FltFU(FuncUnit):
+    TYPE = "FLT"
+    OPERATIONS = FLT_OPERATIONS
+
     def getName (self):
         self.name = "Floating point"
 
-    def load (self, op, ops = []):
-        self.operation = copy(op)
-        self.ops = copy(ops)
-        if self.operation in Globals.MOV_INSTRS:
-            self.delay = Globals.MISC_DELAY
-        else:
-            self.delay = Globals.FLOATING_POINT_DELAY
-
-    def writeResult (self):
-        if "add" == self.operation:
-            self.output["A"] = float(self.ops[0] + self.ops[1])
-        elif "sub" == self.operation:
-            self.output["A"] = float(self.ops[0] - self.ops[1])
-        elif "mul" == self.operation:
-            self.output["A"] = float(self.ops[0] * self.ops[1])
-        elif "div" == self.operation:
-            self.output["A"] = float(self.ops[0] / self.ops[1])
-        elif self.operation in Globals.MOV_INSTRS:
-            self.output["A"] = self.ops[0]
-            self.output["B"] = self.ops[1]
-        else:
-            raise Exception("Unknown operation entered functional unit! " + self.operation)
-
 
 class RISC_Instr(object):
     """
-    @summary: Container for RISC-like instruction & operands
+    @summary: Container for RISC-like instruction & operands; The instruction is decoded
+            once, upon creation, so that the pipeline never needs to inspect strings.
+            Instructions are not tied to any one machine - register file and RAM are
+            passed in whenever an operand is read - so a single program image can be
+            shared by any number of machines
 
     Available instructions:
         - nop
@@ -151,17 +153,38 @@ class RISC_Instr(object):
         - sjmp, ljmp, jz, djnz
     """
 
-    def __init__ (self, Rn, instr, ops = []):
-        # Save the register file
-        self.Rn = Rn
+    __slots__ = ("instr", "opcode", "ops", "srcOps", "srcMask", "dstMask", "FU", "writesReg")
 
-        # Store the instruction name
+    def __init__ (self, instr, ops = []):
+        # Store the instruction name and its opcode
+        if instr not in Globals.OPCODES:
+            raise Exception("Unknown instruction: " + str(instr))
         self.instr = instr
+        self.opcode = Globals.OPCODES[instr]
 
-        # Store the operands
+        # Store the operands, decoding any that are still in text form
         self.ops = []
         for op in ops:
-            self.ops.append(FlexibleOp(self.Rn, op))
+            if isinstance(op, FlexibleOp):
+                self.ops.append(op)
+            else:
+                self.ops.append(FlexibleOp(op))
+
+        # Determine everything the pipeline would otherwise ask on every tick
+        self.srcOps = self.decodeSrcOps()
+        self.srcMask = 0
+        if self.opcode not in Globals.NO_READ_OPS:
+            for op in self.srcOps:
+                self.srcMask |= op.readMask
+        self.dstMask = 0
+        if self.opcode not in Globals.NO_WRITE_OPS and self.ops:
+            self.dstMask = self.ops[0].writeMask
+        self.FU = "INT"
+        for op in self.ops:
+            if 'F' in op.op:
+                self.FU = "FLT"
+        self.writesReg = (self.opcode in Globals.ALU_OPS or self.opcode in (Globals.OP_DJNZ, Globals.OP_MOV)) and \
+                         bool(self.ops) and Globals.OPND_REG == self.ops[0].kind
 
     def __getitem__ (self, opNum):
         return self.ops[opNum]
@@ -169,20 +192,23 @@ class RISC_Instr(object):
     def getOps (self):
         return self.ops
 
-    def getSrcOps (self):
-        if self.instr in (Globals.MOV_INSTRS + Globals.MATH_INSTRS + Globals.LOGIC_INSTRS + Globals.SHIFT_INSTRS):
+    def decodeSrcOps (self):
+        if self.opcode in Globals.MOV_OPS or self.opcode in Globals.ALU_OPS:
             ops = []
-            for op in self.ops:
-                if 0 != self.ops.index(op) and '#' != op.op[0]:
+            for i, op in enumerate(self.ops):
+                if 0 != i and Globals.OPND_IMMEDIATE != op.kind:
                     ops.append(op)
-                if 0 == self.ops.index(op) and '@' == op.op[0]:
+                if 0 == i and Globals.OPND_INDIRECT == op.kind:
                     ops.append(op)
             return ops
-        elif self.instr in Globals.CND_JMP_INSTRS:
+        elif self.opcode in Globals.CND_JMP_OPS:
             return [self.ops[0]]
         else:
             return []
 
+    def getSrcOps (self):
+        return self.srcOps
+
     def numOps (self):
         return len(self.ops)
 
@@ -194,25 +220,13 @@ class RISC_Instr(object):
                 register move FUs, etc
         """
 
-        for op in self.ops:
-            if 'F' in op.op:
-                return FUs["FLT"]
-
-        return FUs["INT"]
+        return FUs[self.FU]
 
     def writeResult (self):
         """
         @summary: Determine if the instruction should write back to the register file
         """
-        if Globals.DEBUG and "nop" != self.instr:
-            print "\tDetermining if instruction modifies register file:"
-            print "\t\tInstr: " + self.instr + "\n\t\tDest operand: " + self.ops[0].op
-
-        if self.instr in (Globals.MATH_INSTRS + Globals.LOGIC_INSTRS + Globals.SHIFT_INSTRS + ["djnz", "mov"]):
-            if 'F' == self.ops[0].op[0] or 'R' == self.ops[0].op[0]:
-                return True
-
-        return False
+        return self.writesReg
 
     def getStr (self):
         ops = []
@@ -220,28 +234,29 @@ class RISC_Instr(object):
             ops.append(op.op)
         return str(self.instr) + ' ' + ", ".join(ops)
 
-    def getSrcOpVal (self, srcOp):
-        if "nop" == self.instr:
+    def getSrcOpVal (self, srcOp, Rn, ram):
+        opcode = self.opcode
+        if Globals.OP_NOP == opcode:
             return None
 
-        if srcOp in [0, 1, 2]:
+        if srcOp in (0, 1, 2):
             # Handle jump and move instructions
-            if self.instr in Globals.JUMP_INSTRS:
-                if 0 == srcOp or (1 == srcOp and (self.instr in Globals.CND_JMP_INSTRS)):
-                    return self.ops[srcOp].getVal()
+            if opcode in Globals.JUMP_OPS:
+                if 0 == srcOp or (1 == srcOp and (opcode in Globals.CND_JMP_OPS)):
+                    return self.ops[srcOp].getVal(Rn, ram)
                 else:
                     return None
-            elif "mov" == self.instr:
-                if self.ops[srcOp].isLdStrOp():
-                    return self.ops[srcOp].getAddress()
+            elif Globals.OP_MOV == opcode:
+                if self.ops[srcOp].ldStr:
+                    return self.ops[srcOp].getAddress(Rn)
                 else:
-                    return self.ops[srcOp].getVal()
+                    return self.ops[srcOp].getVal(Rn, ram)
             # Handle everything else
             else:
                 if 0 == srcOp:
                     raise Exception("Range error: 0 is not a source operand for the " + self.instr + " instruction")
-                elif 1 == srcOp or (2 == srcOp and (self.instr in Globals.TRIPLE_OPERANDS)):
-                    return self.ops[srcOp].getVal()
+                elif 1 == srcOp or (2 == srcOp and (opcode in Globals.TRIPLE_OPS)):
+                    return self.ops[srcOp].getVal(Rn, ram)
                 else:
                     return None
         else:
@@ -249,29 +264,93 @@ class RISC_Instr(object):
                 "Range error: RISC_Intr.getSrcOpVal() does not support operand requests other than 0, 1, and 2")
 
 
-class FlexibleOp:
-    def __init__ (self, Rn, op):
+class FlexibleOp(object):
+    """
+    @summary: A single instruction operand; The addressing mode, register name and any
+            immediate value or direct address are decoded once, upon creation
+    """
+
+    __slots__ = ("op", "kind", "reg", "value", "ldStr", "readMask", "writeMask")
+
+    def __init__ (self, op):
         self.op = op
-        self.Rn = Rn
+        self.reg = None
+        self.value = None
 
-    def getVal (self):
         # Case 1) Register file operand
-        if ('R' == self.op[0]) or ('F' == self.op[0]):
-            return self.Rn[self.op]
+        if ('R' == op[0]) or ('F' == op[0]):
+            self.kind = Globals.OPND_REG
+            self.reg = op
         # Case 2) Indirect addressing
-        elif ('@' == self.op[0]):
-            return Globals.basicRAM[self.Rn[self.op]]
+        elif '@' == op[0]:
+            self.kind = Globals.OPND_INDIRECT
+            self.reg = op[1:]
         # Case 3) Immediate addressing
-        elif '#' == self.op[0]:
-            if '.' in self.op:
-                return float(self.op[1:])
+        elif '#' == op[0]:
+            self.kind = Globals.OPND_IMMEDIATE
+            if '.' in op:
+                self.value = float(op[1:])
             else:
-                return int(self.op[1:])
+                self.value = int(op[1:])
         # Case 4) Direct addressing
         else:
-            return Globals.basicRAM[int(self.op)]
+            self.kind = Globals.OPND_DIRECT
+            self.value = int(op)
+
+        self.ldStr = self.kind in (Globals.OPND_INDIRECT, Globals.OPND_DIRECT)
+        self.decodeMasks()
 
-    def setVal (self, value):
+    @staticmethod
+    def fromFields (op, kind, reg, value):
+        """
+        @summary: Recreate an operand from the fields returned by getFields(), without
+                parsing its text again
+        """
+        operand = FlexibleOp.__new__(FlexibleOp)
+        operand.op = op
+        operand.kind = kind
+        operand.reg = reg
+        operand.value = value
+        operand.ldStr = kind in (Globals.OPND_INDIRECT, Globals.OPND_DIRECT)
+        operand.decodeMasks()
+        return operand
+
+    def decodeMasks (self):
+        """
+        @summary: Determine the hazard mask bits (see Globals) of every location this operand
+                reads when used as a source and writes when used as a destination; Reading
+                through a register depends on both the register and the RAM it points to
+        """
+        kind = self.kind
+        if Globals.OPND_REG == kind:
+            self.readMask = 1 << Globals.REG_NAMES.index(self.reg)
+            self.writeMask = self.readMask
+        elif Globals.OPND_INDIRECT == kind:
+            reg = Globals.REG_NAMES.index(self.reg)
+            self.writeMask = 1 << (Globals.MASK_INDIRECT_SHIFT + reg)
+            self.readMask = self.writeMask | (1 << reg)
+        elif Globals.OPND_DIRECT == kind:
+            self.readMask = 1 << (Globals.MASK_DIRECT_SHIFT + self.value % Globals.MASK_DIRECT_BITS)
+            self.writeMask = self.readMask
+        else:
+            self.readMask = 0
+            self.writeMask = 0
+
+    def getFields (self):
+        return self.op, self.kind, self.reg, self.value
+
+    def getVal (self, Rn, ram):
+        kind = self.kind
+        if Globals.OPND_REG == kind:
+            return Rn[self.reg]
+        elif Globals.OPND_IMMEDIATE == kind:
+            return self.value
+        elif Globals.OPND_INDIRECT == kind:
+            return ram[Rn[self.reg]]
+        else:
+            return ram[self.value]
+
+    def setVal (self, value, Rn, ram):
         """
         @summary: Decode the address of an operand and write 'value' to that address
         """
@@ -279,32 +358,32 @@ class FlexibleOp:
         if None == value:
             raise Exception("Attempting to write 'None' as destination value")
 
-        # Case 1) Register file operand
-        if ('R' == self.op[0]) or ('F' == self.op[0]):
-            self.Rn[self.op] = value
-        # Case 2) Indirect addressing
-        elif ('@' == self.op[0]):
-            Globals.basicRAM[self.Rn[self.op[1:]]] = value
-        # Case 3) Direct addressing
+        kind = self.kind
+        if Globals.OPND_REG == kind:
+            Rn[self.reg] = value
+        elif Globals.OPND_INDIRECT == kind:
+            ram[Rn[self.reg]] = value
+        elif Globals.OPND_DIRECT == kind:
+            ram[self.value] = value
         else:
-            Globals.basicRAM[self.op] = value
+            raise Exception("Attempting to write to an immediate operand: " + self.op)
 
     def isLdStrOp (self):
-        if ('R' == self.op[0]) or ('F' == self.op[0]) or ('#' == self.op[0]):
-            return False
-        else:
-            return True
+        return self.ldStr
 
-    def getAddress (self):
+    def getAddress (self, Rn):
         # Throw an error if the operand is not indirect or direct
-        if not self.isLdStrOp():
+        if not self.ldStr:
             raise Exception("Requested address from operand that is not a RAM address")
 
-        if '@' == self.op[0]:
-            return self.Rn[self.op[1:]]
+        if Globals.OPND_INDIRECT == self.kind:
+            return Rn[self.reg]
         else:
-            return int(self.op)
+            return self.value
+
 
+# The one and only bubble; It is shared by every stage of every pipe since instructions are immutable
+Globals.INIT_INSTR = RISC_Instr("nop")
 
 if __name__ == "__main__":
     raise Exception("Cannot call this file directly")
@@ -0,0 +1,157 @@
+"""
+@author: David Zemon
+
+@summary: Provide a multi-issue datapath; Each clock, a bundle of up to Globals.ISSUE_WIDTH
+    consecutive instructions is issued, in order, to Globals.INT_PIPES integer and
+    Globals.FLT_PIPES floating point functional units
+
+    A bundle ends at the first instruction that cannot issue this clock:
+        - No unit of its functional unit type can start an operation (structural hazard); A
+          unit can start one every initiation interval (Globals.INTEGER_II and friends), so a
+          pipelined unit overlaps operations and an unpipelined one is busy for the full delay
+        - It reads a result that is still being computed (RAW) or writes a destination that an
+          unfinished instruction also writes (WAW); This includes earlier instructions of the
+          same bundle, so dependent instructions are never bundled together
+        - It follows a jump; Issue waits until the jump has been resolved
+
+    Operands are read as an instruction issues, so there can be no WAR hazard, and a result
+    can be used by instructions issued in the same clock that it is written.
+"""
+
+import Globals
+from Scoreboard import ScoreboardPipe, ScoreboardRISC, getReadMask, getWriteMask
+from UniversalComponents import FltFU, IntFU
+
+
+class VLIWPipe(ScoreboardPipe):
+    """
+    @summary: One functional unit of the multi-issue datapath; Operands are read at issue and
+            the result is written as soon as the unit is done
+    """
+
+    def issue (self, instr, seq, nextPC):
+        ScoreboardPipe.issue(self, instr, seq, nextPC)
+        srcValues = self.getSrcValues()
+        self.FU.load(self.IR.opcode, srcValues['A'], srcValues['B'])
+        self.stage = 'E'
+
+    def tick (self):
+        if 'E' != self.stage:
+            return
+
+        self.FU.tick()
+        if self.FU.ding():
+            if self.IR.opcode in Globals.JUMP_OPS:
+                self.parent.resolveJump(self.branchCheck(), self.result['B'])
+            self.writeResult()
+            self.IR = Globals.INIT_INSTR
+            self.stage = None
+            self.parent.retired += 1
+
+
+class VLIWRISC(ScoreboardRISC):
+    """
+    @summary: A multi-issue RISC datapath; Reports the instructions per clock it achieves so
+            that the number of functional units can be sized by measured throughput. Like the
+            scoreboard, it can not be checkpointed (see Checkpoint.py)
+    """
+
+    PIPE = VLIWPipe
+
+    def __init__ (self, program, ram = None):
+        """
+        @param program: Instruction memory - a list of RISC_Instr that is never modified
+        @param ram: This machine's own data memory; Defaults to a new, empty Memory
+        """
+        ScoreboardRISC.__init__(self, program, ram)
+        self.retired = 0
+
+        # Clock at which each functional unit can start its next operation; Each operation in
+        # flight is held by a pipe of its own, so a pipelined unit may need several
+        self.unitReady = {"FLT": [0] * Globals.FLT_PIPES, "INT": [0] * Globals.INT_PIPES}
+
+        # Number of clocks in which each possible number of instructions was issued
+        self.bundleSizes = [0] * (Globals.ISSUE_WIDTH + 1)
+
+    def tick (self):
+        """
+        @summary: Simulate one clock cycle; Functional units finish and write their results
+                first, then the next bundle is issued
+        """
+        if self.trace:
+            self.trace.newCycle()
+
+        for pipe in sorted([pipe for pipe in self.getPipes() if pipe.isBusy()], key = lambda pipe: pipe.seq):
+            pipe.tick()
+
+        self.bundleSizes[self.issueBundle()] += 1
+        self.clock += 1
+
+    def issueBundle (self):
+        """
+        @return: Number of instructions issued
+        """
+        pending = 0
+        for pipe in self.getPipes():
+            if pipe.isBusy():
+                pending |= pipe.writeMask
+
+        issued = 0
+        while issued < Globals.ISSUE_WIDTH and not self.jumpPending and 0 <= self.PC < len(self.program):
+            instr = self.program[self.PC]
+
+            # A nop takes a slot in the bundle but no functional unit
+            if Globals.OP_NOP == instr.opcode:
+                self.PC += 1
+                self.retired += 1
+                issued += 1
+                continue
+
+            writeMask = getWriteMask(instr)
+            if (getReadMask(instr) | writeMask) & pending:
+                break
+
+            unitReady = self.unitReady[instr.FU]
+            unit = None
+            for i, ready in enumerate(unitReady):
+                if ready <= self.clock:
+                    unit = i
+                    break
+            if None == unit:
+                break
+
+            self.PC += 1
+            freePipe = self.getFreePipe(instr.FU)
+            freePipe.issue(instr, self.seq, self.PC)
+            unitReady[unit] = self.clock + freePipe.FU.interval
+            self.seq += 1
+            pending |= writeMask
+            issued += 1
+
+            if instr.opcode in Globals.JUMP_OPS:
+                self.jumpPending = True
+
+        return issued
+
+    def getFreePipe (self, FU):
+        """
+        @return: A pipe of the given functional unit type holding no operation, created if
+                every existing one is in use
+        """
+        for pipe in self.instrPipes[FU]:
+            if not pipe.isBusy():
+                return pipe
+
+        pipe = self.PIPE(self, {"FLT": FltFU, "INT": IntFU}[FU])
+        pipe.FU.trace = self.trace
+        self.instrPipes[FU].append(pipe)
+        return pipe
+
+    def getIPC (self):
+        if not self.clock:
+            return 0.0
+        return float(self.retired) / self.clock
+
+
+if __name__ == "__main__":
+    raise Exception("Cannot call this file directly")
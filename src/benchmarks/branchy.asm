@@ -0,0 +1,18 @@
+# File: branchy.asm
+# Purpose: Data-dependent branches - count the even and odd numbers from 10 down to 1
+#
+        mov R0, #10
+        mov R1, #0
+        mov R2, #0
+loop:   and R3, R0, #1
+        jz R3, even
+        add R2, R2, #1
+        sjmp next
+even:   add R1, R1, #1
+next:   djnz R0, loop
+
+        ljmp done
+        mov R1, #999
+        mov R2, #999
+done:   mov 400, R1
+        mov 401, R2
@@ -0,0 +1,17 @@
+# File: djnzloop.asm
+# Purpose: Tight and nested djnz loops
+#
+        # Sum of 1 through 20
+        mov R0, #20
+        mov R1, #0
+sum:    add R1, R1, R0
+        djnz R0, sum
+
+        # 4 x 5 nested iterations
+        mov R3, #0
+        mov R2, #4
+outer:  mov R0, #5
+inner:  add R3, R3, #1
+        djnz R0, inner
+        djnz R2, outer
+        mov 16, R3
@@ -0,0 +1,26 @@
+# File: fltchain.asm
+# Purpose: Chains of dependent floating point multiplies and divides
+#
+        mov F0, #1.5
+        mov F1, #2.0
+        mul F2, F0, F1
+        div F3, F2, F0
+        mul F2, F2, F3
+        add F0, F2, F1
+        div F1, F0, #4.0
+
+        # Scale by 2 six times
+        mov R0, #6
+scale:  mul F2, F2, F1
+        djnz R0, scale
+        mov 300, F2
+
+        # Independent multiplies, which only a machine with spare FP units can overlap
+        mov F0, #3.0
+        mov F1, #0.5
+        mul F2, F0, F0
+        mul F3, F1, F1
+        div F0, F0, #2.0
+        div F1, F1, #4.0
+        add F2, F2, F3
+        mov 301, F2
@@ -0,0 +1,24 @@
+# File: intchain.asm
+# Purpose: Chains of dependent integer multiplies and divides
+#
+        mov R0, #3
+        mul R1, R0, R0
+        mul R1, R1, R0
+        mul R1, R1, R0
+        div R2, R1, #4
+        mul R3, R2, R1
+        div R3, R3, R0
+        sub R0, R3, R2
+        mov 200, R3
+        mov R2, 200
+        add R2, R2, R1
+
+        # Repeated multiply-divide, so every iteration waits on the last
+        mov R0, #6
+        mov R1, #7
+        mov R3, #1
+chain:  mul R3, R3, R1
+        div R3, R3, #2
+        add R3, R3, #5
+        djnz R0, chain
+        mov 201, R3
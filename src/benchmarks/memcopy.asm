@@ -0,0 +1,17 @@
+# File: memcopy.asm
+# Purpose: Fill a block of RAM and copy it elsewhere with indirect (@R) moves
+#
+        mov R0, #8
+        mov R1, #64
+fill:   mov @R1, R0
+        add R1, R1, #1
+        djnz R0, fill
+
+        mov R0, #8
+        mov R1, #64
+        mov R2, #128
+copy:   mov R3, @R1
+        mov @R2, R3
+        add R1, R1, #1
+        add R2, R2, #1
+        djnz R0, copy
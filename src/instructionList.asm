@@ -2,14 +2,13 @@
 # Author: David Zemon
 # Purpose: Provide a brief set of instructions to evaluate pipeline optimization effectiveness
 #
-# NOTE: No blank lines are allowed - any line that is not a valid instruction must begin with '#'
-#
 mov R0, #128
 mov R1, #2
 div R2, R0, R1
-sjmp #2
+sjmp skipF0
 nop
 mov F0, #66.6
+skipF0:
 mov F1, #99.9
 mov @R0, #0
 add R0, R0, #1
@@ -34,7 +33,7 @@ mov R0, #10
 nop
 mov R0, #11
 mov @R0, #20
-sjmp #8
+sjmp skipNops
 mov @R0, #777
 nop
 nop
@@ -43,11 +42,13 @@ nop
 nop
 nop
 nop
+
+skipNops:
 mov R0, #0
 mov R1, #666
 mov @R0, R1
 mov R1, #64
 mov R0, #8
-mov @R1, R0
+loop:   mov @R1, R0
 add R1, R1, #1
-djnz R0, #-3
+djnz R0, loop
@@ -0,0 +1,97 @@
+"""
+@author: David Zemon
+
+@summary: Check that a run resumed from the checkpoint written at cycle N ends exactly as the
+    uninterrupted run did, both through FinalProject.run() and from the command line
+
+    Usage: python -m unittest discover -s tests (from the src directory)
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import Globals
+import Checkpoint
+import FinalProject
+
+PROGRAM = os.path.join(SRC_DIR, "instructionList.asm")
+MEMCOPY = os.path.join(SRC_DIR, "benchmarks", "memcopy.asm")
+
+
+def getState (datapath):
+    return dict(datapath.Rn), datapath.RAM.getCells()
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = dict((name, getattr(Globals, name)) for name in
+                          ["IMAGE_CACHE_DIR", "CHECKPOINT_INTERVAL", "CHECKPOINT_FILE", "CACHE_SIZE"])
+        Globals.IMAGE_CACHE_DIR = None
+        Globals.CHECKPOINT_FILE = os.path.join(self.directory, "run.rckp")
+
+    def tearDown (self):
+        for name, value in self.saved.items():
+            setattr(Globals, name, value)
+        shutil.rmtree(self.directory)
+
+    def checkResume (self, program, model, interval):
+        """
+        @summary: Run a program with checkpoints every 'interval' cycles, then resume from the
+                last one written
+        """
+        Globals.CHECKPOINT_INTERVAL = None
+        reference = FinalProject.loadProgram(program, model = model)
+        cycles = FinalProject.run(reference)
+        self.assertTrue(interval < cycles)
+
+        Globals.CHECKPOINT_INTERVAL = interval
+        self.assertEqual(cycles, FinalProject.run(FinalProject.loadProgram(program, model = model)))
+
+        Globals.CHECKPOINT_INTERVAL = None
+        restored = Checkpoint.restore(Globals.CHECKPOINT_FILE)
+        self.assertEqual(model, [name for name, datapath in FinalProject.MODELS.items()
+                                 if datapath is restored.__class__][0])
+        self.assertEqual((cycles - 1) // interval * interval, restored.clock)
+        self.assertEqual(cycles, FinalProject.run(restored))
+        self.assertEqual(getState(reference), getState(restored))
+
+    def testResume (self):
+        for model in Checkpoint.DATAPATHS.values():
+            name = [key for key, datapath in FinalProject.MODELS.items() if datapath is model][0]
+            for interval in [1, 17, 50, 80]:
+                self.checkResume(PROGRAM, name, interval)
+
+    def testResumeWithCache (self):
+        Globals.CACHE_SIZE = 8
+        for interval in [9, 40, 100]:
+            self.checkResume(MEMCOPY, "basic", interval)
+
+    def testRefused (self):
+        Globals.CHECKPOINT_INTERVAL = 10
+        for model in ["scoreboard", "vliw"]:
+            datapath = FinalProject.loadProgram(PROGRAM, model = model)
+            self.assertRaises(Exception, FinalProject.run, datapath)
+            self.assertEqual(0, datapath.clock)
+
+    def testCommandLine (self):
+        script = os.path.join(SRC_DIR, "FinalProject.py")
+        checkpoint = Globals.CHECKPOINT_FILE
+        output = subprocess.check_output([sys.executable, script, "-i", "100", "--checkpoint-file", checkpoint,
+                                          PROGRAM], cwd = self.directory)
+        self.assertTrue("Completed in 137 clock cycles!" in output)
+
+        output = subprocess.check_output([sys.executable, script, "-r", checkpoint], cwd = self.directory)
+        self.assertTrue("Restored " + checkpoint + " at clock 100" in output)
+        self.assertTrue("Completed in 137 clock cycles!" in output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+@author: David Zemon
+
+@summary: Check that fast-forwarding a program on the functional interpreter and handing it
+    off to a cycle-accurate datapath ends in the same state as simulating it in detail from
+    the start
+
+    Usage: python -m unittest discover -s tests (from the src directory)
+"""
+
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import Globals
+import FinalProject
+
+PROGRAMS = [os.path.join(SRC_DIR, "instructionList.asm"), os.path.join(SRC_DIR, "benchmarks", "djnzloop.asm"),
+            os.path.join(SRC_DIR, "benchmarks", "memcopy.asm")]
+
+
+def getState (datapath):
+    return dict(datapath.Rn), datapath.RAM.getCells()
+
+
+class HandOffTest(unittest.TestCase):
+    def setUp (self):
+        self.imageCacheDir = Globals.IMAGE_CACHE_DIR
+        Globals.IMAGE_CACHE_DIR = None
+
+    def tearDown (self):
+        Globals.IMAGE_CACHE_DIR = self.imageCacheDir
+
+    def checkHandOff (self, program, model, count = None, PC = None):
+        image = FinalProject.loadImage(program)
+        reference = FinalProject.loadProgram(program, image, model)
+        FinalProject.run(reference)
+
+        datapath = FinalProject.loadProgram(program, image, model)
+        FinalProject.fastForward(datapath, count, PC)
+        FinalProject.run(datapath)
+
+        message = os.path.basename(program) + " on " + model
+        self.assertTrue(datapath.done(), message)
+        self.assertEqual(getState(reference), getState(datapath), message)
+
+    def testFastForward (self):
+        for program in PROGRAMS:
+            for model in sorted(FinalProject.MODELS):
+                for count in [0, 1, 7, 20, 10000]:
+                    self.checkHandOff(program, model, count = count)
+
+    def testToPC (self):
+        for program in PROGRAMS:
+            for model in sorted(FinalProject.MODELS):
+                for PC in [0, 3, 7, len(FinalProject.loadImage(program)) - 1]:
+                    self.checkHandOff(program, model, PC = PC)
+
+    def testFastForwardIsShorter (self):
+        program = PROGRAMS[1]
+        reference = FinalProject.loadProgram(program)
+        datapath = FinalProject.loadProgram(program)
+        self.assertEqual(45, FinalProject.fastForward(datapath, PC = 7))
+        self.assertTrue(FinalProject.run(datapath) < FinalProject.run(reference))
+
+
+if __name__ == "__main__":
+    unittest.main()
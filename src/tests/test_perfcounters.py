@@ -0,0 +1,82 @@
+"""
+@author: David Zemon
+
+@summary: Check that the performance counters charge one branch-flush cycle to every jump that
+    squashed decode: every taken jump without a branch predictor, or every mispredicted jump
+    with one
+
+    Usage: python -m unittest discover -s tests (from the src directory)
+"""
+
+import os
+import sys
+import unittest
+from copy import deepcopy
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import Globals
+import FinalProject
+import PerfCounters
+from Functional import FunctionalRISC
+from Memory import Memory
+
+PROGRAMS = [os.path.join(SRC_DIR, "instructionList.asm"), os.path.join(SRC_DIR, "benchmarks", "djnzloop.asm"),
+            os.path.join(SRC_DIR, "benchmarks", "branchy.asm")]
+
+
+def countTakenJumps (image):
+    """
+    @return: dict mapping the address of each jump to the number of times it was taken
+    """
+    machine = FunctionalRISC(image, Memory(), deepcopy(Globals.DEFAULT_REG_FILE))
+    taken = {}
+    while not machine.done():
+        PC = machine.PC
+        machine.step()
+        if image[PC].opcode in Globals.JUMP_OPS and machine.PC != PC + 1:
+            taken[PC] = taken.get(PC, 0) + 1
+    return taken
+
+
+class BranchFlushTest(unittest.TestCase):
+    def setUp (self):
+        self.saved = dict((name, getattr(Globals, name)) for name in ["IMAGE_CACHE_DIR", "BRANCH_PREDICTOR"])
+        Globals.IMAGE_CACHE_DIR = None
+
+    def tearDown (self):
+        for name, value in self.saved.items():
+            setattr(Globals, name, value)
+
+    def runCounted (self, program, model):
+        datapath = FinalProject.loadProgram(program, model = model)
+        counters = PerfCounters.PerfCounters()
+        datapath.setCounters(counters)
+        FinalProject.run(datapath)
+        self.assertTrue(datapath.done())
+        self.assertEqual(datapath.clock, counters.cycles)
+        return datapath, counters
+
+    def testTakenJumps (self):
+        Globals.BRANCH_PREDICTOR = None
+        for program in PROGRAMS:
+            taken = countTakenJumps(FinalProject.loadImage(program))
+            for model in ["basic", "forwarding"]:
+                datapath, counters = self.runCounted(program, model)
+                message = os.path.basename(program) + " on " + model
+                self.assertEqual(sum(taken.values()), counters.causes.get(PerfCounters.CAUSE_FLUSH, 0), message)
+
+    def testMispredictedJumps (self):
+        for predictor in ["not-taken", "2-bit", "btb"]:
+            Globals.BRANCH_PREDICTOR = predictor
+            for program in PROGRAMS:
+                for model in ["basic", "forwarding"]:
+                    datapath, counters = self.runCounted(program, model)
+                    missed = sum(counts[1] for counts in datapath.pipe.predictor.stats.values())
+                    message = os.path.basename(program) + " on " + model + " with " + predictor
+                    self.assertEqual(missed, counters.causes.get(PerfCounters.CAUSE_FLUSH, 0), message)
+
+
+if __name__ == "__main__":
+    unittest.main()